@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import time
+
+
+def create_bench_app(database_url=None, **env):
+    """
+    Build the app with a fresh schema. Without `database_url` a throwaway
+    SQLite file is used; a given database is wiped, so it must be
+    disposable. Extra keyword arguments are exported as environment
+    variables before the app is created.
+    """
+    os.environ['DATABASE_URL'] = database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'bench.db')
+    os.environ.update({key: str(value) for key, value in env.items()})
+
+    from run import create_app
+    from db.database import db
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed_accounts(count, balance=1000, username='bench'):
+    """
+    Create a user owning `count` accounts; returns (user_id, account_ids)
+    """
+    from db.database import db
+    from models.account import Account
+    from models.user import User
+
+    user = User(username=username, email=f'{username}@example.com',
+                password_hash='bench')
+    db.session.add(user)
+    db.session.flush()
+
+    accounts = [Account(user_id=user.id, account_type='checking',
+                        account_number=f'{username}-{i}', balance=balance)
+                for i in range(count)]
+    db.session.add_all(accounts)
+    db.session.commit()
+    return user.id, [account.id for account in accounts]
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of a list of samples
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """
+    Throughput and latency percentiles (in milliseconds) for a run
+    """
+    return {
+        'operations': len(latencies),
+        'seconds': round(elapsed, 4),
+        'throughput_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Call `fn` and return (result, seconds taken)
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def emit(report, output=None):
+    """
+    Print a report as JSON and optionally write it to a file
+    """
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
@@ -0,0 +1,81 @@
+"""
+Compare per-request commits with group commit for concurrent deposits.
+
+    python -m benchmarks.group_commit --threads 16 --deposits 200
+"""
+import argparse
+import threading
+import time
+from decimal import Decimal
+from benchmarks.common import create_bench_app, emit, seed_accounts, summarize
+
+
+def run_mode(group_commit, threads, deposits, max_batch, max_delay_ms, database_url):
+    app = create_bench_app(
+        database_url,
+        DEPOSIT_GROUP_COMMIT='true' if group_commit else 'false',
+        GROUP_COMMIT_MAX_BATCH=max_batch,
+        GROUP_COMMIT_MAX_DELAY_MS=max_delay_ms)
+
+    from db.database import db
+    from services import transaction_service
+
+    with app.app_context():
+        user_id, account_ids = seed_accounts(threads)
+
+    latencies = []
+    errors = []
+
+    def worker(account_id):
+        with app.app_context():
+            for _ in range(deposits):
+                start = time.perf_counter()
+                _, error = transaction_service.create_deposit(
+                    user_id, account_id, Decimal('1.00'))
+                latencies.append(time.perf_counter() - start)
+                if error:
+                    errors.append(error)
+            db.session.remove()
+
+    workers = [threading.Thread(target=worker, args=(account_id,))
+               for account_id in account_ids]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    committer = app.extensions.get('group_commit')
+    result = summarize(latencies, elapsed)
+    result['errors'] = len(errors)
+    if committer:
+        result['commits'] = committer.groups
+        committer.close()
+    else:
+        result['commits'] = len(latencies)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--deposits', type=int, default=200,
+                        help='deposits per thread')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-delay-ms', type=float, default=5)
+    parser.add_argument('--database-url',
+                        help='disposable database to run against (default: temporary SQLite)')
+    parser.add_argument('--output', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    report = {
+        mode: run_mode(mode == 'group_commit', args.threads, args.deposits,
+                       args.max_batch, args.max_delay_ms, args.database_url)
+        for mode in ('per_request', 'group_commit')
+    }
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare the original response serialization (per-row dicts with float and
+isoformat casts, encoded by Flask's default provider) with the bulk
+serializer and RevoJSONProvider.
+
+    python -m benchmarks.json_serialization --rows 10000 --repeat 5
+"""
+import argparse
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from benchmarks.common import create_bench_app, emit, timed
+
+
+def legacy_to_response(transaction):
+    return {
+        'id': transaction.id,
+        'source_account_id': transaction.source_account_id,
+        'destination_account_id': transaction.destination_account_id,
+        'amount': float(transaction.amount),
+        'transaction_type': transaction.transaction_type,
+        'description': transaction.description,
+        'status': transaction.status,
+        'created_at': transaction.created_at.isoformat() if transaction.created_at else None
+    }
+
+
+def make_transactions(count):
+    from models.transaction import Transaction
+
+    start = datetime(2024, 1, 1)
+    return [Transaction(id=i, source_account_id=1, destination_account_id=2,
+                        amount=Decimal(i % 10000) / 100, transaction_type='transfer',
+                        description='bench', status='completed',
+                        created_at=start + timedelta(seconds=i))
+            for i in range(count)]
+
+
+def best_of(repeat, fn):
+    return min(timed(fn)[1] for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    from models.transaction import Transaction
+    from shared import json_provider
+
+    with app.app_context():
+        transactions = make_transactions(args.rows)
+        legacy = DefaultJSONProvider(app)
+
+        def legacy_path():
+            return legacy.dumps({'transactions': [legacy_to_response(t) for t in transactions]},
+                                separators=(',', ':')).encode('utf-8')
+
+        def bulk_path():
+            return app.json.dumps_bytes({'transactions': Transaction.to_response_list(transactions)})
+
+        report = {'rows': args.rows, 'orjson': json_provider.orjson is not None}
+        for name, fn in (('legacy', legacy_path), ('bulk', bulk_path)):
+            seconds = best_of(args.repeat, fn)
+            report[name] = {'ms': round(seconds * 1000, 2),
+                            'rows_per_second': round(args.rows / seconds)}
+        for fmt in ('string', 'minor_units'):
+            app.config['JSON_DECIMAL_FORMAT'] = fmt
+            seconds = best_of(args.repeat, bulk_path)
+            report[f'bulk_{fmt}'] = {'ms': round(seconds * 1000, 2),
+                                     'rows_per_second': round(args.rows / seconds)}
+        report['speedup'] = round(report['legacy']['ms'] / report['bulk']['ms'], 2)
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""
+HTTP load test: serve the app from a threaded server, seed users with
+accounts and history, then have concurrent clients log in and run a mix of
+logins, account and user reads, history pages, statements, summaries,
+exports and transfers. Reports throughput and latency percentiles per route
+as JSON, to diff between releases.
+
+    python -m benchmarks.loadtest --clients 200 --duration 30
+    python -m benchmarks.loadtest --database-url postgresql://localhost/revobank_bench \\
+        --mix accounts=4,history=4,transfer=2 --output loadtest.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from werkzeug.serving import make_server
+from benchmarks.common import create_bench_app, emit, percentile, summarize
+
+PASSWORD = 'load-test-password'
+DEFAULT_MIX = ('accounts=4,history=4,transfer=2,login=1,user=1,statement=1,summary=1,'
+               'export=1')
+
+
+def parse_mix(value):
+    """
+    Parse "name=weight,..." into a list of (scenario, weight)
+    """
+    mix = []
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'Unknown scenario: {name}')
+        mix.append((name, int(weight or 1)))
+    return mix
+
+
+def seed(users, accounts_per_user, history_per_account):
+    """
+    Create users sharing one password hash, their accounts with numbers from
+    the allocator, and a history of transfers spread over the last 180 days,
+    with its monthly rollups. Returns [(username, [account ids])].
+    """
+    from flask import current_app
+    from db.database import db
+    from models.account import Account
+    from models.transaction import Transaction
+    from models.user import User
+    from services import password_service, rollup_service
+
+    password_hash = password_service.hash_password(PASSWORD)
+    # Reserved before the seeding transaction starts: on SQLite the
+    # allocator's own connection would wait on that transaction's write lock
+    allocator = current_app.extensions['account_numbers']
+    numbers = iter([allocator.allocate() for _ in range(users * accounts_per_user)])
+    now = datetime.utcnow()
+    seeded = []
+    for index in range(users):
+        user = User(username=f'load{index}', email=f'load{index}@example.com',
+                    password_hash=password_hash, full_name=f'Load User {index}')
+        db.session.add(user)
+        db.session.flush()
+        accounts = [Account(user_id=user.id, account_type='savings', balance=1000000,
+                            account_number=next(numbers))
+                    for _ in range(accounts_per_user)]
+        db.session.add_all(accounts)
+        db.session.flush()
+        account_ids = [account.id for account in accounts]
+        if len(account_ids) > 1:
+            db.session.execute(Transaction.__table__.insert(), [{
+                'source_account_id': account_ids[i % len(account_ids)],
+                'destination_account_id': account_ids[(i + 1) % len(account_ids)],
+                'amount': 1 + i % 50, 'transaction_type': 'transfer', 'status': 'completed',
+                'created_at': now - timedelta(minutes=random.randrange(180 * 24 * 60)),
+            } for i in range(history_per_account * len(account_ids))])
+        seeded.append((user.username, account_ids))
+    db.session.commit()
+    # The history above skipped the rollups that money movements maintain
+    rollup_service.backfill_rollups()
+    return seeded
+
+
+class Client:
+    """
+    One simulated user with a keep-alive connection. Each request's latency
+    is recorded under its route name.
+    """
+
+    def __init__(self, port, username, account_ids, record):
+        self.port = port
+        self.username = username
+        self.account_ids = account_ids
+        self.record = record
+        self.token = None
+        self.connection = None
+
+    def request(self, route, method, path, body=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        payload = json.dumps(body) if body is not None else None
+        start = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection = None
+            data, status = b'', 'error'
+        self.record(route, time.perf_counter() - start, status)
+        return status, data
+
+    def login(self):
+        status, data = self.request('POST /api/auth/login', 'POST', '/api/auth/login',
+                                    {'username': self.username, 'password': PASSWORD})
+        if status == 200:
+            self.token = json.loads(data)['token']
+        return status == 200
+
+    def accounts(self):
+        self.request('GET /api/accounts', 'GET', '/api/accounts')
+
+    def history(self):
+        self.request('GET /api/transactions', 'GET', '/api/transactions?limit=50')
+
+    def user(self):
+        self.request('GET /api/users/me', 'GET', '/api/users/me')
+
+    def statement(self):
+        start = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+        self.request('GET /api/accounts/<id>/statement', 'GET',
+                     f'/api/accounts/{random.choice(self.account_ids)}/statement?from={start}')
+
+    def summary(self):
+        self.request('GET /api/accounts/<id>/summary', 'GET',
+                     f'/api/accounts/{random.choice(self.account_ids)}/summary')
+
+    def export(self):
+        self.request('GET /api/transactions/export', 'GET',
+                     f'/api/transactions/export?format=ndjson&account_id={random.choice(self.account_ids)}')
+
+    def transfer(self):
+        source, destination = random.sample(self.account_ids, 2)
+        self.request('POST /api/transactions', 'POST', '/api/transactions', {
+            'transaction_type': 'transfer', 'source_account_id': source,
+            'destination_account_id': destination, 'amount': 1})
+
+
+SCENARIOS = {
+    'accounts': Client.accounts,
+    'history': Client.history,
+    'transfer': Client.transfer,
+    'login': Client.login,
+    'user': Client.user,
+    'statement': Client.statement,
+    'summary': Client.summary,
+    'export': Client.export,
+}
+
+
+def run(app, seeded, clients, duration, mix, warmup):
+    """
+    Drive the server with `clients` threads for `duration` seconds, after
+    `warmup` seconds that are not recorded. Returns the per-route report.
+    """
+    # One log line per request would dominate the measurement
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    samples = {}
+    lock = threading.Lock()
+    recording = threading.Event()
+    stop = threading.Event()
+
+    def record(route, seconds, status):
+        if not recording.is_set():
+            return
+        with lock:
+            latencies, statuses = samples.setdefault(route, ([], {}))
+            latencies.append(seconds)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+
+    def client_loop(index):
+        username, account_ids = seeded[index % len(seeded)]
+        client = Client(server.server_port, username, account_ids, record)
+        if not client.login():
+            return
+        while not stop.is_set():
+            SCENARIOS[random.choices(names, weights)[0]](client)
+
+    threads = [threading.Thread(target=client_loop, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    recording.set()
+    started = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    routes = {}
+    for route, (latencies, statuses) in sorted(samples.items()):
+        routes[route] = summarize(latencies, elapsed)
+        routes[route]['p90_ms'] = round(percentile(latencies, 0.90) * 1000, 3)
+        routes[route]['statuses'] = {str(status): count for status, count in sorted(
+            statuses.items(), key=lambda item: str(item[0]))}
+    everything = [latency for latencies, _ in samples.values() for latency in latencies]
+    return {'routes': routes, 'total': summarize(everything, elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=200, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds first')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--accounts-per-user', type=int, default=3)
+    parser.add_argument('--history-per-account', type=int, default=200)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'scenario weights (default {DEFAULT_MIX}; scenarios: '
+                             f"{', '.join(SCENARIOS)})")
+    parser.add_argument('--password-rounds', type=int, default=1000,
+                        help='PASSWORD_HASH_ROUNDS; raise it to include real hashing cost')
+    parser.add_argument('--database-url',
+                        help='disposable database to run against (default: temporary SQLite)')
+    parser.add_argument('--output', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url, PASSWORD_HASH_ROUNDS=args.password_rounds,
+                           RATE_LIMIT_ENABLED='false', QUERY_BUDGET_MODE='off',
+                           METRICS_ENABLED='false')
+    with app.app_context():
+        seeded = seed(args.users, max(2, args.accounts_per_user), args.history_per_account)
+        dialect = app.extensions['pool_monitor'].engine.dialect.name
+
+    report = run(app, seeded, args.clients, args.duration, args.mix, args.warmup)
+    report['config'] = {
+        'clients': args.clients,
+        'duration_seconds': args.duration,
+        'users': args.users,
+        'accounts_per_user': max(2, args.accounts_per_user),
+        'history_per_account': args.history_per_account,
+        'mix': dict(args.mix),
+        'database': dialect,
+    }
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Measure login throughput and latency at different hashing costs, and how a
+login burst affects a cheap route served by the same process.
+
+    python -m benchmarks.login_throughput --rounds 29000 100000 300000 --threads 8
+"""
+import argparse
+import threading
+import time
+from benchmarks.common import create_bench_app, emit, percentile, summarize
+
+
+def run_cost(rounds, threads, logins, workers, max_pending, database_url):
+    app = create_bench_app(database_url, PASSWORD_HASH_ROUNDS=rounds,
+                           PASSWORD_HASH_WORKERS=workers,
+                           PASSWORD_HASH_MAX_PENDING=max_pending,
+                           QUERY_BUDGET_MODE='off', METRICS_ENABLED='false')
+    from services import password_service
+
+    # Each run gets a pool sized for its own settings
+    password_service._executor = None
+
+    with app.app_context():
+        client = app.test_client()
+        client.post('/api/users', json={'username': 'bench', 'password': 'bench-password',
+                                        'email': 'bench@example.com'})
+
+    latencies = []
+    statuses = {}
+    health_latencies = []
+    done = threading.Event()
+
+    def login_worker():
+        client = app.test_client()
+        for _ in range(logins):
+            start = time.perf_counter()
+            response = client.post('/api/auth/login', json={
+                'username': 'bench', 'password': 'bench-password'})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    def health_worker():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/health')
+            health_latencies.append(time.perf_counter() - start)
+
+    probe = threading.Thread(target=health_worker)
+    probe.start()
+    workers_ = [threading.Thread(target=login_worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers_:
+        thread.start()
+    for thread in workers_:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    probe.join()
+
+    result = summarize(latencies, elapsed)
+    result['statuses'] = {str(status): count for status, count in sorted(statuses.items())}
+    result['health_p99_ms'] = round(percentile(health_latencies, 0.99) * 1000, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, nargs='+', default=[29000, 100000, 300000])
+    parser.add_argument('--threads', type=int, default=8, help='concurrent login clients')
+    parser.add_argument('--logins', type=int, default=20, help='logins per client')
+    parser.add_argument('--workers', type=int, default=2, help='PASSWORD_HASH_WORKERS')
+    parser.add_argument('--max-pending', type=int, default=8, help='PASSWORD_HASH_MAX_PENDING')
+    parser.add_argument('--database-url',
+                        help='disposable database to run against (default: temporary SQLite)')
+    parser.add_argument('--output', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    report = {
+        str(rounds): run_cost(rounds, args.threads, args.logins, args.workers,
+                              args.max_pending, args.database_url)
+        for rounds in args.rounds
+    }
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
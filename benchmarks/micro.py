@@ -0,0 +1,214 @@
+"""
+Microbenchmarks of the hot service functions and serializers, called
+directly against a seeded dataset, with regression checks against stored
+baselines.
+
+    python -m benchmarks.micro --rows 100000
+    python -m benchmarks.micro --rows 1000 --check            # exit 1 on regression
+    python -m benchmarks.micro --rows 1000 --update-baselines
+
+Baselines live in benchmarks/baselines.json per dataset size, in
+microseconds per operation. A benchmark regresses when it is slower than
+its baseline by more than the tolerance (the file's, or --tolerance).
+Baselines only compare runs on the same machine; refresh them with
+--update-baselines when the hardware changes.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from benchmarks.common import create_bench_app, emit
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DEFAULT_TOLERANCE = 0.5
+SEED_CHUNK = 10000
+ACCOUNTS_PER_USER = 5
+OTHER_USERS = 20
+SERIALIZED_ROWS = 1000
+
+
+def seed(rows):
+    """
+    One benchmarked user with a few accounts, other users to transfer with,
+    and `rows` transactions spread over the last year. Returns
+    (user_id, account_ids).
+    """
+    from flask import current_app
+    from db.database import db
+    from models.account import Account
+    from models.transaction import Transaction
+    from models.user import User
+
+    allocator = current_app.extensions['account_numbers']
+    numbers = iter([allocator.allocate()
+                    for _ in range((OTHER_USERS + 1) * ACCOUNTS_PER_USER)])
+    user_ids, account_ids = [], []
+    for index in range(OTHER_USERS + 1):
+        user = User(username=f'micro{index}', email=f'micro{index}@example.com',
+                    password_hash='micro')
+        db.session.add(user)
+        db.session.flush()
+        accounts = [Account(user_id=user.id, account_type='savings', balance=10 ** 7,
+                            account_number=next(numbers))
+                    for _ in range(ACCOUNTS_PER_USER)]
+        db.session.add_all(accounts)
+        db.session.flush()
+        user_ids.append(user.id)
+        account_ids.append([account.id for account in accounts])
+    db.session.commit()
+
+    own, everyone = account_ids[0], [a for ids in account_ids for a in ids]
+    start = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / max(rows, 1)
+    table = Transaction.__table__
+    for offset in range(0, rows, SEED_CHUNK):
+        # Half of the rows touch the benchmarked user's accounts
+        db.session.execute(table.insert(), [{
+            'source_account_id': own[i % len(own)] if i % 2 else everyone[i % len(everyone)],
+            'destination_account_id': everyone[(i * 7) % len(everyone)],
+            'amount': 1 + i % 100, 'transaction_type': 'transfer', 'status': 'completed',
+            'created_at': start + step * i,
+        } for i in range(offset, min(rows, offset + SEED_CHUNK))])
+        db.session.commit()
+    return user_ids[0], own
+
+
+def benchmarks(user_id, account_ids):
+    """
+    name -> (callable, operations per call)
+    """
+    from db.database import db
+    from models.account import Account
+    from models.transaction import Transaction
+    from repos import transaction_repo
+    from services import account_service, transaction_service
+
+    recent = transaction_service.get_user_transactions(account_ids, limit=SERIALIZED_ROWS)
+    instances = db.session.query(Transaction).limit(SERIALIZED_ROWS).all()
+    # Detached with their loaded state, so commits made by other benchmarks
+    # cannot expire them and turn serializing into lazy loads
+    db.session.expunge_all()
+    accounts = account_service.get_user_accounts(user_id)
+    source, destination = account_ids[:2]
+
+    return {
+        'transaction_service.create_transfer': (
+            lambda: transaction_service.create_transfer(user_id, source, destination, Decimal('0.01')), 1),
+        'transaction_service.get_user_transactions[limit=50]': (
+            lambda: transaction_service.get_user_transactions(account_ids, limit=50), 1),
+        'account_service.get_user_accounts': (
+            lambda: account_service.get_user_accounts(user_id), 1),
+        'Transaction.to_response[orm]': (
+            lambda: [Transaction.to_response(transaction) for transaction in instances],
+            len(instances)),
+        'Transaction.to_response_list[rows]': (
+            lambda: Transaction.to_response_list(recent), len(recent)),
+        'Account.to_response_list[rows]': (
+            lambda: Account.to_response_list(accounts), len(accounts)),
+        'repos.transaction_repo.fetch_all[limit=50]': (
+            lambda: transaction_repo.fetch_all(transaction_service.user_transactions_query(
+                account_ids, limit=50)), 1),
+    }
+
+
+def measure(fn, operations, repeat, number=None):
+    """
+    Best of `repeat` runs of `number` calls, in microseconds per operation.
+    Without `number`, each run makes enough calls to last at least 0.2s, so
+    the cheap serializers are timed as steadily as the queries.
+    """
+    from db.database import db
+
+    timer = timeit.Timer(fn)
+    if number is None:
+        number, _ = timer.autorange()
+        db.session.remove()
+    times = []
+    for _ in range(repeat):
+        times.append(timer.timeit(number))
+        db.session.remove()
+    return round(min(times) / (number * operations) * 1e6, 3)
+
+
+def compare(results, baselines, tolerance):
+    """
+    Annotate each result with its baseline and whether it regressed
+    """
+    report = {}
+    for name, micros in results.items():
+        entry = {'us_per_op': micros}
+        baseline = baselines.get(name)
+        if baseline:
+            entry['baseline_us_per_op'] = baseline
+            entry['ratio'] = round(micros / baseline, 3)
+            entry['regressed'] = micros > baseline * (1 + tolerance)
+        report[name] = entry
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000,
+                        help='transactions to seed, e.g. 1000 up to 10000000')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--number', type=int,
+                        help='calls per timing run (default: enough for 0.2s)')
+    parser.add_argument('--only', nargs='+', help='run only these benchmarks')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with status 1 when a benchmark regressed')
+    parser.add_argument('--tolerance', type=float,
+                        help=f'allowed slowdown as a fraction (default: baselines file, '
+                             f'else {DEFAULT_TOLERANCE})')
+    parser.add_argument('--update-baselines', action='store_true',
+                        help='store this run as the baseline for its dataset size')
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--database-url',
+                        help='disposable database to run against (default: temporary SQLite)')
+    parser.add_argument('--output', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    stored = {'tolerance': DEFAULT_TOLERANCE, 'rows': {}}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            stored = json.load(f)
+    tolerance = args.tolerance if args.tolerance is not None else stored.get(
+        'tolerance', DEFAULT_TOLERANCE)
+
+    app = create_bench_app(args.database_url, QUERY_BUDGET_MODE='off',
+                           METRICS_ENABLED='false', RATE_LIMIT_ENABLED='false')
+    with app.app_context():
+        user_id, account_ids = seed(args.rows)
+        selected = benchmarks(user_id, account_ids)
+        if args.only:
+            selected = {name: selected[name] for name in args.only}
+        results = {name: measure(fn, operations, args.repeat, args.number)
+                   for name, (fn, operations) in selected.items()}
+
+    size = str(args.rows)
+    report = {
+        'rows': args.rows,
+        'tolerance': tolerance,
+        'benchmarks': compare(results, stored['rows'].get(size, {}), tolerance),
+    }
+    regressed = sorted(name for name, entry in report['benchmarks'].items()
+                       if entry.get('regressed'))
+    report['regressed'] = regressed
+    emit(report, args.output)
+
+    if args.update_baselines:
+        stored['rows'][size] = dict(stored['rows'].get(size, {}), **results)
+        with open(args.baselines, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Updated baselines for {size} rows in {args.baselines}', file=sys.stderr)
+    elif args.check and regressed:
+        print(f"Regressed past {tolerance:.0%}: {', '.join(regressed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
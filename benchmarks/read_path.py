@@ -0,0 +1,89 @@
+"""
+Compare reading a user's transaction history as hydrated ORM objects with
+the column projection read path, in time and peak memory per request.
+
+    python -m benchmarks.read_path --rows 10000 --repeat 5
+"""
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+from benchmarks.common import create_bench_app, emit, seed_accounts, timed
+
+
+def seed_transactions(account_ids, count):
+    from db.database import db
+    from models.transaction import Transaction
+
+    start = datetime(2024, 1, 1)
+    db.session.bulk_insert_mappings(Transaction, [
+        {'source_account_id': account_ids[0], 'destination_account_id': account_ids[1],
+         'amount': 1, 'transaction_type': 'transfer', 'status': 'completed',
+         'created_at': start + timedelta(seconds=i)}
+        for i in range(count)])
+    db.session.commit()
+
+
+def measure(fn, repeat):
+    """
+    Best time over `repeat` runs and the peak memory of one run
+    """
+    from db.database import db
+
+    seconds = []
+    for _ in range(repeat):
+        seconds.append(timed(fn)[1])
+        db.session.remove()
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+    return min(seconds), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url',
+                        help='disposable database to run against (default: temporary SQLite)')
+    parser.add_argument('--output', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url, QUERY_BUDGET_MODE='off')
+    from sqlalchemy import select
+    from sqlalchemy.orm import aliased
+    from db.database import db
+    from models.transaction import Transaction
+    from services import transaction_service
+
+    with app.app_context():
+        _, account_ids = seed_accounts(2)
+        seed_transactions(account_ids, args.rows)
+
+        def orm_path():
+            # The history query as it was before the projection read path
+            subquery = transaction_service.user_transactions_query(account_ids).subquery()
+            history = aliased(Transaction, subquery)
+            rows = db.session.execute(select(history)).scalars().all()
+            return app.json.dumps_bytes({'transactions': Transaction.to_response_list(rows)})
+
+        def projection_path():
+            rows = transaction_service.get_user_transactions(account_ids)
+            return app.json.dumps_bytes({'transactions': Transaction.to_response_list(rows)})
+
+        report = {'rows': args.rows}
+        for name, fn in (('orm', orm_path), ('projection', projection_path)):
+            seconds, peak = measure(fn, args.repeat)
+            report[name] = {'ms': round(seconds * 1000, 2),
+                            'us_per_row': round(seconds * 1e6 / args.rows, 2),
+                            'peak_memory_kb': round(peak / 1024)}
+        report['speedup'] = round(report['orm']['ms'] / report['projection']['ms'], 2)
+        report['memory_ratio'] = round(
+            report['orm']['peak_memory_kb'] / report['projection']['peak_memory_kb'], 2)
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+# Commands module initialization
+
+
+def register_commands(app):
+    """
+    Register maintenance CLI commands on the app
+    """
+    from commands.archive_commands import archive_cli
+    from commands.idempotency_commands import idempotency_cli
+    from commands.partition_commands import partitions_cli
+    from commands.rate_limit_commands import rate_limit_cli
+    from commands.rollup_commands import rollups_cli
+    from commands.schema_commands import schema_cli
+    from commands.token_commands import tokens_cli
+
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(partitions_cli)
+    app.cli.add_command(rate_limit_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(tokens_cli)
@@ -0,0 +1,30 @@
+import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from db.partitions import month_start
+from services import archive_service
+
+archive_cli = AppGroup('archive', help='Move cold transaction history to the archive.')
+
+
+@archive_cli.command('run')
+@click.option('--older-than-days', type=int, default=None,
+              help='Archive months that ended more than this many days ago '
+                   '[default: ARCHIVE_AFTER_DAYS].')
+@click.option('--chunk-size', default=50000, show_default=True,
+              help='Transactions per segment write and per delete.')
+def run(older_than_days, chunk_size):
+    """Archive whole months of transactions older than the cutoff."""
+    if older_than_days is None:
+        older_than_days = current_app.config['ARCHIVE_AFTER_DAYS']
+    cutoff_day = datetime.datetime.utcnow().date() - datetime.timedelta(days=older_than_days)
+    # Cut at a month boundary so every archived month is complete
+    cutoff = datetime.datetime.combine(month_start(cutoff_day), datetime.time())
+    try:
+        archived, deleted = archive_service.archive_transactions(
+            cutoff, chunk_size, progress=click.echo)
+    except (archive_service.ArchiveNotConfigured, archive_service.ArchiveIncomplete) as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Archived {archived} transactions created before {cutoff:%Y-%m-%d}; '
+               f'deleted {deleted} from the table')
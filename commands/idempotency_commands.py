@@ -0,0 +1,12 @@
+import click
+from flask.cli import AppGroup
+from services import idempotency_service
+
+idempotency_cli = AppGroup('idempotency', help='Manage stored idempotency keys.')
+
+
+@idempotency_cli.command('purge')
+def purge():
+    """Delete expired idempotency keys."""
+    removed = idempotency_service.purge_expired_keys()
+    click.echo(f'Removed {removed} expired idempotency keys')
@@ -0,0 +1,41 @@
+import click
+from flask.cli import AppGroup
+from db import partitions
+from db.database import db
+from repos import transaction_archive
+
+partitions_cli = AppGroup('partitions', help='Manage monthly partitions of the transactions table.')
+
+
+@partitions_cli.command('create')
+@click.option('--months-ahead', default=3, show_default=True,
+              help='Create partitions up to this many months after the current one.')
+def create(months_ahead):
+    """Pre-create partitions for the coming months."""
+    try:
+        created = partitions.create_future_partitions(db.engine, months_ahead)
+    except partitions.PartitioningUnsupported as e:
+        raise click.ClickException(str(e))
+    for name in created:
+        click.echo(f'Created {name}')
+    click.echo(f'Created {len(created)} partitions')
+
+
+@partitions_cli.command('detach')
+@click.option('--keep-months', default=24, show_default=True,
+              help='Keep this many months before the current one attached.')
+@click.option('--force', is_flag=True,
+              help='Detach even months that are not archived yet; their rows disappear '
+                   'from history, statements and rollups.')
+def detach(keep_months, force):
+    """Detach archived partitions older than the retention window."""
+    archive = transaction_archive.current()
+    try:
+        detached = partitions.detach_old_partitions(
+            db.engine, keep_months,
+            archived_before=archive.archived_before if archive else None, force=force)
+    except (partitions.PartitioningUnsupported, partitions.PartitionNotArchived) as e:
+        raise click.ClickException(str(e))
+    for name in detached:
+        click.echo(f'Detached {name}')
+    click.echo(f'Detached {len(detached)} partitions')
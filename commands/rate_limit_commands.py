@@ -0,0 +1,19 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from shared.rate_limit import DatabaseBackend
+
+rate_limit_cli = AppGroup('ratelimit', help='Manage shared rate limit buckets.')
+
+
+@rate_limit_cli.command('purge')
+@click.option('--max-idle', default=3600, show_default=True,
+              help='Delete buckets unused for this many seconds.')
+def purge(max_idle):
+    """Delete idle buckets of the database rate limit backend."""
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is None or not isinstance(limiter.backend, DatabaseBackend):
+        click.echo('The database rate limit backend is not in use')
+        return
+    removed = limiter.backend.purge(max_idle)
+    click.echo(f'Removed {removed} idle rate limit buckets')
@@ -0,0 +1,15 @@
+import click
+from flask.cli import AppGroup
+from services import rollup_service
+
+rollups_cli = AppGroup('rollups', help='Manage per-account monthly rollups.')
+
+
+@rollups_cli.command('backfill')
+@click.option('--chunk-size', default=100, show_default=True,
+              help='Accounts recounted and committed per chunk.')
+def backfill(chunk_size):
+    """Rebuild the monthly rollups from the transaction history."""
+    processed = rollup_service.backfill_rollups(
+        chunk_size, progress=lambda count: click.echo(f'{count} transactions rolled up'))
+    click.echo(f'Rebuilt rollups from {processed} transactions')
@@ -0,0 +1,45 @@
+import click
+import sqlalchemy as sa
+from flask.cli import AppGroup
+from flask_migrate import stamp, upgrade as apply_migrations
+from db.database import db
+
+schema_cli = AppGroup('schema', help='Bring the database schema up to date.')
+
+# Databases created by db.create_all() before the migration history existed
+# hold exactly the tables of the first revision, but no alembic_version
+INITIAL_REVISION = '0001'
+INITIAL_TABLES = {'users', 'accounts', 'transactions'}
+
+
+def is_unversioned_initial_schema(engine):
+    """
+    Whether the database has the initial tables but no recorded revision
+    """
+    tables = set(sa.inspect(engine).get_table_names())
+    if 'alembic_version' in tables:
+        with engine.connect() as connection:
+            if connection.execute(sa.text('SELECT version_num FROM alembic_version')).first():
+                return False
+    return INITIAL_TABLES <= tables
+
+
+def upgrade_database():
+    """
+    Apply every migration, first stamping a database created by
+    db.create_all() at the initial revision so its tables are not created
+    again. Returns True when the database was stamped.
+    """
+    stamped = is_unversioned_initial_schema(db.engine)
+    if stamped:
+        stamp(revision=INITIAL_REVISION)
+    apply_migrations()
+    return stamped
+
+
+@schema_cli.command('upgrade')
+def upgrade():
+    """Apply migrations, adopting a database created without them."""
+    if upgrade_database():
+        click.echo(f'Stamped an unversioned database at revision {INITIAL_REVISION}')
+    click.echo('Database schema is up to date')
@@ -0,0 +1,12 @@
+import click
+from flask.cli import AppGroup
+from services import auth_service
+
+tokens_cli = AppGroup('tokens', help='Manage revoked tokens.')
+
+
+@tokens_cli.command('purge')
+def purge():
+    """Delete revocations of tokens that have expired anyway."""
+    removed = auth_service.purge_revoked_tokens()
+    click.echo(f'Removed {removed} expired token revocations')
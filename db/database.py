@@ -1,3 +1,25 @@
 from flask_sqlalchemy import SQLAlchemy
+from db.routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def commit_keeping(*instances):
+    """
+    Commit the session without expiring `instances`, so building their
+    response afterwards does not reload each of them with another SELECT.
+    They stay attached to the session; everything else is expired as by a
+    normal commit.
+    """
+    session = db.session()
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = expire_on_commit
+    if expire_on_commit:
+        kept = {id(instance) for instance in instances}
+        for instance in list(session.identity_map.values()):
+            if id(instance) not in kept:
+                session.expire(instance)
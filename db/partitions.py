@@ -0,0 +1,118 @@
+import re
+from datetime import date, datetime, time
+from sqlalchemy import text
+
+# Monthly range partitions of the transactions table (PostgreSQL only; see
+# migration 0008). Partitions are named transactions_yYYYYmMM.
+PARENT_TABLE = 'transactions'
+PARTITION_NAME = re.compile(r'^transactions_y(\d{4})m(\d{2})$')
+
+
+class PartitioningUnsupported(Exception):
+    """
+    Raised when the database does not partition the transactions table
+    """
+
+
+class PartitionNotArchived(Exception):
+    """
+    Raised instead of detaching partitions whose rows are not in the archive
+    yet; history, statements and rollups would lose them
+    """
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_y{month.year}m{month.month:02d}'
+
+
+def create_partition_sql(month):
+    """
+    DDL creating the partition for the month starting at `month`
+    """
+    return (f'CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARENT_TABLE} '
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')")
+
+
+def _check_partitioned(connection):
+    partitioned = connection.dialect.name == 'postgresql' and connection.execute(text(
+        'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+        'WHERE c.relname = :name AND pg_table_is_visible(c.oid)'
+    ), {'name': PARENT_TABLE}).first() is not None
+    if not partitioned:
+        raise PartitioningUnsupported(
+            'The transactions table is not partitioned; partitioning needs PostgreSQL '
+            'and migration 0008')
+
+
+def monthly_partitions(connection):
+    """
+    Attached monthly partitions as a sorted list of (month, name)
+    """
+    _check_partitioned(connection)
+    names = connection.execute(text(
+        'SELECT child.relname FROM pg_inherits i '
+        'JOIN pg_class parent ON parent.oid = i.inhparent '
+        'JOIN pg_class child ON child.oid = i.inhrelid '
+        'WHERE parent.relname = :name AND pg_table_is_visible(parent.oid)'
+    ), {'name': PARENT_TABLE}).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((date(int(match[1]), int(match[2]), 1), name))
+    return sorted(partitions)
+
+
+def create_future_partitions(engine, months_ahead=3, today=None):
+    """
+    Make sure partitions exist from the current month to `months_ahead`
+    months ahead. Run this well before month end: rows landing in the
+    default partition block creating their month's partition later.
+    Returns the names of the partitions created.
+    """
+    current = month_start(today or datetime.utcnow().date())
+    with engine.begin() as connection:
+        existing = {name for _, name in monthly_partitions(connection)}
+        created = []
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if partition_name(month) not in existing:
+                connection.execute(text(create_partition_sql(month)))
+                created.append(partition_name(month))
+    return created
+
+
+def detach_old_partitions(engine, keep_months, today=None, archived_before=None, force=False):
+    """
+    Detach partitions whose whole month is more than `keep_months` months
+    back. Detached partitions stay behind as plain tables, ready to be
+    dropped, and queries on transactions no longer touch them.
+
+    Reads only find detached rows in the archive, so nothing is detached
+    unless every such month ended by `archived_before` (the archive
+    boundary, None without an archive), or `force` is set. Returns the
+    names of the detached partitions.
+    """
+    cutoff = add_months(month_start(today or datetime.utcnow().date()), -keep_months)
+    detached = []
+    with engine.begin() as connection:
+        old = [(month, name) for month, name in monthly_partitions(connection) if month < cutoff]
+        unarchived = [name for month, name in old if archived_before is None
+                      or datetime.combine(add_months(month, 1), time()) > archived_before]
+        if unarchived and not force:
+            raise PartitionNotArchived(
+                f"{', '.join(unarchived)} hold transactions that are not archived yet; "
+                'run `flask archive run` first')
+        for _, name in old:
+            connection.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}'))
+            detached.append(name)
+    return detached
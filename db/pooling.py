@@ -0,0 +1,191 @@
+import os
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# Defaults per deployment profile; every value can be overridden from the
+# environment (see ENV_OVERRIDES)
+PROFILES = {
+    # Local development and tests. SQLite has no server, so the pool only
+    # needs to wait out writer locks instead of failing immediately.
+    'sqlite': {
+        'busy_timeout': 15,
+    },
+    # A Postgres server we connect to directly
+    'postgres': {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 30000,
+    },
+    # PgBouncer-style transaction poolers (e.g. the Supabase pooler on port
+    # 6543; on 5432 it runs in session mode and behaves like a direct
+    # connection, so it keeps the postgres profile). The pooler owns the
+    # server connections, so keep few client connections, recycle them well
+    # before the pooler's idle timeout and ping after worker restarts.
+    # Transaction poolers reject startup parameters, so the statement timeout
+    # belongs on the database role; an explicit DB_STATEMENT_TIMEOUT_MS is
+    # applied with SET LOCAL in every transaction instead.
+    'pgbouncer': {
+        'pool_size': 2,
+        'max_overflow': 3,
+        'pool_timeout': 10,
+        'pool_recycle': 300,
+        'pool_pre_ping': True,
+    },
+}
+
+# Port of the Supabase (and PgBouncer convention) transaction-mode pooler
+TRANSACTION_POOLER_PORT = 6543
+
+ENV_OVERRIDES = {
+    'DB_POOL_SIZE': ('pool_size', int),
+    'DB_MAX_OVERFLOW': ('max_overflow', int),
+    'DB_POOL_TIMEOUT': ('pool_timeout', int),
+    'DB_POOL_RECYCLE': ('pool_recycle', int),
+    'DB_POOL_PRE_PING': ('pool_pre_ping', lambda value: value.lower() == 'true'),
+    'DB_STATEMENT_TIMEOUT_MS': ('statement_timeout_ms', int),
+    'DB_BUSY_TIMEOUT': ('busy_timeout', int),
+}
+
+
+def detect_profile(database_url):
+    """
+    Guess the pool profile from the database URL. Only the transaction-mode
+    pooler port gets the pgbouncer profile; anything else on a pooler needs
+    an explicit DB_POOL_PROFILE.
+    """
+    if database_url.startswith('sqlite'):
+        return 'sqlite'
+    if make_url(database_url).port == TRANSACTION_POOLER_PORT:
+        return 'pgbouncer'
+    return 'postgres'
+
+
+def _settings(database_url, environ):
+    profile = environ.get('DB_POOL_PROFILE') or detect_profile(database_url)
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown DB_POOL_PROFILE: {profile}')
+
+    settings = dict(PROFILES[profile])
+    for variable, (setting, convert) in ENV_OVERRIDES.items():
+        if environ.get(variable):
+            settings[setting] = convert(environ[variable])
+    return profile, settings
+
+
+def engine_options(database_url, environ=os.environ):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for a database URL. The profile comes
+    from DB_POOL_PROFILE or is detected from the URL. Returns
+    (profile, options).
+    """
+    profile, settings = _settings(database_url, environ)
+
+    connect_args = {}
+    busy_timeout = settings.pop('busy_timeout', None)
+    if busy_timeout is not None and profile == 'sqlite':
+        connect_args['timeout'] = busy_timeout
+
+    statement_timeout = settings.pop('statement_timeout_ms', None)
+    if statement_timeout and profile == 'postgres':
+        connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+
+    # In-memory SQLite uses a single static connection, which takes no pool sizing
+    if profile == 'sqlite' and (database_url == 'sqlite://' or ':memory:' in database_url):
+        for setting in ('pool_size', 'max_overflow', 'pool_timeout'):
+            settings.pop(setting, None)
+
+    options = dict(settings)
+    if connect_args:
+        options['connect_args'] = connect_args
+    return profile, options
+
+
+def transaction_statement_timeout(database_url, environ=os.environ):
+    """
+    The statement timeout in milliseconds to set inside every transaction,
+    for profiles that cannot pass it as a startup option; None otherwise
+    """
+    profile, settings = _settings(database_url, environ)
+    if profile != 'pgbouncer':
+        return None
+    return settings.get('statement_timeout_ms')
+
+
+def apply_statement_timeout(engine, timeout_ms):
+    """
+    Run SET LOCAL statement_timeout at the start of every transaction on
+    `engine`. SET LOCAL ends with the transaction, so the setting never
+    leaks to other clients of a transaction pooler.
+    """
+    statement = f'SET LOCAL statement_timeout = {int(timeout_ms)}'
+
+    @event.listens_for(engine, 'begin')
+    def set_statement_timeout(connection):
+        connection.exec_driver_sql(statement)
+
+
+class PoolMonitor:
+    """
+    Tracks connection pool activity for an engine through pool events:
+    current checkouts and overflow, the checkout high-water mark, and
+    totals for connects, checkouts and invalidations.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.peak_checked_out = 0
+        self._checked_out = 0
+        self._lock = threading.Lock()
+
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self._checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self._checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._checked_out = max(0, self._checked_out - 1)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        """
+        Snapshot of the pool state and counters
+        """
+        pool = self.engine.pool
+        snapshot = {
+            'pool_class': type(pool).__name__,
+            'checked_out': self._checked_out,
+            'peak_checked_out': self.peak_checked_out,
+            'connects_total': self.connects,
+            'checkouts_total': self.checkouts,
+            'invalidations_total': self.invalidations,
+        }
+        if isinstance(pool, QueuePool):
+            snapshot.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(0, pool.overflow()),
+                'max_overflow': pool._max_overflow,
+            })
+        return snapshot
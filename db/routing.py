@@ -0,0 +1,90 @@
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_EXTENSION = 'db_replica'
+# Requests that do not change anything; they may read from the replica
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Carries the end of a client's read-your-writes window across workers
+STICKY_COOKIE = 'revobank_primary_until'
+
+_recent_writers = {}
+_writers_lock = threading.Lock()
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the reads of GET requests to the replica engine when
+    one is configured. Writes, flushes, reads outside a request and reads by
+    a client that wrote within REPLICA_STICKY_SECONDS use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not isinstance(clause, UpdateBase)
+                and reads_from_replica()):
+            replica = current_app.extensions.get(REPLICA_EXTENSION)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _sticky_until():
+    until = _recent_writers.get(g.get('db_user_id'), 0.0)
+    try:
+        return max(until, float(request.cookies.get(STICKY_COOKIE, 0)))
+    except ValueError:
+        return until
+
+
+def reads_from_replica():
+    """
+    Whether reads in the current context may be served by the replica
+    """
+    if not has_request_context() or request.method not in SAFE_METHODS:
+        return False
+    return _sticky_until() <= time.time()
+
+
+def identify(user_id):
+    """
+    Tell the router which user the request acts for, so their own recent
+    writes keep their reads on the primary even without the cookie
+    """
+    if has_request_context():
+        g.db_user_id = user_id
+
+
+def _remember_writer(user_id, until):
+    with _writers_lock:
+        _recent_writers[user_id] = until
+        if len(_recent_writers) > current_app.config['REPLICA_STICKY_MAX_USERS']:
+            now = time.time()
+            for writer, expires in list(_recent_writers.items()):
+                if expires <= now:
+                    del _recent_writers[writer]
+
+
+def init_app(app, replica_url, engine_options):
+    """
+    Create the replica engine and start a read-your-writes window after
+    every successful request that can change data. The window is remembered
+    per user in this worker and sent to the client as a cookie, so the next
+    worker honours it too.
+    """
+    # Like the primary's, the engine only connects on first use
+    app.extensions[REPLICA_EXTENSION] = create_engine(replica_url, **engine_options)
+
+    @app.after_request
+    def pin_writer_to_primary(response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return response
+        window = app.config['REPLICA_STICKY_SECONDS']
+        until = time.time() + window
+        if g.get('db_user_id') is not None:
+            _remember_writer(g.db_user_id, until)
+        response.set_cookie(STICKY_COOKIE, f'{until:.3f}', max_age=window,
+                            httponly=True, samesite='Lax')
+        return response
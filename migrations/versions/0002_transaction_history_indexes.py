@@ -0,0 +1,29 @@
+"""transaction history indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transactions_source_account_id_created_at', 'transactions',
+                    ['source_account_id', 'created_at'], unique=False)
+    op.create_index('ix_transactions_destination_account_id_created_at', 'transactions',
+                    ['destination_account_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_transactions_destination_account_id_created_at',
+                  table_name='transactions')
+    op.drop_index('ix_transactions_source_account_id_created_at',
+                  table_name='transactions')
@@ -0,0 +1,31 @@
+"""rate limit buckets
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rate_limit_buckets',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_rate_limit_buckets_updated_at', 'rate_limit_buckets', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_rate_limit_buckets_updated_at', table_name='rate_limit_buckets')
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,33 @@
+"""account monthly rollups
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('account_monthly_rollups',
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('inflow_total', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('inflow_count', sa.Integer(), nullable=False),
+    sa.Column('outflow_total', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('outflow_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('account_id', 'month')
+    )
+
+
+def downgrade():
+    op.drop_table('account_monthly_rollups')
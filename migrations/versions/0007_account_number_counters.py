@@ -0,0 +1,30 @@
+"""account number counters
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    counters = op.create_table('account_number_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Keep in sync with shared.account_numbers.FIRST_ACCOUNT_NUMBER
+    op.bulk_insert(counters, [{'name': 'account', 'next_value': 1000000000}])
+
+
+def downgrade():
+    op.drop_table('account_number_counters')
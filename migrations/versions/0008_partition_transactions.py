@@ -0,0 +1,148 @@
+"""partition transactions by month on PostgreSQL
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:00:00.000000
+
+Rebuilds `transactions` as a table range-partitioned on created_at, with one
+partition per month from the oldest row up to three months ahead and a
+default partition for anything outside them. The primary key becomes
+(id, created_at), as PostgreSQL requires the partition key in it.
+
+The application can keep running. Rows are copied into the new table in
+batches of BATCH_SIZE, each committed on its own, while writes continue on
+the old table. Writes only wait twice: for the transactions in flight when
+the copy starts, and while the rows written during the copy are caught up
+and the tables are swapped.
+
+Other databases keep the plain table; this revision does nothing there.
+
+"""
+from datetime import date, datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+BATCH_SIZE = 10000
+COLUMNS = ('id, source_account_id, destination_account_id, amount, transaction_type, '
+           'description, status, created_at')
+INDEXES = (('ix_transactions_source_account_id_created_at', 'source_account_id, created_at'),
+           ('ix_transactions_destination_account_id_created_at', 'destination_account_id, created_at'))
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _create_table(name, primary_key, partitioned):
+    """
+    An empty copy of `transactions` named `name`. Its primary key and
+    indexes get their final names once the tables are swapped.
+    """
+    # Left behind by a run that stopped during the copy
+    op.execute(f'DROP TABLE IF EXISTS {name} CASCADE')
+    op.execute(f'CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS)'
+               + (' PARTITION BY RANGE (created_at)' if partitioned else ''))
+    op.execute(f'ALTER TABLE {name} ADD CONSTRAINT {name}_pkey PRIMARY KEY ({primary_key})')
+    for column in ('source_account_id', 'destination_account_id'):
+        op.execute(f'ALTER TABLE {name} ADD CONSTRAINT transactions_{column}_fkey '
+                   f'FOREIGN KEY ({column}) REFERENCES accounts (id)')
+    for index, columns in INDEXES:
+        op.execute(f'CREATE INDEX {index}_new ON {name} ({columns})')
+
+
+def _copy(target, select_columns, condition, **params):
+    return op.get_bind().execute(sa.text(
+        f'INSERT INTO {target} ({COLUMNS}) SELECT {select_columns} FROM transactions '
+        f'WHERE {condition} ORDER BY id'), params).rowcount
+
+
+def _move_rows(target, select_columns):
+    """
+    Copy every row of `transactions` into `target` and put `target` in its
+    place. Ledger rows are never updated, so a row copied once stays current.
+    """
+    context = op.get_context()
+    missing = f'id > :copied AND NOT EXISTS (SELECT 1 FROM {target} t WHERE t.id = transactions.id)'
+
+    # Waits for the writes in flight, so every id up to `copied` is committed
+    # and rows inserted from now on get higher ids
+    op.execute('LOCK TABLE transactions IN SHARE MODE')
+    copied = op.get_bind().execute(sa.text('SELECT coalesce(max(id), 0) FROM transactions')).scalar()
+
+    # Leaving the migration's transaction releases the lock; every batch
+    # commits on its own
+    with context.autocommit_block():
+        after = 0
+        while after < copied:
+            upto = op.get_bind().execute(sa.text(
+                'SELECT max(id) FROM (SELECT id FROM transactions WHERE id > :after AND id <= :copied '
+                'ORDER BY id LIMIT :limit) batch'), {'after': after, 'copied': copied, 'limit': BATCH_SIZE}
+            ).scalar()
+            if upto is None:
+                break
+            _copy(target, select_columns, 'id > :after AND id <= :upto', after=after, upto=upto)
+            after = upto
+        # Rows written during the copy, so the locked step below is short
+        _copy(target, select_columns, missing, copied=copied)
+
+    op.execute('LOCK TABLE transactions IN EXCLUSIVE MODE')
+    _copy(target, select_columns, missing, copied=copied)
+
+    # The id sequence belongs to the old table and would be dropped with it
+    op.execute('ALTER SEQUENCE transactions_id_seq OWNED BY NONE')
+    op.execute('DROP TABLE transactions CASCADE')
+    op.execute(f'ALTER TABLE {target} RENAME TO transactions')
+    op.execute(f'ALTER TABLE transactions RENAME CONSTRAINT {target}_pkey TO transactions_pkey')
+    for index, _ in INDEXES:
+        op.execute(f'ALTER INDEX {index}_new RENAME TO {index}')
+    op.execute('ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id')
+
+    # Outside a transaction, which also commits the swap
+    with context.autocommit_block():
+        op.execute('ANALYZE transactions')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    oldest = bind.execute(sa.text('SELECT min(created_at) FROM transactions')).scalar()
+    _create_table('transactions_partitioned', 'id, created_at', partitioned=True)
+    op.execute('ALTER TABLE transactions_partitioned ALTER COLUMN created_at SET NOT NULL')
+
+    today = datetime.utcnow().date()
+    month = date((oldest or today).year, (oldest or today).month, 1)
+    last = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        end = _next_month(month)
+        op.execute(f"CREATE TABLE transactions_y{month.year}m{month.month:02d} "
+                   f"PARTITION OF transactions_partitioned FOR VALUES FROM ('{month}') TO ('{end}')")
+        month = end
+    op.execute('CREATE TABLE transactions_default PARTITION OF transactions_partitioned DEFAULT')
+
+    # The partition key is part of the primary key, so it cannot be NULL
+    _move_rows('transactions_partitioned', COLUMNS.replace(
+        'created_at', "coalesce(created_at, now() AT TIME ZONE 'utc')"))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # Partitions detached with `flask partitions detach` stay behind as
+    # standalone tables and are not copied back
+    _create_table('transactions_unpartitioned', 'id', partitioned=False)
+    op.execute('ALTER TABLE transactions_unpartitioned ALTER COLUMN created_at DROP NOT NULL')
+    _move_rows('transactions_unpartitioned', COLUMNS)
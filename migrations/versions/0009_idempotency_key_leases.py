@@ -0,0 +1,30 @@
+"""idempotency key leases
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.add_column(sa.Column('lease_token', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('locked_until', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('transaction_ids', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.drop_column('transaction_ids')
+        batch_op.drop_column('locked_until')
+        batch_op.drop_column('lease_token')
@@ -0,0 +1,51 @@
+"""hash plaintext passwords
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 19:00:00.000000
+
+Rows from before passwords were hashed still hold the password itself.
+They are hashed here once, so login never has to accept plaintext. Users
+get the configured scheme and cost on their next login.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from passlib.context import CryptContext
+from passlib.hash import pbkdf2_sha256
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+# Identifying a hash needs no backend, so this also recognises bcrypt and
+# argon2 hashes on hosts without those libraries
+HASHES = CryptContext(schemes=['pbkdf2_sha256', 'bcrypt', 'argon2'])
+
+users = sa.table('users', sa.column('id', sa.Integer), sa.column('password_hash', sa.String))
+
+
+def upgrade():
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(users.c.id, users.c.password_hash)
+            .where(users.c.id > last_id).order_by(users.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        for user_id, password in rows:
+            if password and not HASHES.identify(password):
+                connection.execute(users.update().where(users.c.id == user_id)
+                                   .values(password_hash=pbkdf2_sha256.hash(password)))
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # The plaintext cannot be recovered, and should not be
+    pass
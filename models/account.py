@@ -1,3 +1,4 @@
+from operator import attrgetter
 from db.database import db
 from datetime import datetime
 from models.user import User
@@ -22,6 +23,9 @@ class Account(db.Model):
     transactions_to = db.relationship(
         'Transaction', foreign_keys='Transaction.destination_account_id', backref='destination_account', lazy=True)
 
+    RESPONSE_FIELDS = ('id', 'user_id', 'account_type', 'account_number',
+                       'balance', 'status', 'created_at')
+
     @staticmethod
     def to_response(account):
         """Convert account object to response format"""
@@ -30,7 +34,14 @@ class Account(db.Model):
             'user_id': account.user_id,
             'account_type': account.account_type,
             'account_number': account.account_number,
-            'balance': float(account.balance),
+            'balance': account.balance,
             'status': account.status,
-            'created_at': account.created_at.isoformat() if account.created_at else None
+            'created_at': account.created_at
         }
+
+    @staticmethod
+    def to_response_list(accounts):
+        """Convert many accounts (or result rows with the same fields) at once"""
+        fields = Account.RESPONSE_FIELDS
+        values = attrgetter(*fields)
+        return [dict(zip(fields, values(account))) for account in accounts]
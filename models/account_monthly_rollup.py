@@ -0,0 +1,27 @@
+from db.database import db
+
+
+class AccountMonthlyRollup(db.Model):
+    __tablename__ = 'account_monthly_rollups'
+
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), primary_key=True)
+    # First day of the month the totals cover
+    month = db.Column(db.Date, primary_key=True)
+    inflow_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    inflow_count = db.Column(db.Integer, nullable=False, default=0)
+    outflow_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    outflow_count = db.Column(db.Integer, nullable=False, default=0)
+
+    RESPONSE_FIELDS = ('month', 'inflow_total', 'inflow_count', 'outflow_total', 'outflow_count')
+
+    @staticmethod
+    def to_response(rollup):
+        """Convert a rollup row to response format"""
+        return {
+            'month': rollup.month.strftime('%Y-%m'),
+            'inflow_total': rollup.inflow_total,
+            'inflow_count': rollup.inflow_count,
+            'outflow_total': rollup.outflow_total,
+            'outflow_count': rollup.outflow_count,
+            'net': rollup.inflow_total - rollup.outflow_total
+        }
@@ -0,0 +1,9 @@
+from db.database import db
+
+
+class AccountNumberCounter(db.Model):
+    __tablename__ = 'account_number_counters'
+
+    name = db.Column(db.String(50), primary_key=True)
+    # First number of the next block to hand out
+    next_value = db.Column(db.BigInteger, nullable=False)
@@ -0,0 +1,29 @@
+from db.database import db
+from datetime import datetime
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        # Lookups go through fixed-width digests rather than raw client keys
+        db.UniqueConstraint('user_id', 'key_hash',
+                            name='uq_idempotency_keys_user_id_key_hash'),
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key_hash = db.Column(db.String(64), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    # Both stay empty while the original request is still being processed
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    # The claiming request's lease. Once it lapses another request may take
+    # the claim over, and the new token fences out the request it replaced.
+    lease_token = db.Column(db.String(32))
+    locked_until = db.Column(db.DateTime)
+    # Comma-separated ids of the ledger rows the claiming request wrote,
+    # recorded in the same database transaction as those rows
+    transaction_ids = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
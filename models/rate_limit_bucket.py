@@ -0,0 +1,14 @@
+from db.database import db
+
+
+class RateLimitBucket(db.Model):
+    __tablename__ = 'rate_limit_buckets'
+    __table_args__ = (
+        db.Index('ix_rate_limit_buckets_updated_at', 'updated_at'),
+    )
+
+    # "<route group>:<ip or user>"
+    key = db.Column(db.String(255), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    # Unix time of the last take, in seconds
+    updated_at = db.Column(db.Float, nullable=False)
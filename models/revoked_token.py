@@ -0,0 +1,17 @@
+from db.database import db
+from datetime import datetime
+
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        db.Index('ix_revoked_tokens_expires_at', 'expires_at'),
+    )
+
+    # Workers sync new revocations incrementally by id
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(32), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    # The row can be purged once the token would have expired on its own
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,9 +1,20 @@
+from operator import attrgetter
 from db.database import db
 from datetime import datetime
 
 
 class Transaction(db.Model):
+    # On PostgreSQL the table is range-partitioned by month on created_at
+    # and its primary key is (id, created_at); see migration 0008 and
+    # db/partitions.py. Ids stay unique, so the mapping keeps id alone.
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # History lookups filter on one side of the transfer and a time range
+        db.Index('ix_transactions_source_account_id_created_at',
+                 'source_account_id', 'created_at'),
+        db.Index('ix_transactions_destination_account_id_created_at',
+                 'destination_account_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     source_account_id = db.Column(
@@ -16,6 +27,9 @@ class Transaction(db.Model):
     status = db.Column(db.String(50), default='completed')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    RESPONSE_FIELDS = ('id', 'source_account_id', 'destination_account_id', 'amount',
+                       'transaction_type', 'description', 'status', 'created_at')
+
     @staticmethod
     def to_response(transaction):
         """Convert transaction object to response format"""
@@ -23,9 +37,16 @@ class Transaction(db.Model):
             'id': transaction.id,
             'source_account_id': transaction.source_account_id,
             'destination_account_id': transaction.destination_account_id,
-            'amount': float(transaction.amount),
+            'amount': transaction.amount,
             'transaction_type': transaction.transaction_type,
             'description': transaction.description,
             'status': transaction.status,
-            'created_at': transaction.created_at.isoformat() if transaction.created_at else None
+            'created_at': transaction.created_at
         }
+
+    @staticmethod
+    def to_response_list(transactions):
+        """Convert many transactions (or result rows with the same fields) at once"""
+        fields = Transaction.RESPONSE_FIELDS
+        values = attrgetter(*fields)
+        return [dict(zip(fields, values(transaction))) for transaction in transactions]
@@ -24,9 +24,9 @@ class User(db.Model):
         Convert user object to response format (without password)
         """
         return {
-            'id': user['id'],
-            'username': user['username'],
-            'email': user['email'],
-            'full_name': user['full_name'],
-            'created_at': user['created_at']
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'full_name': user.full_name,
+            'created_at': user.created_at
         }
@@ -0,0 +1,43 @@
+from sqlalchemy import select
+from db.database import db
+from models.account import Account
+
+# Reads select only the response columns with Core and return plain Row
+# tuples: no identity map, change tracking or relationship state per row.
+# Rows expose the columns as attributes, so Account.to_response works on
+# them unchanged. Writes keep using the ORM model.
+ACCOUNT_COLUMNS = tuple(Account.__table__.c[field] for field in Account.RESPONSE_FIELDS)
+
+
+def select_accounts():
+    """
+    SELECT of the account response columns
+    """
+    return select(*ACCOUNT_COLUMNS)
+
+
+def find_by_user(user_id):
+    """
+    All accounts of a user, as rows
+    """
+    return db.session.execute(
+        select_accounts().where(Account.user_id == user_id).order_by(Account.id)
+    ).all()
+
+
+def find_ids_by_user(user_id):
+    """
+    Ids of a user's accounts
+    """
+    return db.session.execute(
+        select(Account.id).where(Account.user_id == user_id)
+    ).scalars().all()
+
+
+def find_for_user(account_id, user_id):
+    """
+    One of a user's accounts as a row, or None
+    """
+    return db.session.execute(
+        select_accounts().where(Account.id == account_id, Account.user_id == user_id)
+    ).first()
@@ -0,0 +1,316 @@
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from decimal import Decimal
+from itertools import groupby
+from flask import current_app
+from models.transaction import Transaction
+from shared import columnar
+
+# Archived rows have the same fields as the rows of transaction_repo, so
+# responses, cursors and exports handle both alike
+ArchivedTransaction = namedtuple('ArchivedTransaction', Transaction.RESPONSE_FIELDS)
+ArchivedLeg = namedtuple('ArchivedLeg', ('id', 'transaction_type', 'description', 'status',
+                                         'created_at', 'amount', 'running_balance'),
+                         defaults=(None,))
+
+MANIFEST = 'manifest.json'
+# Columns read first to decide which rows of a segment match
+FILTER_COLUMNS = ('id', 'source_account_id', 'destination_account_id', 'created_at')
+_EMPTY = {'archived_before': None, 'segments': []}
+
+
+def current():
+    """
+    The app's archive, or None when ARCHIVE_DIR is not set
+    """
+    return current_app.extensions.get('transaction_archive')
+
+
+def _encode(field, values):
+    if field == 'amount':
+        return [str(value) for value in values]
+    if field == 'created_at':
+        return [value.isoformat() for value in values]
+    return list(values)
+
+
+def _decode(field, values):
+    if field == 'amount':
+        return tuple(Decimal(value) for value in values)
+    if field == 'created_at':
+        return tuple(datetime.fromisoformat(value) for value in values)
+    return tuple(values)
+
+
+class IndexCache:
+    """
+    Decoded filter columns of recently read segments, least recently used
+    first out. Bounded by the number of rows held rather than of segments,
+    as a segment can hold up to a whole archive chunk.
+    """
+
+    def __init__(self, max_rows):
+        self.max_rows = max_rows
+        self.rows = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            self._entries.move_to_end(path)
+            return entry
+
+    def set(self, path, columns):
+        rows = len(columns[0])
+        if rows > self.max_rows:
+            return
+        with self._lock:
+            if path in self._entries:
+                self.rows -= len(self._entries.pop(path)[0])
+            self._entries[path] = columns
+            self.rows += rows
+            while self.rows > self.max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self.rows -= len(evicted[0])
+
+
+def _owner(source_account_id, destination_account_id):
+    return source_account_id if source_account_id is not None else destination_account_id
+
+
+class TransactionArchive:
+    """
+    Transactions moved out of the hot table into immutable columnar segment
+    files (see shared/columnar.py) under `directory`. There is one segment
+    per month and range of `account_range_size` account ids, per archive
+    run. A transfer between accounts in two ranges is stored in both.
+
+    manifest.json lists the segments and `archived_before`: every
+    transaction created before it is in the archive, and only those.
+    """
+
+    def __init__(self, directory, account_range_size=10000, index_cache_rows=200000):
+        self.directory = directory
+        self.account_range_size = account_range_size
+        self._index_cache = IndexCache(index_cache_rows)
+        self._manifest = _EMPTY
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, MANIFEST)
+
+    def manifest(self):
+        """
+        The manifest, reloaded when an archive run in another process has
+        replaced it
+        """
+        try:
+            mtime = os.stat(self._manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            return _EMPTY
+        if mtime != self._manifest_mtime:
+            with self._lock:
+                with open(self._manifest_path()) as file:
+                    manifest = json.load(file)
+                for segment in manifest['segments']:
+                    for key in ('min_created_at', 'max_created_at'):
+                        segment[key] = datetime.fromisoformat(segment[key])
+                if manifest['archived_before']:
+                    manifest['archived_before'] = datetime.fromisoformat(manifest['archived_before'])
+                self._manifest, self._manifest_mtime = manifest, mtime
+        return self._manifest
+
+    @property
+    def archived_before(self):
+        return self.manifest()['archived_before']
+
+    def _path(self, segment):
+        return os.path.join(self.directory, segment['path'])
+
+    def _index(self, path):
+        """
+        The decoded FILTER_COLUMNS of a segment. Segments are immutable, so
+        they are cached by path.
+        """
+        columns = self._index_cache.get(path)
+        if columns is None:
+            columns = tuple(_decode(field, columnar.read_column(path, field))
+                            for field in FILTER_COLUMNS)
+            self._index_cache.set(path, columns)
+        return columns
+
+    def _read(self, segment, keep):
+        """
+        Rows of a segment for which keep(id, source, destination, created_at)
+        is true. The other columns are only read when something matches, and
+        only the matching rows of them are decoded.
+        """
+        path = self._path(segment)
+        index = self._index(path)
+        matches = [row for row, values in enumerate(zip(*index)) if keep(*values)]
+        if not matches:
+            return []
+        picked = dict(zip(FILTER_COLUMNS, (tuple(column[row] for row in matches)
+                                           for column in index)))
+        for field in Transaction.RESPONSE_FIELDS:
+            if field not in picked:
+                values = columnar.read_column(path, field)
+                picked[field] = _decode(field, [values[row] for row in matches])
+        return [ArchivedTransaction(*values) for values in
+                zip(*(picked[field] for field in Transaction.RESPONSE_FIELDS))]
+
+    def _segments(self, account_ids, start=None, end=None):
+        for segment in self.manifest()['segments']:
+            if start and segment['max_created_at'] < start:
+                continue
+            if end and segment['min_created_at'] > end:
+                continue
+            if not any(segment['account_lo'] <= account_id <= segment['account_hi']
+                       for account_id in account_ids):
+                continue
+            yield segment
+
+    def find(self, account_ids, counterparty=None, start=None, end=None, before=None,
+             limit=None, oldest_first=False):
+        """
+        Archived transactions touching `account_ids` (and `counterparty`,
+        when given), newest first or oldest first, with the same date and
+        (created_at, id) keyset filters as the hot history query. Months are
+        read one at a time and reading stops once `limit` rows are found.
+        """
+        found = []
+        for rows in self.iter_months(account_ids, counterparty, start, end, before, oldest_first):
+            found.extend(rows)
+            if limit and len(found) >= limit:
+                return found[:limit]
+        return found
+
+    def iter_months(self, account_ids, counterparty=None, start=None, end=None, before=None,
+                    oldest_first=False):
+        """
+        The rows `find` returns, as one sorted list per month. A month's
+        segments are only read when the iteration reaches it.
+        """
+        account_ids = set(account_ids)
+
+        def keep(transaction_id, source, destination, created_at):
+            if source not in account_ids and destination not in account_ids:
+                return False
+            if counterparty is not None and counterparty not in (source, destination):
+                return False
+            if (start and created_at < start) or (end and created_at > end):
+                return False
+            return before is None or (created_at, transaction_id) < before
+
+        segments = sorted(self._segments(account_ids, start, end),
+                          key=lambda segment: segment['month'], reverse=not oldest_first)
+        for _, month_segments in groupby(segments, key=lambda segment: segment['month']):
+            # A transfer stored in two ranges is only returned once
+            rows = {row.id: row for segment in month_segments for row in self._read(segment, keep)}
+            if rows:
+                yield sorted(rows.values(), key=lambda row: (row.created_at, row.id),
+                             reverse=not oldest_first)
+
+    def account_legs(self, account_id, start=None, end=None):
+        """
+        Archived movements of one account, oldest first, with outgoing
+        amounts negative, like the legs of an account statement
+        """
+        legs = []
+        for row in self.find([account_id], start=start, end=end, oldest_first=True):
+            if row.source_account_id == account_id:
+                legs.append(ArchivedLeg(row.id, row.transaction_type, row.description,
+                                        row.status, row.created_at, -row.amount))
+            if row.destination_account_id == account_id:
+                legs.append(ArchivedLeg(row.id, row.transaction_type, row.description,
+                                        row.status, row.created_at, row.amount))
+        return sorted(legs, key=lambda leg: (leg.created_at, leg.id, leg.amount))
+
+    def get(self, transaction_id):
+        """
+        An archived transaction by id, or None
+        """
+        for segment in self.manifest()['segments']:
+            if segment['min_id'] <= transaction_id <= segment['max_id']:
+                rows = self._read(segment, lambda found_id, *_: found_id == transaction_id)
+                if rows:
+                    return rows[0]
+        return None
+
+    def iter_all(self, since=None):
+        """
+        Every archived transaction once, segment by segment, skipping
+        segments that end before `since`. A copy is only yielded from the
+        segment covering the range of its source account (its destination
+        account for deposits).
+        """
+        for segment in self.manifest()['segments']:
+            if since and segment['max_created_at'] < since:
+                continue
+            low, high = segment['account_lo'], segment['account_hi']
+            rows = self._read(segment, lambda _, source, destination, __:
+                              low <= _owner(source, destination) <= high)
+            if rows:
+                yield rows
+
+    def write_segments(self, month, rows, name):
+        """
+        Write one month's rows as immutable segments, one per account range
+        the rows touch, and return their manifest entries. `name` makes the
+        file names unique to this run and chunk.
+        """
+        by_range = {}
+        for row in rows:
+            for account_id in {row.source_account_id, row.destination_account_id} - {None}:
+                by_range.setdefault(account_id // self.account_range_size, []).append(row)
+
+        segments = []
+        for bucket, range_rows in sorted(by_range.items()):
+            low = bucket * self.account_range_size
+            high = low + self.account_range_size - 1
+            path = os.path.join(month.strftime('%Y-%m'), f'accounts-{low:010d}-{high:010d}-{name}.rvc')
+            os.makedirs(os.path.join(self.directory, os.path.dirname(path)), exist_ok=True)
+            size = columnar.write_columns(os.path.join(self.directory, path), {
+                field: _encode(field, [getattr(row, field) for row in range_rows])
+                for field in Transaction.RESPONSE_FIELDS
+            })
+            segments.append({
+                'path': path,
+                'month': month.strftime('%Y-%m'),
+                'account_lo': low,
+                'account_hi': high,
+                'rows': len(range_rows),
+                'bytes': size,
+                'min_id': min(row.id for row in range_rows),
+                'max_id': max(row.id for row in range_rows),
+                'min_created_at': min(row.created_at for row in range_rows).isoformat(),
+                'max_created_at': max(row.created_at for row in range_rows).isoformat(),
+            })
+        return segments
+
+    def publish(self, segments, archived_before):
+        """
+        Add segments to the manifest and move `archived_before` forward.
+        The manifest is replaced in one rename, so readers switch from the
+        old archive to the new one at once.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = self.manifest()
+        existing = [dict(segment, min_created_at=segment['min_created_at'].isoformat(),
+                         max_created_at=segment['max_created_at'].isoformat())
+                    for segment in manifest['segments']]
+        temporary = f'{self._manifest_path()}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'archived_before': archived_before.isoformat(),
+                       'segments': existing + segments}, file, indent=1)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self._manifest_path())
+        self._manifest_mtime = None
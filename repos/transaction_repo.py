@@ -0,0 +1,22 @@
+from sqlalchemy import select
+from db.database import db
+from models.transaction import Transaction
+
+# Like account_repo, reads return Row tuples of the response columns, which
+# Transaction.to_response_list and the keyset cursors consume directly
+TRANSACTION_COLUMNS = tuple(Transaction.__table__.c[field]
+                            for field in Transaction.RESPONSE_FIELDS)
+
+
+def select_transactions():
+    """
+    SELECT of the transaction response columns
+    """
+    return select(*TRANSACTION_COLUMNS)
+
+
+def fetch_all(query):
+    """
+    Run a transaction query built on select_transactions and return its rows
+    """
+    return db.session.execute(query).all()
@@ -1,5 +1,8 @@
-from flask import Blueprint, request, jsonify
-from services import account_service, auth_service
+from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from models.account import Account
+from models.account_monthly_rollup import AccountMonthlyRollup
+from services import account_service, auth_service, rollup_service, transaction_service
 
 account_bp = Blueprint('accounts', __name__)
 
@@ -7,19 +10,19 @@ account_bp = Blueprint('accounts', __name__)
 @account_bp.route('', methods=['GET'])
 @auth_service.token_required
 def get_accounts(current_user):
-    user_accounts = account_service.get_user_accounts(current_user['id'])
-    return jsonify({'accounts': user_accounts}), 200
+    user_accounts = account_service.get_user_accounts(current_user.id)
+    return jsonify({'accounts': Account.to_response_list(user_accounts)}), 200
 
 
 @account_bp.route('/<account_id>', methods=['GET'])
 @auth_service.token_required
 def get_account(current_user, account_id):
-    account = account_service.get_account_by_id(account_id, current_user['id'])
+    account = account_service.get_account_row(account_id, current_user.id)
 
     if not account:
         return jsonify({'message': 'Account not found or unauthorized'}), 404
 
-    return jsonify({'account': account}), 200
+    return jsonify({'account': Account.to_response(account)}), 200
 
 
 @account_bp.route('', methods=['POST'])
@@ -31,12 +34,12 @@ def create_account(current_user):
         return jsonify({'message': 'Missing required fields'}), 400
 
     new_account = account_service.create_account(
-        user_id=current_user['id'],
+        user_id=current_user.id,
         account_type=data.get('account_type'),
         initial_balance=data.get('initial_balance', 0.0)
     )
 
-    return jsonify({'message': 'Account created successfully', 'account': new_account}), 201
+    return jsonify({'message': 'Account created successfully', 'account': Account.to_response(new_account)}), 201
 
 
 @account_bp.route('/<account_id>', methods=['PUT'])
@@ -45,22 +48,100 @@ def update_account(current_user, account_id):
     data = request.json
 
     updated_account, error = account_service.update_account(
-        account_id, current_user['id'], data)
+        account_id, current_user.id, data)
 
     if error:
         return jsonify({'message': error}), 404
 
-    return jsonify({'message': 'Account updated successfully', 'account': updated_account}), 200
+    return jsonify({'message': 'Account updated successfully',
+                    'account': Account.to_response(updated_account)}), 200
 
 
 @account_bp.route('/<account_id>', methods=['DELETE'])
 @auth_service.token_required
 def delete_account(current_user, account_id):
     success, error = account_service.delete_account(
-        account_id, current_user['id'])
+        account_id, current_user.id)
 
     if not success:
         # Check if error is None before using 'in' operator
         return jsonify({'message': error or 'Unknown error'}), 400 if error and 'balance' in error else 404
 
     return jsonify({'message': 'Account deleted successfully'}), 200
+
+
+def _stream_statement(account_id, start, end, opening_balance, rows):
+    """
+    Render a statement as JSON incrementally, one row at a time
+    """
+    dumps = current_app.json.dumps
+    yield (f'{{"account_id": {account_id}, '
+           f'"from": {dumps(start)}, "to": {dumps(end)}, '
+           f'"opening_balance": {dumps(opening_balance)}, "transactions": [')
+
+    closing_balance = opening_balance
+    separator = ''
+    for row in rows:
+        closing_balance = row.running_balance
+        yield separator + dumps({
+            'id': row.id,
+            'transaction_type': row.transaction_type,
+            'description': row.description,
+            'status': row.status,
+            'amount': row.amount,
+            'running_balance': row.running_balance,
+            'created_at': row.created_at
+        })
+        separator = ', '
+
+    yield f'], "closing_balance": {dumps(closing_balance)}}}'
+
+
+@account_bp.route('/<int:account_id>/statement', methods=['GET'])
+@auth_service.token_required
+def get_account_statement(current_user, account_id):
+    account = account_service.get_account_row(account_id, current_user.id)
+
+    if not account:
+        return jsonify({'message': 'Account not found or unauthorized'}), 404
+
+    try:
+        start = request.args.get('from')
+        start = datetime.fromisoformat(start) if start else None
+        end = request.args.get('to')
+        end = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        return jsonify({'message': 'Invalid date range'}), 400
+
+    opening_balance, rows = transaction_service.get_account_statement(
+        account.id, start, end)
+
+    return Response(stream_with_context(
+        _stream_statement(account.id, start, end, opening_balance, rows)
+    ), mimetype='application/json')
+
+
+def _parse_month(value):
+    return datetime.strptime(value, '%Y-%m').date() if value else None
+
+
+@account_bp.route('/<int:account_id>/summary', methods=['GET'])
+@auth_service.token_required
+def get_account_summary(current_user, account_id):
+    account = account_service.get_account_row(account_id, current_user.id)
+
+    if not account:
+        return jsonify({'message': 'Account not found or unauthorized'}), 404
+
+    try:
+        start = _parse_month(request.args.get('from'))
+        end = _parse_month(request.args.get('to'))
+    except ValueError:
+        return jsonify({'message': 'Invalid month range, expected YYYY-MM'}), 400
+
+    rollups = rollup_service.get_account_summary(account.id, start, end)
+
+    return jsonify({
+        'account_id': account.id,
+        'months': [AccountMonthlyRollup.to_response(rollup) for rollup in rollups]
+    }), 200
@@ -1,10 +1,13 @@
+import jwt
 from flask import Blueprint, request, jsonify
-from services import user_service, auth_service
+from services import user_service, auth_service, password_service
+from shared.rate_limit import rate_limit
 
 auth_bp = Blueprint('auth', __name__)
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login')
 def login():
     auth = request.json
 
@@ -16,10 +19,55 @@ def login():
     if not user:
         return jsonify({'message': 'User not found'}), 401
 
-    # In production, use proper password hashing
-    if user.password_hash == auth.get('password'):
-        token = auth_service.generate_token(user.id)
+    try:
+        valid, new_hash = password_service.verify_password(
+            auth.get('password'), user.password_hash)
+    except password_service.PasswordHashingBusy:
+        return jsonify({'message': 'Too many login attempts in progress, retry shortly'}), 503, \
+            {'Retry-After': '1'}
 
-        return jsonify({'token': token}), 200
+    if valid:
+        # Rehash with the current scheme and cost when they have changed
+        if new_hash:
+            user_service.update_password_hash(user, new_hash)
+
+        return jsonify(auth_service.issue_tokens(user.id)), 200
 
     return jsonify({'message': 'Invalid credentials'}), 401
+
+
+@auth_bp.route('/refresh', methods=['POST'])
+@rate_limit('refresh')
+def refresh():
+    data = request.json
+
+    if not data or not data.get('refresh_token'):
+        return jsonify({'message': 'Refresh token is missing!'}), 401
+
+    tokens, error = auth_service.refresh_tokens(data.get('refresh_token'))
+
+    if error:
+        return jsonify({'message': error}), 401
+
+    return jsonify(tokens), 200
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@auth_service.token_required
+def logout(current_user):
+    # Revoke the access token used for this request and, when given, the
+    # refresh token issued with it
+    claims = auth_service.decode_token(auth_service.bearer_token())
+    if claims.get('jti'):
+        auth_service.revoke_token(claims)
+
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token'):
+        try:
+            refresh_claims = auth_service.decode_token(data['refresh_token'], 'refresh')
+        except jwt.InvalidTokenError:
+            refresh_claims = None
+        if refresh_claims and refresh_claims['user_id'] == current_user.id:
+            auth_service.revoke_token(refresh_claims)
+
+    return jsonify({'message': 'Logged out successfully'}), 200
@@ -1,5 +1,12 @@
-from flask import Blueprint, request, jsonify
-from services import transaction_service, auth_service, account_service
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from models.transaction import Transaction
+from services import transaction_service, auth_service, account_service, idempotency_service
+from shared import pagination
+from shared.query_budget import request_budget
+from shared.rate_limit import rate_limit
 
 transaction_bp = Blueprint('transactions', __name__)
 
@@ -13,24 +20,84 @@ def get_transactions(current_user):
     end_date = request.args.get('end_date')
 
     # Get user's accounts
-    user_accounts = [account['id']
-                     for account in account_service.get_user_accounts(current_user['id'])]
-
-    # Get transactions
-    user_transactions = transaction_service.get_user_transactions(
-        user_accounts, account_id, start_date, end_date
-    )
-
-    return jsonify({'transactions': user_transactions}), 200
-
-
-@transaction_bp.route('/<transaction_id>', methods=['GET'])
+    user_accounts = account_service.get_user_account_ids(current_user.id)
+
+    # Get one page of transactions, newest first
+    try:
+        limit = pagination.parse_limit(request.args.get('limit'))
+        user_transactions, next_cursor = transaction_service.get_user_transactions_page(
+            user_accounts, account_id, start_date, end_date,
+            limit=limit, cursor=request.args.get('cursor')
+        )
+    except ValueError:
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    return jsonify({
+        'transactions': Transaction.to_response_list(user_transactions),
+        'next_cursor': next_cursor
+    }), 200
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _export_csv(batches):
+    """
+    Render batches of transaction rows as CSV, one chunk per batch
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(Transaction.RESPONSE_FIELDS)
+    yield buffer.getvalue()
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        # Decimals keep their exact digits; datetimes are written in ISO 8601
+        writer.writerows(
+            tuple('' if value is None else value.isoformat() if hasattr(value, 'isoformat')
+                  else value for value in row)
+            for row in rows)
+        yield buffer.getvalue()
+
+
+def _export_ndjson(batches):
+    """
+    Render batches of transaction rows as one JSON object per line
+    """
+    dumps = current_app.json.dumps
+    for rows in batches:
+        yield ''.join(dumps(response) + '\n'
+                      for response in Transaction.to_response_list(rows))
+
+
+@transaction_bp.route('/export', methods=['GET'])
+@auth_service.token_required
+def export_transactions(current_user):
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': 'Format must be csv or ndjson'}), 400
+
+    user_accounts = account_service.get_user_account_ids(current_user.id)
+    try:
+        batches = transaction_service.stream_user_transactions(
+            user_accounts, request.args.get('account_id'),
+            request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError:
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    render = _export_csv if export_format == 'csv' else _export_ndjson
+    return Response(stream_with_context(render(batches)), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition':
+                             f'attachment; filename=transactions.{export_format}'})
+
+
+@transaction_bp.route('/<int:transaction_id>', methods=['GET'])
 @auth_service.token_required
 def get_transaction(current_user, transaction_id):
-    # Get user's accounts
-    user_accounts = [account['id']
-                     for account in account_service.get_user_accounts(current_user['id'])]
-
     # Find the transaction
     transaction = transaction_service.get_transaction_by_id(transaction_id)
 
@@ -38,14 +105,26 @@ def get_transaction(current_user, transaction_id):
         return jsonify({'message': 'Transaction not found'}), 404
 
     # Check if user is authorized to view this transaction
-    if transaction['source_account_id'] not in user_accounts and transaction['destination_account_id'] not in user_accounts:
+    if not account_service.owns_any_account(
+            current_user.id, [transaction.source_account_id, transaction.destination_account_id]):
         return jsonify({'message': 'Unauthorized to view this transaction'}), 403
 
-    return jsonify({'transaction': transaction}), 200
+    return jsonify({'transaction': Transaction.to_response(transaction)}), 200
+
+
+def _completed(transaction):
+    return jsonify({'message': 'Transaction completed successfully',
+                    'transaction': Transaction.to_response(transaction)}), 201
+
+
+def _recover_completed(transaction_ids):
+    return _completed(transaction_service.get_transaction_by_id(transaction_ids[0]))
 
 
 @transaction_bp.route('', methods=['POST'])
 @auth_service.token_required
+@idempotency_service.idempotent(recover=_recover_completed)
+@rate_limit('transactions', per_user=True)
 def create_transaction(current_user):
     data = request.json
 
@@ -53,9 +132,12 @@ def create_transaction(current_user):
         return jsonify({'message': 'Missing required fields'}), 400
 
     transaction_type = data.get('transaction_type')
-    amount = float(data.get('amount'))
+    try:
+        amount = Decimal(str(data.get('amount')))
+    except InvalidOperation:
+        return jsonify({'message': 'Invalid amount'}), 400
 
-    if amount <= 0:
+    if not amount.is_finite() or amount <= 0:
         return jsonify({'message': 'Amount must be positive'}), 400
 
     # Handle different transaction types
@@ -64,7 +146,7 @@ def create_transaction(current_user):
             return jsonify({'message': 'Destination account ID is required for deposits'}), 400
 
         new_transaction, error = transaction_service.create_deposit(
-            user_id=current_user['id'],
+            user_id=current_user.id,
             destination_account_id=data.get('destination_account_id'),
             amount=amount
         )
@@ -74,7 +156,7 @@ def create_transaction(current_user):
             return jsonify({'message': 'Source account ID is required for withdrawals'}), 400
 
         new_transaction, error = transaction_service.create_withdrawal(
-            user_id=current_user['id'],
+            user_id=current_user.id,
             source_account_id=data.get('source_account_id'),
             amount=amount
         )
@@ -84,7 +166,7 @@ def create_transaction(current_user):
             return jsonify({'message': 'Source and destination account IDs are required for transfers'}), 400
 
         new_transaction, error = transaction_service.create_transfer(
-            user_id=current_user['id'],
+            user_id=current_user.id,
             source_account_id=data.get('source_account_id'),
             destination_account_id=data.get('destination_account_id'),
             amount=amount
@@ -95,4 +177,34 @@ def create_transaction(current_user):
     if error:
         return jsonify({'message': error}), 400 if 'Invalid' in error else 404
 
-    return jsonify({'message': 'Transaction completed successfully', 'transaction': new_transaction}), 201
+    return _completed(new_transaction)
+
+
+@transaction_bp.route('/batch', methods=['POST'])
+@request_budget(None)
+@auth_service.token_required
+@idempotency_service.idempotent
+@rate_limit('batch', per_user=True)
+def create_transaction_batch(current_user):
+    data = request.json
+    items = data.get('transactions') if isinstance(data, dict) else None
+
+    if not items or not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({'message': 'A non-empty list of transactions is required'}), 400
+
+    if len(items) > current_app.config['TRANSACTION_BATCH_MAX_SIZE']:
+        return jsonify({'message': 'Too many transactions in one batch'}), 400
+
+    chunk_size = data.get('chunk_size', current_app.config['TRANSACTION_BATCH_CHUNK_SIZE'])
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        return jsonify({'message': 'Invalid chunk size'}), 400
+
+    results = transaction_service.create_batch(
+        current_user.id, items, chunk_size=chunk_size)
+    completed = sum(1 for result in results if result['status'] == 'completed')
+
+    return jsonify({
+        'completed': completed,
+        'failed': len(results) - completed,
+        'results': results
+    }), 200
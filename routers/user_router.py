@@ -1,23 +1,29 @@
 from flask import Blueprint, request, jsonify
-from services import user_service, auth_service
+from services import user_service, auth_service, password_service
 from models.user import User
+from shared.rate_limit import rate_limit
 
 user_bp = Blueprint('users', __name__)
 
 
 @user_bp.route('', methods=['POST'])
+@rate_limit('signup')
 def create_user():
     data = request.json
 
     if not data or not data.get('username') or not data.get('password') or not data.get('email'):
         return jsonify({'message': 'Missing required fields'}), 400
 
-    new_user, error = user_service.create_user(
-        username=data.get('username'),
-        password=data.get('password'),
-        email=data.get('email'),
-        full_name=data.get('full_name', '')
-    )
+    try:
+        new_user, error = user_service.create_user(
+            username=data.get('username'),
+            password=data.get('password'),
+            email=data.get('email'),
+            full_name=data.get('full_name', '')
+        )
+    except password_service.PasswordHashingBusy:
+        return jsonify({'message': 'Too many sign-ups in progress, retry shortly'}), 503, \
+            {'Retry-After': '1'}
 
     if error:
         return jsonify({'message': error}), 409
@@ -1,11 +1,17 @@
 from flask import Flask, jsonify
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 from db.database import db
+from db import pooling, routing
+from shared import json_provider, rate_limit
+from shared.account_numbers import AccountNumberAllocator
 import os
+import time
 import datetime
 
 
 def create_app():
+    started = time.perf_counter()
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'revobank_secret_key')
     # Initialize database configuration
@@ -50,32 +56,165 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-    # Initialize database with error handling
-    try:
-        db.init_app(app)
-        with app.app_context():
-            db.create_all()
-        app.logger.info("Database initialized successfully")
-    except Exception as e:
-        app.logger.error(f"Failed to initialize database: {str(e)}")
-        if not database_url.startswith('sqlite:///'):
-            app.logger.warning("Attempting SQLite fallback")
-            database_url = f'sqlite:///{sqlite_path}'
-            app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-            try:
-                db.init_app(app)
-                with app.app_context():
-                    db.create_all()
-                app.logger.info(
-                    "SQLite fallback database initialized successfully")
-            except Exception as e:
-                app.logger.error(
-                    f"Failed to initialize SQLite fallback: {str(e)}")
-                raise
+    # Connection pool settings for the deployment profile
+    pool_profile, engine_options = pooling.engine_options(database_url)
+    app.config['DB_POOL_PROFILE'] = pool_profile
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    app.logger.info(f"Using '{pool_profile}' connection pool profile")
+
+    # Optional read replica: reads of GET requests go there, except for a
+    # client's reads within REPLICA_STICKY_SECONDS of its own last write
+    replica_url = os.getenv('REPLICA_DATABASE_URL')
+    if replica_url:
+        if replica_url.startswith('postgres://'):
+            replica_url = replica_url.replace('postgres://', 'postgresql://', 1)
+    app.config['REPLICA_STICKY_SECONDS'] = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+    app.config['REPLICA_STICKY_MAX_USERS'] = int(os.getenv('REPLICA_STICKY_MAX_USERS', 10000))
+
+    # Batch transaction submission limits
+    app.config['TRANSACTION_BATCH_MAX_SIZE'] = int(
+        os.getenv('TRANSACTION_BATCH_MAX_SIZE', 5000))
+    app.config['TRANSACTION_BATCH_CHUNK_SIZE'] = int(
+        os.getenv('TRANSACTION_BATCH_CHUNK_SIZE', 500))
+
+    # Cold history archive (see repos/transaction_archive.py); disabled
+    # unless ARCHIVE_DIR is set. ARCHIVE_AFTER_DAYS is the default age for
+    # `flask archive run`, which also needs ARCHIVE_DIR_SHARED to confirm
+    # the directory is durable and mounted by every instance.
+    app.config['ARCHIVE_DIR'] = os.getenv('ARCHIVE_DIR')
+    app.config['ARCHIVE_DIR_SHARED'] = os.getenv(
+        'ARCHIVE_DIR_SHARED', 'false').lower() == 'true'
+    app.config['ARCHIVE_ACCOUNT_RANGE'] = int(os.getenv('ARCHIVE_ACCOUNT_RANGE', 10000))
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.getenv('ARCHIVE_AFTER_DAYS', 90))
+    # Rows of segment id/account/date columns each worker keeps decoded
+    app.config['ARCHIVE_INDEX_CACHE_ROWS'] = int(os.getenv('ARCHIVE_INDEX_CACHE_ROWS', 200000))
+    if app.config['ARCHIVE_DIR']:
+        from repos.transaction_archive import TransactionArchive
+        app.extensions['transaction_archive'] = TransactionArchive(
+            app.config['ARCHIVE_DIR'], app.config['ARCHIVE_ACCOUNT_RANGE'],
+            app.config['ARCHIVE_INDEX_CACHE_ROWS'])
+
+    # Account numbers reserved from the shared counter per round trip
+    app.config['ACCOUNT_NUMBER_BLOCK_SIZE'] = int(
+        os.getenv('ACCOUNT_NUMBER_BLOCK_SIZE', 100))
+
+    # Token-bucket rate limits per route group (see shared/rate_limit.py).
+    # 'memory' limits each worker on its own; 'database' shares the buckets
+    # between workers through the rate_limit_buckets table.
+    app.config['RATE_LIMIT_ENABLED'] = os.getenv(
+        'RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    app.config['RATE_LIMIT_MAX_KEYS'] = int(os.getenv('RATE_LIMIT_MAX_KEYS', 10000))
+    app.config['RATE_LIMITS'] = {
+        name: os.getenv(f'RATE_LIMIT_{name.upper()}', default)
+        for name, default in rate_limit.DEFAULT_LIMITS.items()
+    }
+    # Proxies in front of the app whose X-Forwarded-For can be trusted, so
+    # per-IP limits see the client address rather than the proxy's
+    app.config['TRUSTED_PROXY_COUNT'] = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
+    # Token lifetimes in seconds. Access tokens are short-lived; clients
+    # exchange the refresh token at /api/auth/refresh for a new pair.
+    app.config['ACCESS_TOKEN_TTL'] = int(os.getenv('ACCESS_TOKEN_TTL', 900))
+    app.config['REFRESH_TOKEN_TTL'] = int(os.getenv('REFRESH_TOKEN_TTL', 14 * 86400))
+
+    # How long a stored Idempotency-Key response can be replayed, in seconds
+    app.config['IDEMPOTENCY_KEY_TTL'] = int(
+        os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+    # How long a request holds its key before a retry may take it over; longer
+    # than any request can run (gunicorn kills workers after 30s)
+    app.config['IDEMPOTENCY_LEASE_SECONDS'] = int(
+        os.getenv('IDEMPOTENCY_LEASE_SECONDS', 60))
+
+    # Optional group commit for deposits: flush every N deposits or M ms
+    app.config['DEPOSIT_GROUP_COMMIT'] = os.getenv(
+        'DEPOSIT_GROUP_COMMIT', 'false').lower() == 'true'
+    app.config['GROUP_COMMIT_MAX_BATCH'] = int(
+        os.getenv('GROUP_COMMIT_MAX_BATCH', 64))
+    app.config['GROUP_COMMIT_MAX_DELAY_MS'] = float(
+        os.getenv('GROUP_COMMIT_MAX_DELAY_MS', 5))
+    app.config['GROUP_COMMIT_TIMEOUT'] = float(
+        os.getenv('GROUP_COMMIT_TIMEOUT', 30))
+
+    # Prometheus metrics on /metrics
+    app.config['METRICS_ENABLED'] = os.getenv(
+        'METRICS_ENABLED', 'true').lower() == 'true'
+
+    # Statement budgets for N+1 detection: 'warn' logs the offending call
+    # sites, 'raise' fails the request, 'off' disables counting. Budgets are
+    # a development and CI aid, so production does not count by default.
+    is_production = is_koyeb or 'production' in (
+        os.getenv('ENVIRONMENT'), os.getenv('FLASK_ENV'))
+    app.config['QUERY_BUDGET_MODE'] = os.getenv(
+        'QUERY_BUDGET_MODE', 'off' if is_production else 'warn')
+    app.config['QUERY_BUDGET_PER_REQUEST'] = int(
+        os.getenv('QUERY_BUDGET_PER_REQUEST', 25))
+
+    # JSON encoding of Decimal amounts: 'float', 'string' or 'minor_units'
+    app.config['JSON_DECIMAL_FORMAT'] = os.getenv('JSON_DECIMAL_FORMAT', 'float')
+    if app.config['JSON_DECIMAL_FORMAT'] not in json_provider.DECIMAL_FORMATS:
+        raise ValueError(f"Unknown JSON_DECIMAL_FORMAT: {app.config['JSON_DECIMAL_FORMAT']}")
+    app.json = json_provider.RevoJSONProvider(app)
+
+    # Password hashing: scheme, cost (rounds; the scheme's default when unset)
+    # and the per-worker pool that bounds how many hashes run at once
+    app.config['PASSWORD_HASH_SCHEME'] = os.getenv('PASSWORD_HASH_SCHEME', 'pbkdf2_sha256')
+    from services.password_service import KNOWN_SCHEMES
+    if app.config['PASSWORD_HASH_SCHEME'] not in KNOWN_SCHEMES:
+        raise ValueError(f"Unknown PASSWORD_HASH_SCHEME: {app.config['PASSWORD_HASH_SCHEME']}")
+    app.config['PASSWORD_HASH_ROUNDS'] = int(os.getenv('PASSWORD_HASH_ROUNDS')) \
+        if os.getenv('PASSWORD_HASH_ROUNDS') else None
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 8))
+
+    # Import models so their tables are registered on the metadata
+    from models import (  # noqa: F401
+        user, account, transaction, idempotency_key, revoked_token, rate_limit_bucket,
+        account_monthly_rollup, account_number_counter)
+
+    # The schema is managed by the migrations (`flask db upgrade`), and the
+    # engine only connects when a request first needs the database, so a
+    # worker can serve health checks as soon as it has booted
+    db.init_app(app)
 
     # Initialize Flask-Migrate
     migrate = Migrate(app, db)
 
+    if app.config['DEPOSIT_GROUP_COMMIT']:
+        from shared.group_commit import GroupCommitter
+        app.extensions['group_commit'] = GroupCommitter(
+            app,
+            max_batch=app.config['GROUP_COMMIT_MAX_BATCH'],
+            max_delay=app.config['GROUP_COMMIT_MAX_DELAY_MS'] / 1000,
+            timeout=app.config['GROUP_COMMIT_TIMEOUT']
+        )
+
+    if app.config['RATE_LIMIT_ENABLED']:
+        rate_limit.init_app(app)
+
+    if replica_url:
+        _, replica_options = pooling.engine_options(replica_url)
+        routing.init_app(app, replica_url, replica_options)
+        replica_timeout = pooling.transaction_statement_timeout(replica_url)
+        if replica_timeout:
+            pooling.apply_statement_timeout(app.extensions['db_replica'], replica_timeout)
+
+    # Track connection pool usage for /health/pool, and hand out account
+    # numbers from blocks reserved per worker
+    with app.app_context():
+        app.extensions['pool_monitor'] = pooling.PoolMonitor(db.engine)
+        statement_timeout = pooling.transaction_statement_timeout(database_url)
+        if statement_timeout:
+            pooling.apply_statement_timeout(db.engine, statement_timeout)
+        app.extensions['account_numbers'] = AccountNumberAllocator(
+            db.engine, block_size=app.config['ACCOUNT_NUMBER_BLOCK_SIZE'])
+
+    # Register maintenance commands
+    from commands import register_commands
+    register_commands(app)
+
     # Register blueprints
     from routers.user_router import user_bp
     from routers.auth_router import auth_bp
@@ -87,6 +226,13 @@ def create_app():
     app.register_blueprint(account_bp, url_prefix='/api/accounts')
     app.register_blueprint(transaction_bp, url_prefix='/api/transactions')
 
+    from shared import query_budget
+    query_budget.init_app(app)
+
+    if app.config['METRICS_ENABLED']:
+        from shared.metrics import metrics
+        metrics.init_app(app)
+
     @app.route('/')
     def index():
         return jsonify({"message": "Welcome to RevoBank API"})
@@ -95,11 +241,27 @@ def create_app():
     def health_check():
         return jsonify({"status": "healthy", "timestamp": datetime.datetime.utcnow()})
 
+    @app.route('/health/pool')
+    def pool_health():
+        return jsonify({
+            "profile": app.config['DB_POOL_PROFILE'],
+            "pool": app.extensions['pool_monitor'].stats()
+        })
+
+    app.config['STARTUP_SECONDS'] = time.perf_counter() - started
+    app.logger.info(f"Application created in {app.config['STARTUP_SECONDS'] * 1000:.0f} ms")
     return app
 
 
-# Create the application instance
-app = create_app()
+def __getattr__(name):
+    # `run:app` (gunicorn) builds the application on first access rather than
+    # on every import of this module
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
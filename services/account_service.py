@@ -1,14 +1,37 @@
-from db.database import db
+from flask import current_app
+from sqlalchemy import exists
+from db.database import db, commit_keeping
 from models.account import Account
+from repos import account_repo
+from services import auth_service
+from shared.query_budget import budget
 
 
+@budget(1)
 def get_user_accounts(user_id):
     """
-    Get all accounts for a specific user
+    Get all accounts for a specific user as read-only rows
     """
-    return Account.query.filter_by(user_id=user_id).all()
+    return account_repo.find_by_user(user_id)
 
 
+@budget(1)
+def get_user_account_ids(user_id):
+    """
+    Get the ids of a user's accounts
+    """
+    return account_repo.find_ids_by_user(user_id)
+
+
+@budget(1)
+def get_account_row(account_id, user_id):
+    """
+    Get one of a user's accounts as a read-only row
+    """
+    return account_repo.find_for_user(account_id, user_id)
+
+
+@budget(1)
 def get_account_by_id(account_id, user_id=None):
     """
     Get account by ID, optionally filtering by user ID for authorization
@@ -19,12 +42,25 @@ def get_account_by_id(account_id, user_id=None):
     return query.first()
 
 
+@budget(1)
+def owns_any_account(user_id, account_ids):
+    """
+    Check whether any of the given accounts belongs to the user
+    """
+    account_ids = [account_id for account_id in account_ids if account_id is not None]
+    if not account_ids:
+        return False
+    return db.session.query(exists().where(
+        Account.id.in_(account_ids), Account.user_id == user_id)).scalar()
+
+
 def create_account(user_id, account_type, initial_balance=0.0):
     """
     Create a new account for a user
     """
     new_account = Account(
         user_id=user_id,
+        account_number=current_app.extensions['account_numbers'].allocate(),
         account_type=account_type,
         balance=initial_balance
     )
@@ -48,7 +84,7 @@ def update_account(account_id, user_id, data):
         account.account_type = data['account_type']
 
     try:
-        db.session.commit()
+        commit_keeping(account)
         return account, None
     except Exception as e:
         db.session.rollback()
@@ -66,6 +102,7 @@ def delete_account(account_id, user_id):
     try:
         db.session.delete(account)
         db.session.commit()
+        auth_service.invalidate_user(user_id)
         return True, None
     except Exception as e:
         db.session.rollback()
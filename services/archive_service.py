@@ -0,0 +1,112 @@
+import uuid
+from datetime import datetime, time
+from sqlalchemy import delete, func, select
+from db.database import db
+from db.partitions import add_months, month_start
+from models.transaction import Transaction
+from flask import current_app
+from repos import transaction_archive, transaction_repo
+from repos.transaction_archive import TransactionArchive
+
+
+class ArchiveNotConfigured(Exception):
+    """
+    Raised when archiving is requested without ARCHIVE_DIR, or before it is
+    declared shared and durable with ARCHIVE_DIR_SHARED
+    """
+
+
+class ArchiveIncomplete(Exception):
+    """
+    Raised when table rows older than the archive boundary could not be
+    found in the archive as read back from disk; those rows are kept
+    """
+
+
+def archive_transactions(cutoff, chunk_size=50000, progress=None):
+    """
+    Move transactions created before `cutoff` from the hot table into the
+    archive. Rows are read month by month in chunks of `chunk_size`, and
+    each chunk is written as its own segments. Once every segment is on
+    disk the manifest moves archived_before to `cutoff`. Rows are then
+    deleted from the table only as they are read back from the published
+    archive on disk. Reads ignore hot rows older than archived_before, so a
+    run that stops before the delete leaves nothing visible twice; the next
+    run deletes those rows.
+
+    Archived rows exist nowhere else, so this refuses to run until
+    ARCHIVE_DIR_SHARED confirms that ARCHIVE_DIR is durable storage every
+    instance mounts. Returns (archived, deleted) row counts.
+    """
+    archive = transaction_archive.current()
+    if archive is None:
+        raise ArchiveNotConfigured('Set ARCHIVE_DIR to archive transactions')
+    if not current_app.config.get('ARCHIVE_DIR_SHARED'):
+        raise ArchiveNotConfigured(
+            'ARCHIVE_DIR must be durable storage shared by every instance; '
+            'set ARCHIVE_DIR_SHARED=true once it is')
+
+    previous = archive.archived_before
+    archived = 0
+    if previous is None or cutoff > previous:
+        newer = [Transaction.created_at < cutoff]
+        if previous is not None:
+            newer.append(Transaction.created_at >= previous)
+        oldest = db.session.execute(select(func.min(Transaction.created_at)).where(*newer)).scalar()
+
+        run = uuid.uuid4().hex[:12]
+        segments = []
+        month = datetime.combine(month_start(oldest), time()) if oldest else None
+        while month is not None and month < cutoff:
+            after_id = 0
+            chunk = 0
+            while True:
+                rows = db.session.execute(
+                    transaction_repo.select_transactions()
+                    .where(*newer, Transaction.created_at >= month,
+                           Transaction.created_at < add_months(month, 1),
+                           Transaction.id > after_id)
+                    .order_by(Transaction.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                segments.extend(archive.write_segments(month, rows, f'{run}-{chunk}'))
+                archived += len(rows)
+                after_id = rows[-1].id
+                chunk += 1
+                if progress:
+                    progress(f'Archived {archived} transactions')
+            month = datetime.combine(add_months(month, 1), time())
+        db.session.rollback()
+        archive.publish(segments, cutoff)
+
+    deleted = 0
+    boundary = archive.archived_before
+    oldest = boundary and db.session.execute(
+        select(func.min(Transaction.created_at)).where(Transaction.created_at < boundary)).scalar()
+    if not oldest:
+        return archived, deleted
+
+    # A fresh copy of the archive only knows what the manifest and segment
+    # files on disk hold, so only rows that can be read back are deleted
+    stored = TransactionArchive(archive.directory, archive.account_range_size)
+    for rows in stored.iter_all(since=oldest):
+        for offset in range(0, len(rows), chunk_size):
+            ids = [row.id for row in rows[offset:offset + chunk_size]]
+            deleted += db.session.execute(
+                delete(Transaction).where(Transaction.id.in_(ids),
+                                          Transaction.created_at < boundary),
+                execution_options={'synchronize_session': 'fetch'}
+            ).rowcount
+            db.session.commit()
+            if progress:
+                progress(f'Deleted {deleted} archived transactions from the table')
+
+    kept = db.session.execute(
+        select(func.count()).select_from(Transaction).where(Transaction.created_at < boundary)
+    ).scalar()
+    if kept:
+        raise ArchiveIncomplete(
+            f'{kept} transactions created before {boundary:%Y-%m-%d} are not in the '
+            'archive on disk; they were kept in the table')
+    return archived, deleted
@@ -1,33 +1,204 @@
 import jwt
 import datetime
+import os
+import uuid
 from functools import wraps
 from flask import request, jsonify, current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from db import routing
 from db.database import db
+from models.revoked_token import RevokedToken
 from models.user import User
+from shared.cache import TTLCache
+from shared.revocation import RevocationList
 
 
-def generate_token(user_id):
+class AuthenticatedUser:
+    """
+    Read-only snapshot of an authenticated user. Unlike a session-bound ORM
+    instance it can be cached and shared between requests and threads.
+    """
+    __slots__ = ('id', 'username', 'email', 'full_name', 'created_at')
+
+    def __init__(self, user):
+        for field in self.__slots__:
+            setattr(self, field, getattr(user, field))
+
+    def __getitem__(self, key):
+        # Handlers and User.to_response read the current user dict-style
+        return getattr(self, key)
+
+
+# Principals of recently authenticated users, keyed by user id. Invalidation
+# is per process, so other workers may serve a stale entry for up to the TTL.
+user_cache = TTLCache(
+    maxsize=int(os.getenv('AUTH_CACHE_MAX_SIZE', 1024)),
+    ttl=float(os.getenv('AUTH_CACHE_TTL', 60))
+)
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached principal for a user whose data has changed
+    """
+    user_cache.invalidate(user_id)
+
+
+def _load_revocations(after_id):
+    # Always from the primary: a lagging replica would let revoked tokens through
+    return db.session.execute(
+        select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+        .where(RevokedToken.id > after_id).order_by(RevokedToken.id),
+        bind_arguments={'bind': db.engine}
+    ).all()
+
+
+# Ids of revoked tokens that have not expired yet, synced from the
+# revoked_tokens table so token checks never query it
+revocations = RevocationList(
+    _load_revocations,
+    interval=float(os.getenv('REVOCATION_SYNC_INTERVAL', 5))
+)
+
+
+def _load_user(user_id):
+    """
+    The user a token names, read again from the primary when the replica
+    does not have it yet, as right after signup
+    """
+    user = db.session.get(User, user_id)
+    if user is None and routing.reads_from_replica():
+        user = db.session.execute(
+            select(User).where(User.id == user_id),
+            bind_arguments={'bind': db.engine}
+        ).scalar()
+    return user
+
+
+class TokenRevoked(jwt.InvalidTokenError):
     """
-    Generate a JWT token for the given user ID
+    The token was revoked before it expired
     """
+
+
+def _encode_token(user_id, token_type, ttl):
+    now = datetime.datetime.now(datetime.timezone.utc)
     payload = {
         'user_id': user_id,
-        'exp': datetime.datetime.now() + datetime.timedelta(hours=24)
+        'type': token_type,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + datetime.timedelta(seconds=ttl)
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
 
+def generate_token(user_id):
+    """
+    Generate a short-lived access token for the given user ID
+    """
+    return _encode_token(user_id, 'access', current_app.config['ACCESS_TOKEN_TTL'])
+
+
+def generate_refresh_token(user_id):
+    """
+    Generate a long-lived refresh token for the given user ID
+    """
+    return _encode_token(user_id, 'refresh', current_app.config['REFRESH_TOKEN_TTL'])
+
+
+def issue_tokens(user_id):
+    """
+    Access and refresh token pair returned by login and refresh
+    """
+    return {
+        'token': generate_token(user_id),
+        'refresh_token': generate_refresh_token(user_id),
+        'expires_in': current_app.config['ACCESS_TOKEN_TTL']
+    }
+
+
+def decode_token(token, token_type='access'):
+    """
+    Decode and validate a token of the given type. Raises a
+    jwt.InvalidTokenError subclass when it is expired, of the wrong type or
+    revoked. Tokens issued before token ids existed are access tokens that
+    cannot be revoked.
+    """
+    data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    if data.get('type', 'access') != token_type:
+        raise jwt.InvalidTokenError(f'Not an {token_type} token')
+    if data.get('jti') and revocations.is_revoked(data['jti']):
+        raise TokenRevoked('Token has been revoked')
+    return data
+
+
+def bearer_token():
+    """
+    The token from the Authorization header, if any
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+
+def revoke_token(data):
+    """
+    Revoke a decoded token until it expires. Returns False when it had
+    already been revoked.
+    """
+    expires_at = datetime.datetime.utcfromtimestamp(data['exp'])
+    db.session.add(RevokedToken(jti=data['jti'], user_id=data.get('user_id'),
+                                expires_at=expires_at))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    revocations.add(data['jti'], expires_at)
+    return True
+
+
+def refresh_tokens(refresh_token):
+    """
+    Exchange a refresh token for a new token pair. The refresh token is
+    revoked on use, so a replayed one is rejected.
+    """
+    try:
+        data = decode_token(refresh_token, 'refresh')
+    except jwt.ExpiredSignatureError:
+        return None, 'Refresh token is expired!'
+    except jwt.InvalidTokenError:
+        return None, 'Refresh token is invalid!'
+
+    if not db.session.get(User, data['user_id']):
+        return None, 'User not found!'
+    if not revoke_token(data):
+        return None, 'Refresh token is invalid!'
+    return issue_tokens(data['user_id']), None
+
+
+def purge_revoked_tokens(now=None):
+    """
+    Delete revocations of tokens that have expired, returning how many were
+    removed
+    """
+    now = now or datetime.datetime.utcnow()
+    removed = RevokedToken.query.filter(
+        RevokedToken.expires_at <= now).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
 def token_required(f):
     """
     Decorator to protect routes that require authentication
     """
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
+        token = bearer_token()
 
         if not token:
             # Return dictionary instead of jsonify for test compatibility
@@ -38,19 +209,24 @@ def token_required(f):
             return {'message': 'Token is invalid!'}, 401
 
         try:
-            # Decode the token
-            data = jwt.decode(
-                token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            # Find the user
-            current_user = User.query.get(data['user_id'])
-            if not current_user:
-                return {'message': 'User not found!'}, 401
+            # Decode the token; revocation is checked in memory
+            data = decode_token(token)
+            # Find the user, skipping the database for recently seen users
+            current_user = user_cache.get(data['user_id'])
+            if current_user is None:
+                user = _load_user(data['user_id'])
+                if not user:
+                    return {'message': 'User not found!'}, 401
+                current_user = AuthenticatedUser(user)
+                user_cache.set(user.id, current_user)
+
+            routing.identify(current_user.id)
 
             # Call the decorated function with the authenticated user
             result = f(current_user, *args, **kwargs)
 
-            # Ensure result is always a tuple of (response, status_code)
-            if isinstance(result, tuple) and len(result) == 2:
+            # Ensure result is always a tuple with a status code
+            if isinstance(result, tuple):
                 return result
             else:
                 # If only response is returned, assume 200 status code
@@ -58,6 +234,8 @@ def token_required(f):
         except jwt.ExpiredSignatureError:
             # Specific exception for expired tokens
             return {'message': 'Token is expired!'}, 401
+        except TokenRevoked:
+            return {'message': 'Token has been revoked!'}, 401
         except jwt.InvalidTokenError:
             # Specific exception for invalid tokens
             return {'message': 'Token is invalid!'}, 401
@@ -0,0 +1,264 @@
+import hashlib
+import datetime
+import uuid
+from functools import wraps
+from flask import request, current_app, g, has_request_context
+from sqlalchemy import event, func, update
+from sqlalchemy.exc import IntegrityError
+from db.database import db
+from db.routing import RoutingSession
+from models.idempotency_key import IdempotencyKey
+from models.transaction import Transaction
+from shared.query_budget import exempt
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+KEY_IN_PROGRESS = 'A request with this Idempotency-Key is still in progress'
+KEY_REUSED = 'This Idempotency-Key was already used for a different request'
+KEY_INTERRUPTED = ('The request with this Idempotency-Key stopped after recording its '
+                   'transactions; it will not run again')
+
+
+def _digest(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return hashlib.sha256(value).hexdigest()
+
+
+def _request_fingerprint():
+    return _digest(request.method.encode('ascii') + b' ' +
+                   request.path.encode('utf-8') + b' ' + request.get_data())
+
+
+class LeaseLost(Exception):
+    """
+    Raised while flushing ledger rows for a claim that a retry has taken
+    over, so the money movement is rolled back instead of done twice
+    """
+
+
+def _new_lease(now):
+    """
+    A fresh (lease_token, locked_until) pair
+    """
+    return uuid.uuid4().hex, now + datetime.timedelta(
+        seconds=current_app.config['IDEMPOTENCY_LEASE_SECONDS'])
+
+
+def _take_over(record, now):
+    """
+    Move an abandoned claim's lease to the current request. Fails when
+    another retry got there first.
+    """
+    record_id = record.id
+    lease_token, locked_until = _new_lease(now)
+    taken = IdempotencyKey.query.filter_by(
+        id=record_id, lease_token=record.lease_token, status_code=None
+    ).update({'lease_token': lease_token, 'locked_until': locked_until},
+             synchronize_session=False)
+    db.session.commit()
+    if not taken:
+        return None, KEY_IN_PROGRESS
+    return db.session.get(IdempotencyKey, record_id), None
+
+
+def claim_key(user_id, key, request_hash):
+    """
+    Claim an idempotency key for a request. Returns the key record, which
+    carries a stored response when the request was already completed, or an
+    error when the key is busy or was used for a different request.
+    """
+    now = datetime.datetime.utcnow()
+    key_hash = _digest(key)
+
+    record = IdempotencyKey.query.filter_by(
+        user_id=user_id, key_hash=key_hash).first()
+
+    if record and record.expires_at <= now:
+        db.session.delete(record)
+        db.session.commit()
+        record = None
+
+    if record is None:
+        record = IdempotencyKey(
+            user_id=user_id,
+            key_hash=key_hash,
+            request_hash=request_hash,
+            created_at=now,
+            expires_at=now + datetime.timedelta(
+                seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+        )
+        record.lease_token, record.locked_until = _new_lease(now)
+        db.session.add(record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request claimed the same key first
+            db.session.rollback()
+            return None, KEY_IN_PROGRESS
+        return record, None
+
+    if record.request_hash != request_hash:
+        return None, KEY_REUSED
+    if record.status_code is None:
+        # The claiming request died without finishing if its lease lapsed
+        if record.locked_until is not None and record.locked_until > now:
+            return None, KEY_IN_PROGRESS
+        return _take_over(record, now)
+    return record, None
+
+
+def recorded_transaction_ids(record):
+    """
+    Ids of the ledger rows committed under the claim, oldest first
+    """
+    if not record.transaction_ids:
+        return []
+    return [int(transaction_id) for transaction_id in record.transaction_ids.split(',')]
+
+
+def claim_active():
+    """
+    Whether the current request runs under an Idempotency-Key claim
+    """
+    return has_request_context() and g.get('idempotency_claim') is not None
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_ledger_writes(session, flush_context):
+    """
+    Record the ids of new ledger rows on the request's claim, in the same
+    database transaction, so a retry can tell whether money already moved.
+    The update is fenced by the lease token.
+    """
+    if not claim_active():
+        return
+    ids = [str(instance.id) for instance in session.new if isinstance(instance, Transaction)]
+    if not ids:
+        return
+    record_id, token = g.idempotency_claim
+    column = IdempotencyKey.transaction_ids
+    with exempt():
+        recorded = session.connection().execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == record_id, IdempotencyKey.lease_token == token)
+            .values(transaction_ids=func.coalesce(column + ',', '') + ','.join(ids))
+        ).rowcount
+    if not recorded:
+        g.idempotency_lease_lost = True
+        raise LeaseLost(KEY_IN_PROGRESS)
+
+
+def complete_key(claim, response):
+    """
+    Store the response of the request that claimed the key. Returns False
+    when the lease was lost to a retry in the meantime.
+    """
+    record_id, token = claim
+    db.session.rollback()
+    stored = IdempotencyKey.query.filter_by(id=record_id, lease_token=token).update({
+        'status_code': response.status_code,
+        'response_body': response.get_data(as_text=True),
+        'locked_until': None,
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(stored)
+
+
+def release_key(claim):
+    """
+    Give up a claimed key so the client can retry the request. A claim that
+    recorded ledger rows is kept, as the movement must not run again.
+    """
+    record_id, token = claim
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(
+        id=record_id, lease_token=token, transaction_ids=None
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def purge_expired_keys(now=None):
+    """
+    Delete expired idempotency keys, returning how many were removed
+    """
+    now = now or datetime.datetime.utcnow()
+    removed = IdempotencyKey.query.filter(
+        IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+def _recover(record, recover):
+    """
+    The response for a claim whose request moved money but died before
+    storing its response, rebuilt from the ledger rows it recorded
+    """
+    transaction_ids = recorded_transaction_ids(record)
+    if recover is not None:
+        return current_app.make_response(recover(transaction_ids))
+    return current_app.make_response(
+        ({'message': KEY_INTERRUPTED, 'transaction_ids': transaction_ids}, 409))
+
+
+def idempotent(f=None, recover=None):
+    """
+    Decorator for money-moving routes (placed below token_required and above
+    rate_limit, so replays are not charged). When the client sends an
+    Idempotency-Key header, the first response is stored and replayed for
+    retries without running the handler again.
+
+    `recover(transaction_ids)` rebuilds the route's response when the request
+    that claimed the key committed its ledger rows but died before storing
+    its response; without it such retries get a 409 listing the ids.
+    """
+    if f is None:
+        return lambda view: idempotent(view, recover=recover)
+
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(current_user, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return {'message': 'Idempotency-Key is too long'}, 400
+
+        record, error = claim_key(current_user.id, key, _request_fingerprint())
+        if error:
+            return {'message': error}, 422 if error == KEY_REUSED else 409
+
+        if record.status_code is not None:
+            replay = current_app.response_class(
+                record.response_body, status=record.status_code,
+                mimetype='application/json')
+            replay.headers['Idempotent-Replayed'] = 'true'
+            return replay, replay.status_code
+
+        claim = (record.id, record.lease_token)
+        if record.transaction_ids:
+            response = _recover(record, recover)
+            complete_key(claim, response)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response, response.status_code
+
+        g.idempotency_claim = claim
+        try:
+            response = current_app.make_response(f(current_user, *args, **kwargs))
+        except Exception:
+            release_key(claim)
+            raise
+        finally:
+            g.idempotency_claim = None
+
+        if g.pop('idempotency_lease_lost', False):
+            return {'message': KEY_IN_PROGRESS}, 409
+        # Server errors and rate limiting are not final, so a retry should run again
+        if response.status_code >= 500 or response.status_code == 429:
+            release_key(claim)
+        elif not complete_key(claim, response):
+            return {'message': KEY_IN_PROGRESS}, 409
+        return response, response.status_code
+
+    return decorated
@@ -0,0 +1,95 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# Every scheme we can verify; their backends are in requirements.txt. The
+# configured one hashes new passwords, the rest are deprecated and replaced
+# by a fresh hash on the next successful login. Plaintext passwords from
+# before hashing were converted once by migration 0010 and never verify.
+KNOWN_SCHEMES = ('pbkdf2_sha256', 'bcrypt', 'argon2')
+
+_contexts = {}
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when too many hashes are already running or queued; the request
+    should be retried later
+    """
+
+
+def _context():
+    """
+    CryptContext for the configured scheme and cost. Hashes with any other
+    cost count as outdated, so raising or lowering the cost rehashes users
+    as they log in.
+    """
+    scheme = current_app.config['PASSWORD_HASH_SCHEME']
+    rounds = current_app.config['PASSWORD_HASH_ROUNDS']
+    key = (scheme, rounds)
+    context = _contexts.get(key)
+    if context is None:
+        settings = {}
+        if rounds is not None:
+            settings = {f'{scheme}__default_rounds': rounds,
+                        f'{scheme}__min_rounds': rounds,
+                        f'{scheme}__max_rounds': rounds}
+        schemes = [scheme] + [known for known in KNOWN_SCHEMES if known != scheme]
+        context = _contexts[key] = CryptContext(
+            schemes=schemes, default=scheme, deprecated='auto', **settings)
+    return context
+
+
+def _run(fn, *args):
+    """
+    Run a hash computation on the bounded hashing pool. At most
+    PASSWORD_HASH_WORKERS hashes run at once and PASSWORD_HASH_MAX_PENDING
+    may be admitted in total; beyond that PasswordHashingBusy is raised
+    instead of letting a login burst tie up every request thread.
+    """
+    global _executor, _slots
+    # Created on first use so that each forked worker gets its own pool
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = current_app.config['PASSWORD_HASH_WORKERS']
+                _slots = threading.BoundedSemaphore(
+                    max(workers, current_app.config['PASSWORD_HASH_MAX_PENDING']))
+                _executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='password-hash')
+
+    if not _slots.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        return _executor.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    """
+    Hash a password with the configured scheme and cost
+    """
+    return _run(_context().hash, password)
+
+
+def verify_password(password, password_hash):
+    """
+    Check a password against a stored hash. Returns (valid, new_hash), where
+    new_hash is set when the stored hash is outdated and should be replaced.
+    """
+    if not password_hash:
+        return False, None
+    try:
+        return _run(_context().verify_and_update, password, password_hash)
+    except ValueError:
+        # Not a hash of any known scheme, so no password can match it
+        logger.warning('Stored password hash has an unknown format')
+        return False, None
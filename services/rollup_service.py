@@ -0,0 +1,175 @@
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import or_, select, update
+from db.database import db
+from models.account import Account
+from models.account_monthly_rollup import AccountMonthlyRollup
+from models.transaction import Transaction
+from repos import transaction_archive
+from shared.query_budget import budget
+
+COUNTERS = ('inflow_total', 'inflow_count', 'outflow_total', 'outflow_count')
+
+
+def month_start(moment):
+    """
+    First day of the month containing `moment`
+    """
+    return date(moment.year, moment.month, 1)
+
+
+def _totals(transactions, totals=None):
+    """
+    Sum transactions into {(account_id, month): [inflow_total, inflow_count,
+    outflow_total, outflow_count]}. Money leaves the source account and
+    enters the destination account.
+    """
+    totals = {} if totals is None else totals
+    for transaction in transactions:
+        month = month_start(transaction.created_at)
+        amount = Decimal(transaction.amount)
+        if transaction.source_account_id is not None:
+            counters = totals.setdefault((transaction.source_account_id, month), [0, 0, 0, 0])
+            counters[2] += amount
+            counters[3] += 1
+        if transaction.destination_account_id is not None:
+            counters = totals.setdefault((transaction.destination_account_id, month), [0, 0, 0, 0])
+            counters[0] += amount
+            counters[1] += 1
+    return totals
+
+
+def _rows(totals):
+    return [dict(zip(COUNTERS, counters), account_id=account_id, month=month)
+            for (account_id, month), counters in totals.items()]
+
+
+def _aggregate(transactions):
+    """
+    Rollup rows adding up `transactions`
+    """
+    return _rows(_totals(transactions))
+
+
+def _upsert(session, rows):
+    table = AccountMonthlyRollup.__table__
+    dialect = session.get_bind(mapper=AccountMonthlyRollup).dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=['account_id', 'month'],
+            set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS})
+        session.execute(statement, rows)
+        return
+
+    # Other databases: add to the row, creating it when it is missing
+    for row in rows:
+        updated = session.execute(
+            update(table).where(table.c.account_id == row['account_id'],
+                                table.c.month == row['month'])
+            .values({name: table.c[name] + row[name] for name in COUNTERS})
+        ).rowcount
+        if not updated:
+            session.execute(table.insert().values(**row))
+
+
+def apply_rollups(session, transactions):
+    """
+    Add transactions to their accounts' monthly rollups in the session's
+    current database transaction, so rollups commit or roll back with them
+    """
+    rows = _aggregate(transactions)
+    if rows:
+        _upsert(session, rows)
+
+
+@budget(1)
+def get_account_summary(account_id, start_month=None, end_month=None):
+    """
+    Monthly inflow and outflow totals of an account, oldest month first
+    """
+    query = select(AccountMonthlyRollup).where(AccountMonthlyRollup.account_id == account_id)
+    if start_month:
+        query = query.where(AccountMonthlyRollup.month >= start_month)
+    if end_month:
+        query = query.where(AccountMonthlyRollup.month <= end_month)
+    return db.session.execute(query.order_by(AccountMonthlyRollup.month)).scalars().all()
+
+
+def _rebuild_accounts(account_ids, boundary, archived):
+    """
+    Replace the rollups of `account_ids` with totals recounted from their
+    history, in one database transaction. Returns the number of live
+    transactions read for them.
+    """
+    # Every money movement updates its accounts' rows before it writes the
+    # ledger and rollups, so holding these locks waits for movements in
+    # flight and holds back new ones until the recount is committed. Rows
+    # are locked in id order, like transfers lock them.
+    db.session.execute(select(Account.id).where(Account.id.in_(account_ids))
+                       .order_by(Account.id).with_for_update())
+
+    wanted = set(account_ids)
+    totals = {key: list(counters) for key, counters in archived.items() if key[0] in wanted}
+    # Rows older than the archive boundary were already counted from it
+    live = [Transaction.created_at >= boundary] if boundary else []
+    query = (select(Transaction.id, Transaction.source_account_id,
+                    Transaction.destination_account_id, Transaction.amount,
+                    Transaction.created_at)
+             .where(or_(Transaction.source_account_id.in_(account_ids),
+                        Transaction.destination_account_id.in_(account_ids)), *live))
+    read = 0
+    for transaction in db.session.execute(query):
+        _totals([transaction], totals)
+        # A transfer between two chunks is counted where its source account is
+        owner = transaction.source_account_id or transaction.destination_account_id
+        read += owner in wanted
+    totals = {key: counters for key, counters in totals.items() if key[0] in wanted}
+
+    table = AccountMonthlyRollup.__table__
+    db.session.execute(table.delete().where(table.c.account_id.in_(account_ids)))
+    if totals:
+        db.session.execute(table.insert(), _rows(totals))
+    db.session.commit()
+    return read
+
+
+def backfill_rollups(chunk_size=100, progress=None):
+    """
+    Rebuild every rollup from the transaction history (archived
+    transactions included), `chunk_size` accounts per database transaction.
+    The live table is never emptied: readers see each account's old rollups
+    until its recount commits, and money moving meanwhile waits for the
+    recount of its accounts. Returns the number of transactions read.
+    """
+    archive = transaction_archive.current()
+    boundary = archive.archived_before if archive else None
+
+    # Archived transactions never change; add them up once for every chunk
+    archived = {}
+    processed = 0
+    if boundary:
+        for rows in archive.iter_all():
+            _totals(rows, archived)
+            processed += len(rows)
+            if progress:
+                progress(processed)
+
+    after_id = 0
+    while True:
+        account_ids = db.session.execute(
+            select(Account.id).where(Account.id > after_id)
+            .order_by(Account.id).limit(chunk_size)
+        ).scalars().all()
+        if not account_ids:
+            break
+        processed += _rebuild_accounts(account_ids, boundary, archived)
+        after_id = account_ids[-1]
+        if progress:
+            progress(processed)
+    return processed
@@ -1,68 +1,408 @@
 from datetime import datetime
-from db.database import db
+from itertools import chain
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import func, literal, select, union_all, update
+from flask import current_app
+from db.database import db, commit_keeping
 from models.account import Account
 from models.transaction import Transaction
+from repos import transaction_archive, transaction_repo
+from services import idempotency_service
+from services.rollup_service import apply_rollups
+from shared.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+from shared.query_budget import budget
 
+# Rows fetched per round trip when streaming statements and exports
+STATEMENT_BATCH_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
 
-def get_user_transactions(user_accounts, account_id=None, start_date=None, end_date=None):
+
+def _history_scope(user_accounts, account_id=None):
     """
-    Get transactions for a user's accounts with optional filtering
+    The account ids a history query covers, and the other account every row
+    must involve when `account_id` is not one of the user's own
     """
-    query = Transaction.query.filter(
-        (Transaction.from_account_id.in_(user_accounts)) |
-        (Transaction.to_account_id.in_(user_accounts))
-    )
-
+    account_ids = [int(account) for account in user_accounts]
     if account_id:
-        query = query.filter(
-            (Transaction.from_account_id == account_id) |
-            (Transaction.to_account_id == account_id)
+        account_id = int(account_id)
+        if account_id in account_ids:
+            return [account_id], None
+        return account_ids, account_id
+    return account_ids, None
+
+
+def _archive_boundary():
+    """
+    The archive and its archived_before, or (None, None) without an archive
+    """
+    archive = transaction_archive.current()
+    boundary = archive.archived_before if archive else None
+    return (archive, boundary) if boundary else (None, None)
+
+
+def user_transactions_query(user_accounts, account_id=None, start_date=None, end_date=None,
+                            limit=None, before=None, oldest_first=False, archived_before=None):
+    """
+    Build the history query for a user's accounts, newest first (or oldest
+    first for exports).
+
+    Rather than one `source IN (...) OR destination IN (...)` scan, the query
+    is a UNION ALL of two branches that each walk one of the
+    (account, created_at) indexes. A transfer between two of the user's own
+    accounts matches both branches, so the destination branch skips rows
+    already produced by the source branch.
+
+    Date bounds and the cursor are applied inside both branches, so on a
+    partitioned table each branch only reads the months in range. Rows older
+    than `archived_before` belong to the archive and are left out.
+    """
+    account_ids, counterparty = _history_scope(user_accounts, account_id)
+
+    filters = []
+    if counterparty is not None:
+        filters.append(
+            (Transaction.source_account_id == counterparty) |
+            (Transaction.destination_account_id == counterparty)
         )
 
+    if archived_before:
+        filters.append(Transaction.created_at >= archived_before)
+
     if start_date:
-        query = query.filter(Transaction.created_at >=
-                             datetime.fromisoformat(start_date))
+        filters.append(Transaction.created_at >=
+                       datetime.fromisoformat(start_date))
 
     if end_date:
-        query = query.filter(Transaction.created_at <=
-                             datetime.fromisoformat(end_date))
+        filters.append(Transaction.created_at <=
+                       datetime.fromisoformat(end_date))
+
+    if before:
+        created_at, transaction_id = before
+        filters.append(
+            (Transaction.created_at < created_at) |
+            ((Transaction.created_at == created_at) &
+             (Transaction.id < transaction_id))
+        )
+        # Redundant with the keyset condition, but a plain bound lets
+        # PostgreSQL skip the monthly partitions newer than the cursor
+        filters.append(Transaction.created_at <= created_at)
+
+    outgoing = transaction_repo.select_transactions().where(
+        Transaction.source_account_id.in_(account_ids), *filters)
+    incoming = transaction_repo.select_transactions().where(
+        Transaction.destination_account_id.in_(account_ids),
+        Transaction.source_account_id.is_(None) |
+        Transaction.source_account_id.not_in(account_ids),
+        *filters)
+
+    if limit:
+        # Each branch only needs its own newest `limit` rows before the merge
+        outgoing = select(outgoing.order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()
+        ).limit(limit).subquery())
+        incoming = select(incoming.order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()
+        ).limit(limit).subquery())
+
+    history = union_all(outgoing, incoming).subquery()
+    if oldest_first:
+        query = select(history).order_by(history.c.created_at, history.c.id)
+    else:
+        query = select(history).order_by(history.c.created_at.desc(),
+                                          history.c.id.desc())
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+@budget(1)
+def get_user_transactions(user_accounts, account_id=None, start_date=None, end_date=None,
+                          limit=None, before=None):
+    """
+    Get transactions for a user's accounts with optional filtering, newest
+    first, as read-only rows. `before` is a (created_at, id) keyset position;
+    only older rows are returned.
+    """
+    if not user_accounts:
+        return []
+
+    archive, boundary = _archive_boundary()
+    query = user_transactions_query(
+        user_accounts, account_id, start_date, end_date, limit, before,
+        archived_before=boundary)
+    transactions = transaction_repo.fetch_all(query)
+
+    if archive and (not limit or len(transactions) < limit):
+        # Archived rows are all older than live ones, so they follow them
+        transactions += _archived_history(
+            archive, boundary, user_accounts, account_id, start_date, end_date,
+            limit=limit - len(transactions) if limit else None, before=before)
+    return transactions
+
+
+def _archived_history(archive, boundary, user_accounts, account_id=None, start_date=None,
+                      end_date=None, limit=None, before=None, oldest_first=False):
+    """
+    The archived part of a history query; empty when the range starts at or
+    after the archive boundary
+    """
+    start = datetime.fromisoformat(start_date) if start_date else None
+    if start and start >= boundary:
+        return []
+    end = datetime.fromisoformat(end_date) if end_date else None
+    account_ids, counterparty = _history_scope(user_accounts, account_id)
+    return archive.find(account_ids, counterparty, start, end, before=before,
+                        limit=limit, oldest_first=oldest_first)
+
+
+def _archived_batches(months):
+    """
+    Regroup per-month archived rows into EXPORT_BATCH_SIZE slices
+    """
+    batch = []
+    for rows in months:
+        batch.extend(rows)
+        while len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch[:EXPORT_BATCH_SIZE]
+            batch = batch[EXPORT_BATCH_SIZE:]
+    if batch:
+        yield batch
+
+
+@budget(1)
+def stream_user_transactions(user_accounts, account_id=None, start_date=None, end_date=None):
+    """
+    Stream a user's transactions oldest first, in batches of
+    EXPORT_BATCH_SIZE rows. Rows are fetched through a server-side cursor
+    where the driver has one, so memory use does not grow with the live
+    history. Archived rows in range come first, read one month of segments
+    at a time as the export reaches them.
+    """
+    if not user_accounts:
+        return iter(())
+
+    archive, boundary = _archive_boundary()
+    months = iter(())
+    start = datetime.fromisoformat(start_date) if start_date else None
+    if archive and not (start and start >= boundary):
+        account_ids, counterparty = _history_scope(user_accounts, account_id)
+        end = datetime.fromisoformat(end_date) if end_date else None
+        months = archive.iter_months(account_ids, counterparty, start, end, oldest_first=True)
+
+    query = user_transactions_query(
+        user_accounts, account_id, start_date, end_date, oldest_first=True,
+        archived_before=boundary)
+    result = db.session.execute(
+        query, execution_options={'yield_per': EXPORT_BATCH_SIZE})
+
+    def batches():
+        # Release the cursor even when the client disconnects mid-export
+        try:
+            yield from _archived_batches(months)
+            yield from result.partitions()
+        finally:
+            result.close()
+
+    return batches()
+
+
+@budget(1)
+def get_user_transactions_page(user_accounts, account_id=None, start_date=None, end_date=None,
+                               limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Get one page of transactions and the cursor for the page after it
+    (None when this is the last page)
+    """
+    before = decode_cursor(cursor) if cursor else None
+
+    # Fetch one extra row to learn whether another page exists
+    transactions = get_user_transactions(
+        user_accounts, account_id, start_date, end_date,
+        limit=limit + 1, before=before
+    )
 
-    return query.all()
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
 
+    return transactions, next_cursor
 
+
+def _account_legs(account_id, start=None, end=None, archived_before=None):
+    """
+    One row per movement on an account: outgoing legs carry a negative
+    amount, incoming legs a positive one. Each branch walks one of the
+    (account, created_at) indexes.
+    """
+    def leg(account_column, amount):
+        query = select(
+            Transaction.id, Transaction.transaction_type, Transaction.description,
+            Transaction.status, Transaction.created_at, amount.label('amount')
+        ).where(account_column == account_id)
+        if archived_before:
+            query = query.where(Transaction.created_at >= archived_before)
+        if start:
+            query = query.where(Transaction.created_at >= start)
+        if end:
+            query = query.where(Transaction.created_at <= end)
+        return query
+
+    return union_all(
+        leg(Transaction.source_account_id, -Transaction.amount),
+        leg(Transaction.destination_account_id, Transaction.amount)
+    ).subquery()
+
+
+@budget(2)
+def get_account_statement(account_id, start=None, end=None):
+    """
+    Build a statement for an account between two datetimes.
+
+    The opening balance is the current balance minus everything that moved
+    since `start`, so only rows from `start` onwards are read rather than the
+    account's whole history. Running balances are computed in SQL with a
+    window function. Returns the opening balance and a result that streams
+    the statement rows.
+
+    When `start` reaches into the archive, its legs since `start` are read
+    once. All of them are subtracted from the opening balance, and those up
+    to `end` come first in the statement. They are all older than the live
+    legs, so the live running balances stay as computed in SQL.
+    """
+    archive, boundary = _archive_boundary()
+    archived = archive.account_legs(account_id, start) \
+        if archive and (start is None or start < boundary) else []
+
+    moved_since = select(func.coalesce(func.sum(
+        _account_legs(account_id, start, archived_before=boundary).c.amount), 0)).scalar_subquery()
+    live_opening_balance = db.session.execute(
+        select(Account.balance - moved_since).where(Account.id == account_id)
+    ).scalar_one()
+
+    legs = _account_legs(account_id, start, end, archived_before=boundary)
+    running_balance = literal(live_opening_balance, Account.balance.type) + func.sum(
+        legs.c.amount).over(order_by=(legs.c.created_at, legs.c.id, legs.c.amount), rows=(None, 0))
+    rows = db.session.execute(
+        select(legs, running_balance.label('running_balance'))
+        .order_by(legs.c.created_at, legs.c.id, legs.c.amount),
+        execution_options={'yield_per': STATEMENT_BATCH_SIZE}
+    )
+    if not archived:
+        return live_opening_balance, rows
+
+    # Every archived leg since `start` is subtracted; only those up to
+    # `end` are part of the statement
+    opening_balance = live_opening_balance - sum(leg.amount for leg in archived)
+    shown = [leg for leg in archived if end is None or leg.created_at <= end]
+
+    def archived_rows():
+        balance = opening_balance
+        for leg in shown:
+            balance += leg.amount
+            yield leg._replace(running_balance=balance)
+
+    return opening_balance, chain(archived_rows(), rows)
+
+
+@budget(1)
 def get_transaction_by_id(transaction_id):
     """
-    Get a transaction by ID
+    Get a transaction by ID, looking in the archive when it is not live
     """
-    return Transaction.query.get(transaction_id)
+    transaction = db.session.get(Transaction, transaction_id)
+    if transaction is None:
+        archive = transaction_archive.current()
+        if archive:
+            transaction = archive.get(transaction_id)
+    return transaction
 
 
-def create_deposit(user_id, destination_account_id, amount):
+def _credit(session, account_id, amount, user_id=None):
     """
-    Process a deposit transaction
+    Add `amount` to an account in a single conditional UPDATE.
+    Returns False when no matching account was found.
+    """
+    statement = update(Account).where(Account.id == account_id)
+    if user_id is not None:
+        statement = statement.where(Account.user_id == user_id)
+    statement = statement.values(balance=Account.balance + amount)
+    return session.execute(
+        statement, execution_options={'synchronize_session': False}
+    ).rowcount == 1
+
+
+def _debit(session, account_id, amount, user_id=None):
+    """
+    Subtract `amount` from an account in a single conditional UPDATE that
+    only succeeds while the balance covers it, so concurrent withdrawals can
+    never overdraw the account. Returns False when nothing was debited.
     """
-    destination_account = Account.query.filter_by(
-        id=destination_account_id,
-        user_id=user_id
-    ).first()
+    statement = update(Account).where(Account.id == account_id,
+                                      Account.balance >= amount)
+    if user_id is not None:
+        statement = statement.where(Account.user_id == user_id)
+    statement = statement.values(balance=Account.balance - amount)
+    return session.execute(
+        statement, execution_options={'synchronize_session': False}
+    ).rowcount == 1
+
 
-    if not destination_account:
+def _owned_account_exists(account_id, user_id):
+    return Account.query.filter_by(id=account_id, user_id=user_id).first() is not None
+
+
+def _record_deposit(session, user_id, destination_account_id, amount):
+    """
+    Credit the account, add the ledger row to `session` and count it in the
+    monthly rollup, without committing
+    """
+    if not _credit(session, destination_account_id, amount, user_id=user_id):
         return None, 'Invalid account'
 
-    try:
-        # Process deposit
-        destination_account.balance += amount
+    new_transaction = Transaction(
+        transaction_type='deposit',
+        amount=amount,
+        destination_account_id=destination_account_id,
+        created_at=datetime.utcnow()
+    )
+    session.add(new_transaction)
+    apply_rollups(session, [new_transaction])
+    return new_transaction, None
 
-        # Create transaction record
-        new_transaction = Transaction(
-            type='deposit',
-            amount=amount,
-            to_account_id=destination_account.id,
-            created_at=datetime.utcnow()
-        )
 
-        db.session.add(new_transaction)
-        db.session.commit()
+@budget(3)
+def create_deposit(user_id, destination_account_id, amount):
+    """
+    Process a deposit transaction
+    """
+    # With group commit enabled the deposit shares a commit with other
+    # concurrent deposits; this returns once that commit is durable. Deposits
+    # under an Idempotency-Key commit on their own, so the key's ledger
+    # record shares their transaction.
+    group_committer = current_app.extensions.get('group_commit')
+    if group_committer and not idempotency_service.claim_active():
+        try:
+            # Deposits of a group lock their accounts in id order, like transfers
+            lock_key = int(destination_account_id)
+        except (TypeError, ValueError):
+            lock_key = 0
+        try:
+            return group_committer.submit(lambda session: _record_deposit(
+                session, user_id, destination_account_id, amount), lock_key=lock_key)
+        except Exception as e:
+            return None, str(e)
+
+    try:
+        # Process deposit and create transaction record
+        new_transaction, error = _record_deposit(
+            db.session, user_id, destination_account_id, amount)
+        if error:
+            db.session.rollback()
+            return None, error
+
+        commit_keeping(new_transaction)
 
         return new_transaction, None
     except Exception as e:
@@ -70,35 +410,30 @@ def create_deposit(user_id, destination_account_id, amount):
         return None, str(e)
 
 
+@budget(3)
 def create_withdrawal(user_id, source_account_id, amount):
     """
     Process a withdrawal transaction
     """
-    source_account = Account.query.filter_by(
-        id=source_account_id,
-        user_id=user_id
-    ).first()
-
-    if not source_account:
-        return None, 'Invalid account'
-
-    if source_account.balance < amount:
-        return None, 'Insufficient balance'
-
     try:
         # Process withdrawal
-        source_account.balance -= amount
+        if not _debit(db.session, source_account_id, amount, user_id=user_id):
+            db.session.rollback()
+            if not _owned_account_exists(source_account_id, user_id):
+                return None, 'Invalid account'
+            return None, 'Insufficient balance'
 
         # Create transaction record
         new_transaction = Transaction(
-            type='withdrawal',
+            transaction_type='withdrawal',
             amount=amount,
-            from_account_id=source_account.id,
+            source_account_id=source_account_id,
             created_at=datetime.utcnow()
         )
 
         db.session.add(new_transaction)
-        db.session.commit()
+        apply_rollups(db.session, [new_transaction])
+        commit_keeping(new_transaction)
 
         return new_transaction, None
     except Exception as e:
@@ -106,44 +441,169 @@ def create_withdrawal(user_id, source_account_id, amount):
         return None, str(e)
 
 
+@budget(4)
 def create_transfer(user_id, source_account_id, destination_account_id, amount):
     """
     Process a transfer transaction
     """
-    source_account = Account.query.filter_by(
-        id=source_account_id,
-        user_id=user_id
-    ).first()
-
-    if not source_account:
+    # Checked before any row is locked, which needs the ids as numbers
+    try:
+        source_account_id = int(source_account_id)
+    except (TypeError, ValueError):
         return None, 'Invalid source account'
-
-    destination_account = Account.query.get(destination_account_id)
-
-    if not destination_account:
+    try:
+        destination_account_id = int(destination_account_id)
+    except (TypeError, ValueError):
         return None, 'Invalid destination account'
 
-    if source_account.balance < amount:
-        return None, 'Insufficient balance'
-
     try:
-        # Process transfer
-        source_account.balance -= amount
-        destination_account.balance += amount
+        # Process transfer. Rows are updated (and so locked) in ascending id
+        # order, so two opposing transfers between the same accounts cannot
+        # deadlock each other.
+        if source_account_id <= destination_account_id:
+            moved = (_debit(db.session, source_account_id, amount, user_id=user_id) and
+                     _credit(db.session, destination_account_id, amount))
+        else:
+            moved = (_credit(db.session, destination_account_id, amount) and
+                     _debit(db.session, source_account_id, amount, user_id=user_id))
+
+        if not moved:
+            db.session.rollback()
+            if not _owned_account_exists(source_account_id, user_id):
+                return None, 'Invalid source account'
+            if not db.session.get(Account, destination_account_id):
+                return None, 'Invalid destination account'
+            return None, 'Insufficient balance'
 
         # Create transaction record
         new_transaction = Transaction(
-            type='transfer',
+            transaction_type='transfer',
             amount=amount,
-            from_account_id=source_account.id,
-            to_account_id=destination_account.id,
+            source_account_id=source_account_id,
+            destination_account_id=destination_account_id,
             created_at=datetime.utcnow()
         )
 
         db.session.add(new_transaction)
-        db.session.commit()
+        apply_rollups(db.session, [new_transaction])
+        commit_keeping(new_transaction)
 
         return new_transaction, None
     except Exception as e:
         db.session.rollback()
         return None, str(e)
+
+
+def _apply_batch_item(user_id, item, accounts):
+    """
+    Apply one batch item to the already loaded `accounts`, returning the
+    transaction to record or an error message
+    """
+    transaction_type = item.get('transaction_type')
+    try:
+        amount = Decimal(str(item.get('amount')))
+    except InvalidOperation:
+        return None, 'Invalid amount'
+    if not amount.is_finite() or amount <= 0:
+        return None, 'Amount must be positive'
+
+    def owned(account):
+        return account if account and account.user_id == user_id else None
+
+    source = accounts.get(item.get('source_account_id'))
+    destination = accounts.get(item.get('destination_account_id'))
+
+    if transaction_type == 'deposit':
+        if not owned(destination):
+            return None, 'Invalid account'
+        source = None
+    elif transaction_type == 'withdrawal':
+        if not owned(source):
+            return None, 'Invalid account'
+        destination = None
+    elif transaction_type == 'transfer':
+        if not owned(source):
+            return None, 'Invalid source account'
+        if not destination:
+            return None, 'Invalid destination account'
+    else:
+        return None, 'Invalid transaction type'
+
+    if source is not None:
+        if source.balance < amount:
+            return None, 'Insufficient balance'
+        source.balance -= amount
+    if destination is not None:
+        destination.balance += amount
+
+    return Transaction(
+        transaction_type=transaction_type,
+        amount=amount,
+        source_account_id=source.id if source is not None else None,
+        destination_account_id=destination.id if destination is not None else None,
+        created_at=datetime.utcnow()
+    ), None
+
+
+def _apply_batch_chunk(user_id, items, offset):
+    """
+    Apply a chunk of batch items in a single database transaction
+    """
+    account_ids = set()
+    for item in items:
+        for key in ('source_account_id', 'destination_account_id'):
+            try:
+                item[key] = int(item[key])
+                account_ids.add(item[key])
+            except (KeyError, TypeError, ValueError):
+                item[key] = None
+
+    # One query loads every account the chunk touches. The rows are locked in
+    # id order, so single transfers and other batches queue behind this one
+    # instead of deadlocking with it.
+    accounts = {
+        account.id: account
+        for account in Account.query.filter(Account.id.in_(account_ids))
+        .order_by(Account.id).with_for_update()
+    }
+
+    results = []
+    created = []
+    for index, item in enumerate(items, start=offset):
+        new_transaction, error = _apply_batch_item(user_id, item, accounts)
+        if error:
+            results.append({'index': index, 'status': 'failed', 'message': error})
+        else:
+            created.append((index, new_transaction))
+
+    try:
+        db.session.add_all(transaction for _, transaction in created)
+        apply_rollups(db.session, [transaction for _, transaction in created])
+        # Flush before committing so responses are built without reloading
+        db.session.flush()
+        results.extend({
+            'index': index,
+            'status': 'completed',
+            'transaction': Transaction.to_response(transaction)
+        } for index, transaction in created)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        results = [{'index': index, 'status': 'failed', 'message': str(e)}
+                   for index in range(offset, offset + len(items))]
+
+    return sorted(results, key=lambda result: result['index'])
+
+
+def create_batch(user_id, items, chunk_size=None):
+    """
+    Process many deposits, withdrawals and transfers, committing once per
+    chunk of `chunk_size` items (once for the whole batch by default).
+    Returns one result per item, in submission order.
+    """
+    chunk_size = chunk_size or len(items)
+    results = []
+    for offset in range(0, len(items), chunk_size):
+        results.extend(_apply_batch_chunk(
+            user_id, [dict(item) for item in items[offset:offset + chunk_size]], offset))
+    return results
@@ -1,5 +1,6 @@
 from db.database import db
 from models.user import User
+from services import auth_service, password_service
 
 
 def create_user(username, password, email, full_name=''):
@@ -11,7 +12,8 @@ def create_user(username, password, email, full_name=''):
         return None, 'Username already exists'
 
     # Create new user
-    new_user = User(username=username, password_hash=password,
+    new_user = User(username=username,
+                    password_hash=password_service.hash_password(password),
                     email=email, full_name=full_name)
     db.session.add(new_user)
     db.session.commit()
@@ -26,6 +28,18 @@ def get_user_by_username(username):
     return User.query.filter_by(username=username).first()
 
 
+def update_password_hash(user, password_hash):
+    """
+    Replace an outdated password hash after a successful login
+    """
+    user.password_hash = password_hash
+    try:
+        db.session.commit()
+    except Exception:
+        # The old hash still works, so the upgrade can wait for the next login
+        db.session.rollback()
+
+
 def get_user_by_id(user_id):
     """
     Find a user by ID
@@ -50,7 +64,6 @@ def update_user(user_id, data):
 
     # Update in database
     db.session.commit()
-
-    return user, None
+    auth_service.invalidate_user(user.id)
 
     return user, None
@@ -0,0 +1,104 @@
+import os
+import threading
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+# Account numbers are NUMBER_WIDTH digits followed by a Luhn check digit
+FIRST_ACCOUNT_NUMBER = 1000000000
+NUMBER_WIDTH = 10
+COUNTER_NAME = 'account'
+
+
+def luhn_check_digit(digits):
+    """
+    Luhn check digit for a string of digits
+    """
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        # Every second digit from the right, counting the check digit, is doubled
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_account_number(number):
+    """
+    Whether `number` is all digits and ends in its Luhn check digit
+    """
+    return (isinstance(number, str) and len(number) > 1 and number.isdigit()
+            and luhn_check_digit(number[:-1]) == number[-1])
+
+
+class AccountNumberAllocator:
+    """
+    Hands out unique account numbers from blocks of `block_size` values
+    reserved in the account_number_counters table. Reserving a block is one
+    UPDATE, committed on its own connection, so numbers are never handed out
+    twice and no create has to retry. Every other allocation is served from
+    memory. Numbers of a block left unused when the worker exits are skipped.
+    """
+
+    def __init__(self, engine, block_size=100, counter=COUNTER_NAME):
+        if block_size < 1:
+            raise ValueError(f'Invalid account number block size: {block_size}')
+        self.engine = engine
+        self.block_size = block_size
+        self.counter = counter
+        self.reservations = 0
+        self._next = self._end = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _advance(self, connection, table):
+        statement = (update(table).where(table.c.name == self.counter)
+                     .values(next_value=table.c.next_value + self.block_size))
+        if connection.dialect.update_returning:
+            return connection.execute(statement.returning(table.c.next_value)).scalar()
+        if not connection.execute(statement).rowcount:
+            return None
+        # The UPDATE holds the row lock, so this reads our own increment
+        return connection.execute(
+            select(table.c.next_value).where(table.c.name == self.counter)).scalar()
+
+    def _reserve(self):
+        """
+        Reserve the next block. Returns its (first, end) values.
+        """
+        from models.account_number_counter import AccountNumberCounter
+
+        table = AccountNumberCounter.__table__
+        with self.engine.begin() as connection:
+            end = self._advance(connection, table)
+
+        if end is None:
+            # Databases built without the migrations have no counter row yet
+            try:
+                end = FIRST_ACCOUNT_NUMBER + self.block_size
+                with self.engine.begin() as connection:
+                    connection.execute(table.insert().values(name=self.counter, next_value=end))
+            except IntegrityError:
+                # Another worker created it first
+                with self.engine.begin() as connection:
+                    end = self._advance(connection, table)
+
+        self.reservations += 1
+        return end - self.block_size, end
+
+    def allocate(self):
+        """
+        Next unique account number, check digit included
+        """
+        with self._lock:
+            # A forked worker must not reuse the block its parent reserved
+            if self._next >= self._end or self._pid != os.getpid():
+                self._next, self._end = self._reserve()
+                self._pid = os.getpid()
+            value = self._next
+            self._next += 1
+
+        digits = f'{value:0{NUMBER_WIDTH}d}'
+        return digits + luhn_check_digit(digits)
@@ -0,0 +1,66 @@
+import json
+import os
+import struct
+import zlib
+
+# File layout: MAGIC, a 4-byte big-endian header length, a JSON header
+# listing each column's offset and length, then one zlib-compressed JSON
+# array per column. A reader only decompresses the columns it asks for.
+MAGIC = b'RVCOL1\n'
+_HEADER_LENGTH = struct.Struct('>I')
+
+
+def write_columns(path, columns, level=6):
+    """
+    Write `columns` ({name: list of JSON-serializable values}, all the same
+    length) to a new file at `path`. The file is written under a temporary
+    name and renamed into place, so readers never see a partial file.
+    Returns the file size in bytes.
+    """
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError('Columns must all have the same length')
+
+    blobs = []
+    entries = []
+    offset = 0
+    for name, values in columns.items():
+        blob = zlib.compress(json.dumps(values, separators=(',', ':')).encode('utf-8'), level)
+        entries.append({'name': name, 'offset': offset, 'length': len(blob)})
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps({'rows': lengths.pop() if lengths else 0,
+                         'columns': entries}).encode('utf-8')
+
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(MAGIC)
+        file.write(_HEADER_LENGTH.pack(len(header)))
+        file.write(header)
+        for blob in blobs:
+            file.write(blob)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return len(MAGIC) + _HEADER_LENGTH.size + len(header) + offset
+
+
+def _read_header(file):
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f'{file.name} is not a columnar file')
+    (length,) = _HEADER_LENGTH.unpack(file.read(_HEADER_LENGTH.size))
+    header = json.loads(file.read(length))
+    return header, len(MAGIC) + _HEADER_LENGTH.size + length
+
+
+def read_column(path, name):
+    """
+    Decode one column of a file, reading only that column's bytes
+    """
+    with open(path, 'rb') as file:
+        header, data_start = _read_header(file)
+        for entry in header['columns']:
+            if entry['name'] == name:
+                file.seek(data_start + entry['offset'])
+                return json.loads(zlib.decompress(file.read(entry['length'])))
+    raise KeyError(f'{path} has no column {name}')
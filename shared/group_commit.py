@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from sqlalchemy.orm import Session
+from db.database import db
+
+_STOP = object()
+
+
+class GroupCommitUnavailable(Exception):
+    """
+    Raised to a caller whose work was not applied because the committer
+    timed out or stopped
+    """
+
+
+class GroupCommitter:
+    """
+    Collects units of work from many request threads and applies them in a
+    single database transaction, so a burst of writes pays for one commit
+    (and one fsync) instead of one per request.
+
+    A group is flushed once it holds `max_batch` items or `max_delay`
+    seconds after its first item arrived, whichever comes first. Callers
+    block until their group has been committed.
+
+    A unit of work is a callable taking the group's session. It reports
+    business errors through its return value and must not write anything in
+    that case; an exception aborts the whole group and is raised in every
+    caller of it. Units are applied in the order of their `lock_key` (the
+    account id they lock), the order transfers lock rows in, so a group
+    cannot deadlock against them.
+    """
+
+    def __init__(self, app, max_batch=64, max_delay=0.005, timeout=30):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.groups = 0
+        self.items = 0
+        self._app = app
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, work, lock_key=0):
+        """
+        Run `work(session)` in the next group and return its result once the
+        group is durable. Raises GroupCommitUnavailable when the work was not
+        picked up within `timeout` seconds; it is then never applied.
+        """
+        future = Future()
+        # Queued under the lock a dying thread takes to fail what is left,
+        # so the work reaches either that thread or its replacement
+        with self._lock:
+            self._ensure_started()
+            self._queue.put((lock_key, work, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise GroupCommitUnavailable('Timed out waiting for the group commit')
+        # Already being applied: the thread resolves every future it takes,
+        # even when it dies
+        return future.result()
+
+    def close(self):
+        """
+        Flush what is queued and stop the background thread
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+        thread.join()
+
+    def _ensure_started(self):
+        # Started on first use (with the lock held) so that forked workers
+        # each get their own thread, and again after a thread died
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='group-commit', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        batch = []
+        try:
+            with self._app.app_context():
+                self._loop(db.engine, batch)
+        finally:
+            # Nobody would resolve these otherwise: fail the group in hand
+            # and everything still queued
+            error = GroupCommitUnavailable('The group commit thread stopped')
+            with self._lock:
+                pending = list(batch)
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        pending.append(item)
+                for _, _, future in pending:
+                    if not future.done():
+                        future.set_exception(error)
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _loop(self, engine, batch):
+        stopping = False
+        while not stopping:
+            batch.clear()
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch.append(first)
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._flush(engine, batch)
+
+    def _flush(self, engine, batch):
+        # Callers that gave up waiting are dropped; the rest can no longer
+        # cancel. Rows are locked in lock_key order, like transfers lock them.
+        batch = sorted((item for item in batch if item[2].set_running_or_notify_cancel()),
+                       key=lambda item: item[0])
+        if not batch:
+            return
+        # expire_on_commit=False keeps returned objects readable by callers
+        # after this session is closed
+        session = Session(engine, expire_on_commit=False)
+        try:
+            results = [work(session) for _, work, _ in batch]
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            session.close()
+
+        self.groups += 1
+        self.items += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,93 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+DECIMAL_FORMATS = ('float', 'string', 'minor_units')
+MINOR_UNIT_EXPONENT = 2
+
+
+def _decimal_as_float(value):
+    return float(value)
+
+
+def _decimal_as_minor_units(value):
+    return int(value.scaleb(MINOR_UNIT_EXPONENT).to_integral_value(decimal.ROUND_HALF_EVEN))
+
+
+DECIMAL_ENCODERS = {
+    'float': _decimal_as_float,
+    'string': str,
+    'minor_units': _decimal_as_minor_units,
+}
+
+
+class RevoJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes with orjson when it is installed and with the
+    standard library otherwise.
+
+    Decimals are written according to JSON_DECIMAL_FORMAT: 'float' (the
+    historical output), 'string' (exact digits, e.g. "10.50") or
+    'minor_units' (an integer number of cents). Dates and datetimes are
+    written in ISO 8601. Keys keep their insertion order.
+    """
+    sort_keys = False
+
+    def _decimal_encoder(self):
+        return DECIMAL_ENCODERS[self._app.config.get('JSON_DECIMAL_FORMAT', 'float')]
+
+    def _default_for(self, encode_decimal):
+        def default(o):
+            if isinstance(o, decimal.Decimal):
+                return encode_decimal(o)
+            if isinstance(o, (datetime, date)):
+                return o.isoformat()
+            if isinstance(o, uuid.UUID):
+                return str(o)
+            if dataclasses.is_dataclass(o):
+                return dataclasses.asdict(o)
+            if hasattr(o, '__html__'):
+                return str(o.__html__())
+            raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+        return default
+
+    def dumps_bytes(self, obj):
+        """
+        Serialize compactly to UTF-8 bytes, the fast path for responses
+        """
+        default = self._default_for(self._decimal_encoder())
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # e.g. integers beyond 64 bits, which the standard library handles
+                pass
+        return json.dumps(obj, default=default, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        kwargs.setdefault('default', self._default_for(self._decimal_encoder()))
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
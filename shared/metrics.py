@@ -0,0 +1,229 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _RouteStats:
+    """
+    Counters for one (route, method) pair. Histogram buckets are stored
+    non-cumulatively and summed up when rendered.
+    """
+    __slots__ = ('count', 'latency_buckets', 'latency_sum', 'statuses',
+                 'statement_buckets', 'statements', 'statement_seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.statuses = {}
+        self.statement_buckets = [0] * (len(STATEMENT_BUCKETS) + 1)
+        self.statements = 0
+        self.statement_seconds = 0.0
+
+
+class Metrics:
+    """
+    Per-route request counts, latency histograms, status codes and SQL
+    statement counts/time, rendered in the Prometheus text format.
+
+    Every thread records into its own shard, so the request path never takes
+    a lock and only touches preallocated counters; shards are merged when
+    /metrics is scraped. Under gunicorn each worker reports its own numbers.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _before_request(self):
+        local = self._local
+        local.statements = 0
+        local.statement_seconds = 0.0
+        local.started = time.perf_counter()
+
+    def _after_request(self, response):
+        local = self._local
+        started = getattr(local, 'started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        local.started = None
+
+        rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+        key = (rule, request.method)
+        shard = self._shard()
+        stats = shard.get(key)
+        if stats is None:
+            stats = shard[key] = _RouteStats()
+
+        stats.count += 1
+        stats.latency_buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        stats.latency_sum += elapsed
+        stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+        stats.statement_buckets[bisect_left(STATEMENT_BUCKETS, local.statements)] += 1
+        stats.statements += local.statements
+        stats.statement_seconds += local.statement_seconds
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.statement_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        local = self._local
+        # Only statements issued while serving a request are attributed
+        if getattr(local, 'started', None) is None:
+            return
+        local.statements += 1
+        local.statement_seconds += time.perf_counter() - local.statement_started
+
+    def merged(self):
+        """
+        Merge every thread's shard into one {(route, method): _RouteStats}
+        """
+        with self._shards_lock:
+            shards = list(self._shards)
+
+        totals = {}
+        for shard in shards:
+            for key, stats in list(shard.items()):
+                total = totals.get(key)
+                if total is None:
+                    total = totals[key] = _RouteStats()
+                total.count += stats.count
+                total.latency_sum += stats.latency_sum
+                total.statements += stats.statements
+                total.statement_seconds += stats.statement_seconds
+                for i, value in enumerate(stats.latency_buckets):
+                    total.latency_buckets[i] += value
+                for i, value in enumerate(stats.statement_buckets):
+                    total.statement_buckets[i] += value
+                for status, value in list(stats.statuses.items()):
+                    total.statuses[status] = total.statuses.get(status, 0) + value
+        return totals
+
+    def render(self, process_metrics=()):
+        """
+        Render all metrics in the Prometheus text exposition format.
+        `process_metrics` is an iterable of (name, kind, help, value) for
+        process-level gauges and counters.
+        """
+        totals = sorted(self.merged().items())
+        lines = []
+
+        def header(name, kind, description):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, labels, bounds, buckets, total, count):
+            running = 0
+            for bound, value in zip(bounds, buckets):
+                running += value
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{labels}}} {total}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+
+        header('revobank_http_requests_total', 'counter',
+               'Requests handled, by route, method and status code.')
+        for (rule, method), stats in totals:
+            for status, value in sorted(stats.statuses.items()):
+                lines.append(f'revobank_http_requests_total{{{_labels(rule, method)},'
+                             f'status="{status}"}} {value}')
+
+        header('revobank_http_request_duration_seconds', 'histogram',
+               'Time spent handling requests.')
+        for (rule, method), stats in totals:
+            histogram('revobank_http_request_duration_seconds', _labels(rule, method),
+                      LATENCY_BUCKETS, stats.latency_buckets, stats.latency_sum, stats.count)
+
+        header('revobank_db_statements_per_request', 'histogram',
+               'SQL statements executed per request.')
+        for (rule, method), stats in totals:
+            histogram('revobank_db_statements_per_request', _labels(rule, method),
+                      STATEMENT_BUCKETS, stats.statement_buckets, stats.statements, stats.count)
+
+        header('revobank_db_statement_duration_seconds_total', 'counter',
+               'Time spent executing SQL statements.')
+        for (rule, method), stats in totals:
+            lines.append(f'revobank_db_statement_duration_seconds_total'
+                         f'{{{_labels(rule, method)}}} {stats.statement_seconds}')
+
+        for name, kind, description, value in process_metrics:
+            header(name, kind, description)
+            lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _metrics_view(self):
+        return current_app.response_class(
+            self.render(_process_metrics()), mimetype=None,
+            content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _labels(rule, method):
+    rule = rule.replace('\\', '\\\\').replace('"', '\\"')
+    return f'route="{rule}",method="{method}"'
+
+
+def _process_metrics():
+    """
+    Connection pool and principal cache numbers for the current app. Values
+    that only ever grow are counters, so rate() works on them.
+    """
+    from services.auth_service import user_cache
+
+    metrics = []
+    pool_monitor = current_app.extensions.get('pool_monitor')
+    if pool_monitor:
+        pool = pool_monitor.stats()
+        metrics += [
+            ('revobank_db_pool_checked_out', 'gauge', 'Connections currently checked out.',
+             pool['checked_out']),
+            ('revobank_db_pool_peak_checked_out', 'gauge', 'Most connections checked out at once.',
+             pool['peak_checked_out']),
+            ('revobank_db_pool_overflow', 'gauge', 'Connections open beyond the pool size.',
+             pool.get('overflow', 0)),
+            ('revobank_db_pool_connects_total', 'counter', 'Connections opened since start.',
+             pool['connects_total']),
+        ]
+
+    cache = user_cache.stats()
+    metrics += [
+        ('revobank_auth_cache_hits_total', 'counter', 'Principal cache hits since start.',
+         cache['hits']),
+        ('revobank_auth_cache_misses_total', 'counter', 'Principal cache misses since start.',
+         cache['misses']),
+        ('revobank_auth_cache_size', 'gauge', 'Principals currently cached.', cache['size']),
+    ]
+    return metrics
+
+
+metrics = Metrics()
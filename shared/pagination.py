@@ -0,0 +1,39 @@
+import base64
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at, row_id):
+    """
+    Encode a (created_at, id) keyset position into an opaque cursor string
+    """
+    raw = f"{created_at.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor back into (created_at, id).
+    Raises ValueError for anything that is not a valid cursor.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, UnicodeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    Parse a page size query parameter, clamping it to the allowed maximum
+    """
+    if value is None or value == '':
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('Limit must be positive')
+    return min(limit, maximum)
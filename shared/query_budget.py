@@ -0,0 +1,218 @@
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('off', 'warn', 'raise')
+
+_local = threading.local()
+_listening = False
+_listening_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised in 'raise' mode when a scope issues more SQL statements than its
+    budget allows
+    """
+
+
+class QueryRecorder:
+    """
+    Statements issued inside one scope (a request or a service call). The
+    application call site is only looked up for statements past the budget,
+    so scopes within their budget pay for a counter and nothing more.
+    """
+    __slots__ = ('name', 'budget', 'statements')
+
+    def __init__(self, name, budget=None):
+        self.name = name
+        self.budget = budget
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def exceeded(self):
+        return self.budget is not None and self.count > self.budget
+
+    def report(self):
+        sites = Counter(site for _, site in self.statements if site is not None)
+        listing = ', '.join(f'{site} x{count}' for site, count in sites.most_common())
+        return (f'{self.name} issued {self.count} SQL statements '
+                f'(budget {self.budget}); call sites past the budget: {listing}')
+
+
+def _call_site():
+    """
+    Innermost frame that belongs to the application rather than to
+    SQLAlchemy, Flask or this module
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(APP_ROOT) and filename != __file__
+                and 'site-packages' not in filename):
+            return f'{os.path.relpath(filename, APP_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorders = getattr(_local, 'recorders', None)
+    if not recorders:
+        return
+    site = None
+    for recorder in recorders:
+        if recorder.budget is not None and recorder.count >= recorder.budget:
+            # Walking the stack is the expensive part; only pay for it once
+            # the scope is over budget
+            site = site or _call_site()
+            recorder.statements.append((statement, site))
+        else:
+            recorder.statements.append((statement, None))
+
+
+def _ensure_listening():
+    global _listening
+    if not _listening:
+        with _listening_lock:
+            if not _listening:
+                event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+                _listening = True
+
+
+def _push(recorder):
+    _ensure_listening()
+    if not hasattr(_local, 'recorders'):
+        _local.recorders = []
+    _local.recorders.append(recorder)
+
+
+def _pop(recorder):
+    recorders = getattr(_local, 'recorders', [])
+    if recorder in recorders:
+        recorders.remove(recorder)
+
+
+def _current_mode():
+    if has_app_context():
+        return current_app.config.get('QUERY_BUDGET_MODE', 'warn')
+    return os.getenv('QUERY_BUDGET_MODE', 'warn')
+
+
+def enforce(recorder, mode=None):
+    """
+    Warn about or fail on a recorder that went over its budget
+    """
+    mode = mode or _current_mode()
+    if mode == 'off' or not recorder.exceeded():
+        return
+    if mode == 'raise':
+        raise QueryBudgetExceeded(recorder.report())
+    logger.warning(recorder.report())
+
+
+@contextmanager
+def query_budget(budget=None, name='block', mode=None):
+    """
+    Record the statements issued inside the block and enforce `budget`
+    (no limit when None). Yields the QueryRecorder.
+    """
+    recorder = QueryRecorder(name, budget)
+    _push(recorder)
+    try:
+        yield recorder
+    finally:
+        _pop(recorder)
+    enforce(recorder, mode)
+
+
+@contextmanager
+def exempt():
+    """
+    Leave the statements of the block out of every active budget, for
+    bookkeeping issued on behalf of the caller rather than by it
+    """
+    recorders = getattr(_local, 'recorders', None)
+    _local.recorders = []
+    try:
+        yield
+    finally:
+        _local.recorders = recorders if recorders is not None else []
+
+
+def budget(max_statements):
+    """
+    Decorator giving a service function a statement budget
+    """
+    def decorator(f):
+        name = f'{f.__module__}.{f.__qualname__}'
+
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if _current_mode() == 'off':
+                return f(*args, **kwargs)
+            with query_budget(max_statements, name):
+                return f(*args, **kwargs)
+
+        return decorated
+    return decorator
+
+
+def request_budget(max_statements):
+    """
+    Decorator overriding QUERY_BUDGET_PER_REQUEST for one route (placed
+    right below the route decorator). None means no limit, for routes whose
+    statement count grows with the request size.
+    """
+    def decorator(f):
+        f.query_budget = max_statements
+        return f
+    return decorator
+
+
+def init_app(app):
+    """
+    Enforce QUERY_BUDGET_PER_REQUEST, or a route's own request_budget, on
+    every request
+    """
+    if app.config['QUERY_BUDGET_MODE'] not in MODES:
+        raise ValueError(f"Unknown QUERY_BUDGET_MODE: {app.config['QUERY_BUDGET_MODE']}")
+
+    @app.before_request
+    def start_request_budget():
+        if app.config['QUERY_BUDGET_MODE'] == 'off':
+            return
+        view = app.view_functions.get(request.endpoint)
+        limit = getattr(view, 'query_budget', app.config['QUERY_BUDGET_PER_REQUEST'])
+        recorder = QueryRecorder(f'{request.method} {request.path}', limit)
+        _push(recorder)
+        _local.request_recorder = recorder
+
+    @app.after_request
+    def check_request_budget(response):
+        recorder = getattr(_local, 'request_recorder', None)
+        if recorder is not None:
+            _local.request_recorder = None
+            _pop(recorder)
+            enforce(recorder, app.config['QUERY_BUDGET_MODE'])
+        return response
+
+    @app.teardown_request
+    def clear_request_budget(exc):
+        # after_request is skipped when a request fails early
+        recorder = getattr(_local, 'request_recorder', None)
+        if recorder is not None:
+            _local.request_recorder = None
+            _pop(recorder)
@@ -0,0 +1,196 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, request
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+# Limits per route group as "<requests>/<seconds>": a bucket holds up to
+# <requests> tokens and refills at <requests>/<seconds> tokens per second.
+# Each can be overridden with RATE_LIMIT_<NAME>, e.g. RATE_LIMIT_LOGIN=5/60.
+DEFAULT_LIMITS = {
+    'login': '10/60',
+    'refresh': '30/60',
+    'signup': '10/60',
+    'transactions': '120/60',
+    'batch': '10/60',
+}
+
+
+def parse_limit(value):
+    """
+    Parse "<requests>/<seconds>" into (burst, refill rate per second)
+    """
+    requests, _, seconds = value.partition('/')
+    burst, seconds = int(requests), float(seconds or 1)
+    if burst < 1 or seconds <= 0:
+        raise ValueError(f'Invalid rate limit: {value}')
+    return burst, burst / seconds
+
+
+def _refill(tokens, updated_at, now, burst, rate):
+    return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+
+class InProcessBackend:
+    """
+    Token buckets in this process's memory. Each take is O(1) and at most
+    `max_keys` buckets are kept; the least recently used one is dropped
+    first, which only means that client starts again with a full bucket.
+    Under gunicorn every worker enforces the limit on its own.
+    """
+
+    def __init__(self, max_keys=10000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, rate, cost=1):
+        """
+        Take `cost` tokens from the bucket. Returns (allowed, seconds until
+        enough tokens are available).
+        """
+        with self._lock:
+            now = self._clock()
+            bucket = self._buckets.get(key)
+            tokens = burst if bucket is None else _refill(bucket[0], bucket[1], now, burst, rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class DatabaseBackend:
+    """
+    Token buckets in the rate_limit_buckets table, so the limit holds across
+    gunicorn workers and instances. A take is one conditional UPDATE on its
+    own connection, outside the request's transaction. SQLite serves as
+    the local stand-in in tests.
+    """
+
+    def __init__(self, engine, clock=time.time):
+        self.engine = engine
+        self._clock = clock
+
+    def _least(self, *values):
+        if self.engine.dialect.name == 'sqlite':
+            return func.min(*values)
+        return func.least(*values)
+
+    def _greatest_zero(self, value):
+        if self.engine.dialect.name == 'sqlite':
+            return func.max(value, 0)
+        return func.greatest(value, 0)
+
+    def take(self, key, burst, rate, cost=1):
+        from models.rate_limit_bucket import RateLimitBucket
+
+        now = self._clock()
+        table = RateLimitBucket.__table__
+        refilled = self._least(
+            burst, table.c.tokens + self._greatest_zero(now - table.c.updated_at) * rate)
+
+        with self.engine.begin() as connection:
+            taken = connection.execute(
+                update(table).where(table.c.key == key, refilled >= cost)
+                .values(tokens=refilled - cost, updated_at=now)
+            ).rowcount
+            if taken:
+                return True, 0.0
+
+            row = connection.execute(
+                select(table.c.tokens, table.c.updated_at).where(table.c.key == key)
+            ).first()
+            if row is not None:
+                tokens = _refill(row.tokens, row.updated_at, now, burst, rate)
+                return False, (cost - tokens) / rate
+
+        # First request for this key
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(table.insert().values(
+                    key=key, tokens=burst - cost, updated_at=now))
+            return True, 0.0
+        except IntegrityError:
+            # Another worker created the bucket first
+            return self.take(key, burst, rate, cost)
+
+    def purge(self, max_idle_seconds):
+        """
+        Delete buckets unused for `max_idle_seconds`; they would be full
+        again anyway. Returns how many were removed.
+        """
+        from models.rate_limit_bucket import RateLimitBucket
+
+        table = RateLimitBucket.__table__
+        with self.engine.begin() as connection:
+            return connection.execute(table.delete().where(
+                table.c.updated_at < self._clock() - max_idle_seconds)).rowcount
+
+
+class RateLimiter:
+    """
+    Applies the configured limits through a backend
+    """
+
+    def __init__(self, backend, limits):
+        self.backend = backend
+        self.limits = {name: parse_limit(value) for name, value in limits.items()}
+
+    def take(self, name, client_key):
+        if name not in self.limits:
+            return True, 0.0
+        burst, rate = self.limits[name]
+        return self.backend.take(f'{name}:{client_key}', burst, rate)
+
+
+def _too_many_requests(retry_after):
+    return jsonify({'message': 'Too many requests, retry later'}), 429, \
+        {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+
+def rate_limit(name, per_user=False):
+    """
+    Decorator limiting a route group by client IP, or by user when
+    `per_user` is set (then it goes below token_required)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            if limiter is None:
+                return f(*args, **kwargs)
+
+            client_key = f'user:{args[0].id}' if per_user else f'ip:{request.remote_addr}'
+            allowed, retry_after = limiter.take(name, client_key)
+            if not allowed:
+                return _too_many_requests(retry_after)
+            return f(*args, **kwargs)
+
+        return decorated
+    return decorator
+
+
+def init_app(app):
+    """
+    Set up the limiter selected by RATE_LIMIT_BACKEND
+    """
+    if app.config['RATE_LIMIT_BACKEND'] == 'database':
+        from db.database import db
+        with app.app_context():
+            backend = DatabaseBackend(db.engine)
+    elif app.config['RATE_LIMIT_BACKEND'] == 'memory':
+        backend = InProcessBackend(max_keys=app.config['RATE_LIMIT_MAX_KEYS'])
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {app.config['RATE_LIMIT_BACKEND']}")
+    app.extensions['rate_limiter'] = RateLimiter(backend, app.config['RATE_LIMITS'])
@@ -0,0 +1,64 @@
+import threading
+import time
+from datetime import datetime
+
+
+class RevocationList:
+    """
+    In-memory set of revoked token ids, kept in step with the revocation
+    table so checking a token never costs a query.
+
+    Every `interval` seconds the first caller of is_revoked() loads the rows
+    added since the last sync through `load_since(after_id)`, which returns
+    (id, jti, expires_at) rows in id order; other callers keep answering from
+    the current set meanwhile. The last `overlap` ids are read again on every
+    sync, because a row with a lower id can commit after a higher one. Revocations made by this process are visible
+    at once, those from other workers after at most `interval` seconds.
+    Entries are dropped once the token has expired anyway.
+    """
+
+    def __init__(self, load_since, interval=5.0, overlap=256, clock=time.monotonic):
+        self.interval = interval
+        self.overlap = overlap
+        self._load_since = load_since
+        self._clock = clock
+        self._expiry = {}
+        self._last_id = 0
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        if self._clock() >= self._next_sync and self._lock.acquire(blocking=False):
+            try:
+                self._sync()
+            finally:
+                self._lock.release()
+        return jti in self._expiry
+
+    def add(self, jti, expires_at):
+        """
+        Record a revocation made by this process without waiting for a sync
+        """
+        self._expiry[jti] = expires_at
+
+    def reset(self):
+        """
+        Forget everything and sync from scratch on the next check
+        """
+        with self._lock:
+            self._expiry = {}
+            self._last_id = 0
+            self._next_sync = 0.0
+
+    def _sync(self):
+        now = datetime.utcnow()
+        for row_id, jti, expires_at in self._load_since(max(0, self._last_id - self.overlap)):
+            self._last_id = max(self._last_id, row_id)
+            if expires_at > now:
+                self._expiry[jti] = expires_at
+        self._expiry = {jti: expires_at for jti, expires_at in self._expiry.items()
+                        if expires_at > now}
+        self._next_sync = self._clock() + self.interval
+
+    def __len__(self):
+        return len(self._expiry)
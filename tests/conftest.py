@@ -1,6 +1,25 @@
+import os
+import tempfile
+
 import pytest
+
+# Point the app at a throwaway database before run.py is imported
+os.environ['DATABASE_URL'] = os.getenv(
+    'TEST_DATABASE_URL',
+    'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'revobank_test.db'))
+os.environ.pop('KOYEB', None)
+# Cheap password hashes keep the suite fast
+os.environ.setdefault('PASSWORD_HASH_ROUNDS', '1000')
+# Suites fire bursts on purpose; rate limiting has its own tests
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+
 from run import create_app
 from flask import Flask
+from db.database import db
+from models.user import User
+from models.account import Account
+from services import auth_service, password_service
+from shared.query_budget import query_budget as enforce_query_budget
 
 @pytest.fixture(scope='session')
 def app():
@@ -28,4 +47,57 @@ def app_context(app):
 def request_context(app):
     """A request context for the tests."""
     with app.test_request_context():
-        yield
\ No newline at end of file
+        yield
+
+
+@pytest.fixture
+def database(app):
+    """A freshly created schema that is dropped again after the test."""
+    db.create_all()
+    # Ids restart with every schema, so cached principals would be stale
+    auth_service.user_cache.clear()
+    auth_service.revocations.reset()
+    yield db
+    db.session.remove()
+    db.drop_all()
+
+
+@pytest.fixture
+def user(database):
+    """A persisted user to own accounts and transactions."""
+    new_user = User(username='testuser', email='test@example.com',
+                    password_hash=password_service.hash_password('password123'),
+                    full_name='Test User')
+    db.session.add(new_user)
+    db.session.commit()
+    return new_user
+
+
+@pytest.fixture
+def auth_headers(user):
+    """Authorization headers carrying a valid token for `user`."""
+    return {'Authorization': f'Bearer {auth_service.generate_token(user.id)}'}
+
+
+@pytest.fixture
+def make_account(database):
+    """Factory for persisted accounts."""
+    def _make_account(user_id, balance=0, account_type='savings'):
+        account = Account(user_id=user_id, account_type=account_type,
+                          account_number=f'TEST-{Account.query.count() + 1}',
+                          balance=balance)
+        db.session.add(account)
+        db.session.commit()
+        return account
+    return _make_account
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fail when a block issues more than `n` SQL statements, listing the call
+    sites: `with query_budget(2): client.get(...)`.
+    """
+    def _query_budget(n, name='block'):
+        return enforce_query_budget(n, name=name, mode='raise')
+    return _query_budget
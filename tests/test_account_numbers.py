@@ -0,0 +1,72 @@
+import threading
+from sqlalchemy import select
+from db.database import db
+from models.account import Account
+from shared.account_numbers import (AccountNumberAllocator, is_valid_account_number,
+                                    luhn_check_digit)
+
+ACCOUNTS = 100000
+WORKERS = 4
+THREADS_PER_WORKER = 2
+BLOCK_SIZE = 1000
+CHUNK = 500
+
+
+def test_luhn_check_digit():
+    assert luhn_check_digit('7992739871') == '3'
+    assert is_valid_account_number('79927398713')
+    assert not is_valid_account_number('79927398710')
+    assert not is_valid_account_number('TEST-1')
+
+
+def test_create_account_assigns_a_valid_number(client, auth_headers):
+    numbers = [client.post('/api/accounts', headers=auth_headers,
+                           json={'account_type': 'savings'}).json['account']['account_number']
+               for _ in range(3)]
+
+    assert len(set(numbers)) == 3
+    assert all(is_valid_account_number(number) for number in numbers)
+
+
+def test_allocator_reserves_one_block_per_round_trip(database):
+    allocator = AccountNumberAllocator(db.engine, block_size=10)
+    numbers = [allocator.allocate() for _ in range(25)]
+
+    assert allocator.reservations == 3
+    assert [int(number[:-1]) for number in numbers] == list(
+        range(int(numbers[0][:-1]), int(numbers[0][:-1]) + 25))
+
+
+def test_concurrent_workers_create_100k_accounts(user):
+    # Each allocator stands in for one worker process sharing the counter
+    engine, user_id = db.engine, user.id
+    allocators = [AccountNumberAllocator(engine, block_size=BLOCK_SIZE)
+                  for _ in range(WORKERS)]
+    per_thread = ACCOUNTS // (WORKERS * THREADS_PER_WORKER)
+    errors = []
+
+    def create_accounts(allocator):
+        try:
+            for offset in range(0, per_thread, CHUNK):
+                rows = [{'user_id': user_id, 'account_type': 'savings', 'balance': 0,
+                         'account_number': allocator.allocate()}
+                        for _ in range(min(CHUNK, per_thread - offset))]
+                with engine.begin() as connection:
+                    connection.execute(Account.__table__.insert(), rows)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=create_accounts, args=(allocator,))
+               for allocator in allocators for _ in range(THREADS_PER_WORKER)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    numbers = db.session.execute(select(Account.account_number)).scalars().all()
+    assert len(numbers) == len(set(numbers)) == ACCOUNTS
+    assert all(is_valid_account_number(number) for number in numbers)
+    # One counter round trip per block, not per account
+    assert sum(allocator.reservations for allocator in allocators) <= \
+        ACCOUNTS // BLOCK_SIZE + WORKERS
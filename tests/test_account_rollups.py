@@ -0,0 +1,94 @@
+from datetime import datetime
+from decimal import Decimal
+from db.database import db
+from models.account_monthly_rollup import AccountMonthlyRollup
+from models.transaction import Transaction
+from services import rollup_service, transaction_service
+
+
+def _months(client, auth_headers, account_id, **params):
+    response = client.get(f'/api/accounts/{account_id}/summary',
+                          query_string=params, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json['months']
+
+
+def test_money_movements_update_the_rollup(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+    other = make_account(user.id)
+
+    transaction_service.create_deposit(user.id, account.id, Decimal('100'))
+    transaction_service.create_withdrawal(user.id, account.id, Decimal('15.50'))
+    transaction_service.create_transfer(user.id, account.id, other.id, Decimal('20'))
+    # Rejected movements leave the rollup untouched
+    assert transaction_service.create_withdrawal(user.id, account.id, Decimal('1000'))[1]
+
+    month = datetime.utcnow().strftime('%Y-%m')
+    assert _months(client, auth_headers, account.id) == [{
+        'month': month, 'inflow_total': 100.0, 'inflow_count': 1,
+        'outflow_total': 35.5, 'outflow_count': 2, 'net': 64.5}]
+    assert _months(client, auth_headers, other.id)[0]['inflow_total'] == 20.0
+
+
+def test_batch_chunks_update_the_rollup(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+    items = [{'transaction_type': 'deposit', 'destination_account_id': account.id, 'amount': 5}] * 3
+    transaction_service.create_batch(user.id, items + [
+        {'transaction_type': 'withdrawal', 'source_account_id': account.id, 'amount': 100}])
+
+    [month] = _months(client, auth_headers, account.id)
+    assert (month['inflow_count'], month['inflow_total'], month['outflow_count']) == (3, 15.0, 0)
+
+
+def test_backfill_rebuilds_rollups_from_history(app, client, auth_headers, user, make_account):
+    account = make_account(user.id, balance=100)
+    other = make_account(user.id)
+    for day, month in ((5, 1), (20, 1), (3, 2), (9, 3)):
+        db.session.add(Transaction(source_account_id=account.id, destination_account_id=other.id,
+                                   amount='10.25', transaction_type='transfer',
+                                   created_at=datetime(2024, month, day)))
+    db.session.add(Transaction(destination_account_id=account.id, amount=7,
+                               transaction_type='deposit', created_at=datetime(2024, 2, 1)))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['rollups', 'backfill', '--chunk-size', '2'])
+    assert 'Rebuilt rollups from 5 transactions' in result.output
+    # Running it again does not double count
+    app.test_cli_runner().invoke(args=['rollups', 'backfill'])
+
+    months = _months(client, auth_headers, account.id, **{'from': '2024-01', 'to': '2024-02'})
+    assert [(m['month'], m['outflow_count'], m['outflow_total'], m['inflow_total'])
+            for m in months] == [('2024-01', 2, 20.5, 0.0), ('2024-02', 1, 10.25, 7.0)]
+    assert db.session.query(AccountMonthlyRollup).filter_by(account_id=other.id).count() == 3
+
+
+def test_backfill_keeps_rollups_readable_and_counts_later_movements(client, auth_headers, user,
+                                                                     make_account):
+    account = make_account(user.id, balance=100)
+    other = make_account(user.id)
+    transaction_service.create_transfer(user.id, account.id, other.id, Decimal('30'))
+    month = datetime.utcnow().strftime('%Y-%m')
+    seen = []
+
+    def progress(_):
+        # Accounts not recounted yet keep their rollups
+        seen.append(_months(client, auth_headers, other.id)[0]['inflow_total'])
+        # A movement after a chunk commits is counted by its own write only
+        if len(seen) == 1:
+            transaction_service.create_deposit(user.id, account.id, Decimal('5'))
+
+    rollup_service.backfill_rollups(chunk_size=1, progress=progress)
+
+    assert seen == [30.0, 30.0]
+    assert _months(client, auth_headers, account.id) == [{
+        'month': month, 'inflow_total': 5.0, 'inflow_count': 1,
+        'outflow_total': 30.0, 'outflow_count': 1, 'net': -25.0}]
+
+
+def test_summary_requires_ownership_and_valid_months(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+
+    assert client.get(f'/api/accounts/{account.id + 1}/summary',
+                      headers=auth_headers).status_code == 404
+    assert client.get(f'/api/accounts/{account.id}/summary?from=2024-13',
+                      headers=auth_headers).status_code == 400
@@ -0,0 +1,76 @@
+import pytest
+from datetime import datetime
+from db.database import db
+from models.transaction import Transaction
+
+
+@pytest.fixture
+def statement_account(user, make_account):
+    account = make_account(user.id, balance=1000)
+    other = make_account(user.id, balance=0)
+
+    movements = [
+        (datetime(2024, 1, 10), None, account.id, 500),     # deposit
+        (datetime(2024, 2, 3), account.id, None, 200),      # withdrawal
+        (datetime(2024, 2, 14), account.id, other.id, 50),  # transfer out
+        (datetime(2024, 2, 20), other.id, account.id, 30),  # transfer in
+        (datetime(2024, 3, 1), None, account.id, 100),      # deposit
+    ]
+    for created_at, source, destination, amount in movements:
+        db.session.add(Transaction(
+            source_account_id=source, destination_account_id=destination,
+            amount=amount, transaction_type='transfer', created_at=created_at))
+    db.session.commit()
+
+    # The stored balance already reflects every movement above
+    account.balance = 1000 + 500 - 200 - 50 + 30 + 100
+    db.session.commit()
+    return account
+
+
+def test_statement_for_one_month(client, auth_headers, statement_account):
+    response = client.get(f'/api/accounts/{statement_account.id}/statement',
+                          headers=auth_headers,
+                          query_string={'from': '2024-02-01', 'to': '2024-02-29'})
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    statement = response.json
+    assert statement['opening_balance'] == 1500
+    assert [row['amount'] for row in statement['transactions']] == [-200, -50, 30]
+    assert [row['running_balance'] for row in statement['transactions']] == [1300, 1250, 1280]
+    assert statement['closing_balance'] == 1280
+
+
+def test_statement_without_range_covers_history(client, auth_headers, statement_account):
+    response = client.get(f'/api/accounts/{statement_account.id}/statement',
+                          headers=auth_headers)
+
+    statement = response.json
+    assert statement['opening_balance'] == 1000
+    assert len(statement['transactions']) == 5
+    assert statement['closing_balance'] == 1380
+
+
+def test_empty_statement(client, auth_headers, statement_account):
+    response = client.get(f'/api/accounts/{statement_account.id}/statement',
+                          headers=auth_headers,
+                          query_string={'from': '2025-01-01'})
+
+    assert response.json['transactions'] == []
+    assert response.json['opening_balance'] == response.json['closing_balance'] == 1380
+
+
+def test_statement_of_foreign_account(client, auth_headers, user, make_account):
+    foreign = make_account(user.id + 1)
+
+    response = client.get(f'/api/accounts/{foreign.id}/statement', headers=auth_headers)
+
+    assert response.status_code == 404
+
+
+def test_statement_with_invalid_dates(client, auth_headers, statement_account):
+    response = client.get(f'/api/accounts/{statement_account.id}/statement',
+                          headers=auth_headers, query_string={'from': 'last week'})
+
+    assert response.status_code == 400
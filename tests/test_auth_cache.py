@@ -0,0 +1,68 @@
+from services import account_service, auth_service, user_service
+from shared.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set('a', 1)
+
+    clock.now = 4.9
+    assert cache.get('a') == 1
+
+    clock.now = 5.0
+    assert cache.get('a') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 0, 'maxsize': 10}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_token_required_caches_principal(client, auth_headers, user):
+    client.get('/api/users/me', headers=auth_headers)
+    response = client.get('/api/users/me', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json['user']['username'] == 'testuser'
+    stats = auth_service.user_cache.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+
+
+def test_update_user_invalidates_principal(client, auth_headers, user):
+    client.get('/api/users/me', headers=auth_headers)
+    assert auth_service.user_cache.get(user.id) is not None
+
+    user_service.update_user(user.id, {'email': 'new@example.com'})
+    assert auth_service.user_cache.get(user.id) is None
+
+    response = client.get('/api/users/me', headers=auth_headers)
+    assert response.json['user']['email'] == 'new@example.com'
+
+
+def test_delete_account_invalidates_principal(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+    client.get('/api/users/me', headers=auth_headers)
+
+    success, error = account_service.delete_account(account.id, user.id)
+
+    assert success and error is None
+    assert auth_service.user_cache.get(user.id) is None
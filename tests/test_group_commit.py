@@ -0,0 +1,135 @@
+import threading
+from decimal import Decimal
+import pytest
+from sqlalchemy import event
+from db.database import db
+from models.account import Account
+from models.transaction import Transaction
+from services import transaction_service
+from shared.group_commit import GroupCommitter, GroupCommitUnavailable
+
+
+@pytest.fixture
+def group_committer(app, database):
+    committer = GroupCommitter(app, max_batch=16, max_delay=0.05)
+    app.extensions['group_commit'] = committer
+    yield committer
+    app.extensions.pop('group_commit')
+    committer.close()
+
+
+def test_concurrent_deposits_share_commits(app, user, make_account, group_committer):
+    account_id = make_account(user.id).id
+    commits = []
+    listener = lambda conn: commits.append(1)
+    event.listen(db.engine, 'commit', listener)
+
+    results = []
+
+    def deposit():
+        with app.app_context():
+            results.append(transaction_service.create_deposit(
+                user.id, account_id, Decimal('2.50')))
+
+    threads = [threading.Thread(target=deposit) for _ in range(64)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    event.remove(db.engine, 'commit', listener)
+
+    assert all(error is None for _, error in results)
+    assert all(transaction.id is not None for transaction, _ in results)
+    assert len(commits) < 64
+    assert group_committer.items == 64
+
+    db.session.expire_all()
+    assert db.session.get(Account, account_id).balance == 160
+    assert Transaction.query.count() == 64
+
+
+def test_invalid_deposit_does_not_affect_its_group(app, user, make_account, group_committer):
+    account_id = make_account(user.id).id
+
+    transaction, error = transaction_service.create_deposit(user.id, 9999, Decimal('1'))
+    assert transaction is None and error == 'Invalid account'
+
+    transaction, error = transaction_service.create_deposit(user.id, account_id, Decimal('1'))
+    assert error is None
+    assert Transaction.to_response(transaction)['amount'] == 1.0
+
+
+def test_failing_group_reports_error_to_caller(app, group_committer):
+    def broken(session):
+        raise RuntimeError('disk full')
+
+    with pytest.raises(RuntimeError):
+        group_committer.submit(broken)
+
+
+def _submit_in_thread(app, committer, work, lock_key, outcomes):
+    def run():
+        with app.app_context():
+            try:
+                outcomes.append(committer.submit(work, lock_key=lock_key))
+            except Exception as e:
+                outcomes.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_group_is_applied_in_lock_key_order(app, database):
+    committer = GroupCommitter(app, max_batch=3, max_delay=5)
+    applied, outcomes = [], []
+    try:
+        threads = [_submit_in_thread(app, committer, lambda session, key=key: applied.append(key),
+                                     key, outcomes)
+                   for key in (9, 3, 5)]
+        for thread in threads:
+            thread.join()
+    finally:
+        committer.close()
+
+    assert committer.groups == 1
+    assert applied == [3, 5, 9]
+
+
+def test_callers_fail_when_the_thread_dies(app, database):
+    class Crash(BaseException):
+        pass
+
+    def crash(session):
+        raise Crash()
+
+    committer = GroupCommitter(app, max_batch=1, timeout=5)
+    try:
+        with pytest.raises(GroupCommitUnavailable):
+            committer.submit(crash)
+        # The next caller gets a new thread
+        assert committer.submit(lambda session: 'ok') == 'ok'
+    finally:
+        committer.close()
+
+
+def test_work_not_started_in_time_is_never_applied(app, database):
+    committer = GroupCommitter(app, max_batch=1, timeout=0.1)
+    started, release = threading.Event(), threading.Event()
+    applied, outcomes = [], []
+
+    def block(session):
+        started.set()
+        return release.wait(5)
+
+    try:
+        blocker = _submit_in_thread(app, committer, block, 0, outcomes)
+        started.wait(5)
+        with pytest.raises(GroupCommitUnavailable):
+            committer.submit(lambda session: applied.append('late'))
+        release.set()
+        blocker.join()
+    finally:
+        committer.close()
+
+    assert outcomes == [True]
+    assert applied == []
@@ -0,0 +1,187 @@
+import datetime
+from sqlalchemy import event
+from db.database import db
+from models.account import Account
+from models.idempotency_key import IdempotencyKey
+from models.transaction import Transaction
+from services import idempotency_service, transaction_service
+
+
+def _deposit(client, headers, account_id, amount=100, key='key-1'):
+    return client.post('/api/transactions', headers={**headers, 'Idempotency-Key': key},
+                       json={'transaction_type': 'deposit', 'amount': amount,
+                             'destination_account_id': account_id})
+
+
+def test_retry_replays_stored_response(client, auth_headers, user, make_account):
+    account_id = make_account(user.id).id
+
+    first = _deposit(client, auth_headers, account_id)
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        retry = _deposit(client, auth_headers, account_id)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json == first.json
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert not any('accounts' in statement for statement in statements)
+
+    db.session.expire_all()
+    assert Transaction.query.count() == 1
+    assert db.session.get(Account, account_id).balance == 100
+
+
+def test_client_errors_are_replayed(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+    request = {'transaction_type': 'withdrawal', 'amount': 5,
+               'source_account_id': account.id}
+    headers = {**auth_headers, 'Idempotency-Key': 'withdraw-1'}
+
+    first = client.post('/api/transactions', headers=headers, json=request)
+    retry = client.post('/api/transactions', headers=headers, json=request)
+
+    assert first.status_code == retry.status_code == 404
+    assert retry.json == {'message': 'Insufficient balance'}
+
+
+def test_key_reused_for_different_request(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+
+    _deposit(client, auth_headers, account.id, amount=100)
+    response = _deposit(client, auth_headers, account.id, amount=200)
+
+    assert response.status_code == 422
+    assert Transaction.query.count() == 1
+
+
+def test_requests_without_key_are_not_deduplicated(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+    request = {'transaction_type': 'deposit', 'amount': 1,
+               'destination_account_id': account.id}
+
+    client.post('/api/transactions', headers=auth_headers, json=request)
+    client.post('/api/transactions', headers=auth_headers, json=request)
+
+    assert Transaction.query.count() == 2
+    assert IdempotencyKey.query.count() == 0
+
+
+def test_expired_key_runs_again_and_is_purged(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+    _deposit(client, auth_headers, account.id)
+
+    record = IdempotencyKey.query.one()
+    record.expires_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.session.commit()
+
+    assert idempotency_service.purge_expired_keys() == 1
+    assert _deposit(client, auth_headers, account.id).status_code == 201
+    assert Transaction.query.count() == 2
+
+
+def test_batch_is_idempotent(client, auth_headers, user, make_account):
+    account = make_account(user.id)
+    headers = {**auth_headers, 'Idempotency-Key': 'batch-1'}
+    body = {'transactions': [{'transaction_type': 'deposit', 'amount': 1,
+                              'destination_account_id': account.id}] * 3}
+
+    client.post('/api/transactions/batch', headers=headers, json=body)
+    retry = client.post('/api/transactions/batch', headers=headers, json=body)
+
+    assert retry.status_code == 200
+    assert retry.json['completed'] == 3
+    assert Transaction.query.count() == 3
+
+
+def _expire_lease():
+    record = IdempotencyKey.query.one()
+    record.locked_until = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_crash_after_ledger_commit_recovers_from_ledger(client, auth_headers, user,
+                                                        make_account, monkeypatch):
+    account_id = make_account(user.id).id
+
+    def crash(claim, response):
+        raise RuntimeError('worker died before storing the response')
+
+    monkeypatch.setattr(idempotency_service, 'complete_key', crash)
+    assert _deposit(client, auth_headers, account_id).status_code != 201
+    monkeypatch.undo()
+
+    # The claim keeps its lease, then a retry rebuilds the response
+    assert _deposit(client, auth_headers, account_id).status_code == 409
+    _expire_lease()
+    retry = _deposit(client, auth_headers, account_id)
+    replay = _deposit(client, auth_headers, account_id)
+
+    transaction = Transaction.query.one()
+    assert retry.status_code == replay.status_code == 201
+    assert retry.json['transaction']['id'] == transaction.id
+    assert replay.json == retry.json
+    assert db.session.get(Account, account_id).balance == 100
+
+
+def test_abandoned_claim_without_ledger_rows_runs_again(client, auth_headers, user,
+                                                        make_account):
+    account_id = make_account(user.id).id
+    _deposit(client, auth_headers, account_id)
+    record = IdempotencyKey.query.one()
+    Transaction.query.delete()
+    record.status_code = record.response_body = record.transaction_ids = None
+    record.locked_until = datetime.datetime.utcnow() + datetime.timedelta(seconds=60)
+    db.session.commit()
+
+    assert _deposit(client, auth_headers, account_id).status_code == 409
+    _expire_lease()
+    assert _deposit(client, auth_headers, account_id).status_code == 201
+    assert Transaction.query.count() == 1
+
+
+def test_request_that_lost_its_lease_moves_no_money(client, auth_headers, user,
+                                                    make_account, monkeypatch):
+    account_id = make_account(user.id).id
+    create_deposit = transaction_service.create_deposit
+
+    def taken_over_midway(*args, **kwargs):
+        # A retry takes the claim over while this request is still running
+        with db.engine.begin() as connection:
+            connection.execute(IdempotencyKey.__table__.update().values(lease_token='retry'))
+        return create_deposit(*args, **kwargs)
+
+    monkeypatch.setattr(transaction_service, 'create_deposit', taken_over_midway)
+    response = _deposit(client, auth_headers, account_id)
+
+    db.session.expire_all()
+    assert response.status_code == 409
+    assert Transaction.query.count() == 0
+    assert db.session.get(Account, account_id).balance == 0
+    assert IdempotencyKey.query.one().status_code is None
+
+
+def test_interrupted_batch_is_not_run_again(client, auth_headers, user, make_account,
+                                            monkeypatch):
+    account = make_account(user.id)
+    headers = {**auth_headers, 'Idempotency-Key': 'batch-2'}
+    body = {'transactions': [{'transaction_type': 'deposit', 'amount': 1,
+                              'destination_account_id': account.id}] * 2, 'chunk_size': 1}
+
+    def crash(claim, response):
+        raise RuntimeError('worker died before storing the response')
+
+    monkeypatch.setattr(idempotency_service, 'complete_key', crash)
+    client.post('/api/transactions/batch', headers=headers, json=body)
+    monkeypatch.undo()
+    _expire_lease()
+    retry = client.post('/api/transactions/batch', headers=headers, json=body)
+
+    assert retry.status_code == 409
+    assert retry.json['transaction_ids'] == [
+        row.id for row in Transaction.query.order_by(Transaction.id)]
+    assert Transaction.query.count() == 2
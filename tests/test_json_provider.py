@@ -0,0 +1,57 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from models.account import Account
+from models.transaction import Transaction
+from shared import json_provider
+
+PAYLOAD = {'amount': Decimal('10.05'), 'at': datetime(2024, 1, 2, 3, 4, 5), 'ids': [1, 2]}
+
+
+@pytest.fixture
+def decimal_format(app):
+    def _set(value):
+        app.config['JSON_DECIMAL_FORMAT'] = value
+    yield _set
+    app.config['JSON_DECIMAL_FORMAT'] = 'float'
+
+
+@pytest.mark.parametrize('fmt, expected', [
+    ('float', '{"amount":10.05,"at":"2024-01-02T03:04:05","ids":[1,2]}'),
+    ('string', '{"amount":"10.05","at":"2024-01-02T03:04:05","ids":[1,2]}'),
+    ('minor_units', '{"amount":1005,"at":"2024-01-02T03:04:05","ids":[1,2]}'),
+])
+def test_decimal_formats(app, decimal_format, fmt, expected):
+    decimal_format(fmt)
+    assert app.json.dumps(PAYLOAD) == expected
+
+
+def test_standard_library_fallback_matches_orjson(app, decimal_format, monkeypatch):
+    decimal_format('string')
+    fast = app.json.dumps(PAYLOAD)
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    assert app.json.dumps(PAYLOAD) == fast
+
+
+def test_response_list_matches_single_responses():
+    transactions = [
+        Transaction(id=i, source_account_id=1, destination_account_id=2, amount=Decimal('1.50'),
+                    transaction_type='transfer', status='completed',
+                    created_at=datetime(2024, 1, i))
+        for i in range(1, 4)
+    ]
+    assert Transaction.to_response_list(transactions) == [
+        Transaction.to_response(transaction) for transaction in transactions]
+
+    account = Account(id=1, user_id=1, account_type='savings', account_number='A-1',
+                      balance=Decimal('3.00'), status='active')
+    assert Account.to_response_list([account]) == [Account.to_response(account)]
+
+
+def test_api_amounts_as_exact_strings(client, auth_headers, user, make_account, decimal_format):
+    account = make_account(user.id, balance=Decimal('100.10'))
+    decimal_format('string')
+
+    response = client.get(f'/api/accounts/{account.id}', headers=auth_headers)
+
+    assert response.json['account']['balance'] == '100.10'
@@ -0,0 +1,80 @@
+import re
+import threading
+from shared.metrics import Metrics
+
+
+def _samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_metrics_endpoint_reports_routes(client, auth_headers, user, make_account):
+    make_account(user.id)
+    route = 'route="/api/transactions",method="GET"'
+    before = _samples(client.get('/metrics').get_data(as_text=True))
+
+    for _ in range(3):
+        client.get('/api/transactions', headers=auth_headers)
+    client.get('/api/transactions')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    samples = _samples(response.get_data(as_text=True))
+
+    def delta(name):
+        return samples.get(name, 0) - before.get(name, 0)
+
+    assert delta(f'revobank_http_requests_total{{{route},status="200"}}') == 3
+    assert delta(f'revobank_http_requests_total{{{route},status="401"}}') == 1
+    assert delta(f'revobank_http_request_duration_seconds_count{{{route}}}') == 4
+    assert delta(f'revobank_http_request_duration_seconds_bucket{{{route},le="+Inf"}}') == 4
+    assert delta(f'revobank_db_statements_per_request_sum{{{route}}}') >= 3
+    assert 'revobank_db_pool_checked_out' in samples
+    assert 'revobank_auth_cache_hits_total' in samples
+    assert 'revobank_db_pool_connects_total' in samples
+
+
+def test_monotonic_process_values_are_counters(client):
+    text = client.get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE revobank_db_pool_connects_total counter' in text
+    assert '# TYPE revobank_auth_cache_hits_total counter' in text
+    assert '# TYPE revobank_auth_cache_misses_total counter' in text
+    assert '# TYPE revobank_db_pool_checked_out gauge' in text
+
+
+def test_histogram_buckets_are_cumulative(client):
+    for _ in range(2):
+        client.get('/health')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    buckets = [float(value) for value in re.findall(
+        r'revobank_http_request_duration_seconds_bucket\{route="/health",method="GET",le="[^"]+"\} (\S+)',
+        text)]
+
+    assert buckets == sorted(buckets)
+    assert buckets[-1] >= 2
+
+
+def test_shards_are_merged_across_threads(app):
+    registry = Metrics()
+
+    def record():
+        with app.test_request_context('/health'):
+            registry._before_request()
+            registry._after_request(app.response_class('ok'))
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    totals = registry.merged()
+    assert sum(stats.count for stats in totals.values()) == 4
+    assert len(registry._shards) == 4
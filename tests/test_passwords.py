@@ -0,0 +1,83 @@
+from flask import Flask
+from flask_migrate import Migrate, upgrade
+from passlib.hash import pbkdf2_sha256
+from db.database import db
+from models.user import User
+from services import password_service
+from tests.test_migrations import MIGRATIONS_DIR
+
+
+def _login(client, password='password123'):
+    return client.post('/api/auth/login', json={'username': 'testuser', 'password': password})
+
+
+def test_sign_up_stores_a_hash(client, database):
+    response = client.post('/api/users', json={
+        'username': 'alice', 'password': 's3cret', 'email': 'alice@example.com'})
+
+    assert response.status_code == 201
+    stored = User.query.filter_by(username='alice').one().password_hash
+    assert stored.startswith('$pbkdf2-sha256$1000$')
+    assert client.post('/api/auth/login', json={
+        'username': 'alice', 'password': 's3cret'}).status_code == 200
+
+
+def test_wrong_password_is_rejected(client, user):
+    assert _login(client, 'nope').status_code == 401
+
+
+def test_plaintext_password_is_rejected(client, user):
+    user.password_hash = 'password123'
+    db.session.commit()
+
+    assert _login(client).status_code == 401
+
+
+def test_migration_hashes_plaintext_passwords(app, tmp_path):
+    migration_app = Flask(__name__)
+    migration_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'passwords.db'}"
+    db.init_app(migration_app)
+    Migrate(migration_app, db, directory=MIGRATIONS_DIR)
+    hashed = pbkdf2_sha256.hash('kept', rounds=1000)
+
+    with migration_app.app_context():
+        upgrade(revision='0009')
+        with db.engine.begin() as connection:
+            for name, password in (('legacy', 'hunter2'), ('hashed', hashed)):
+                connection.exec_driver_sql(
+                    'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                    (name, f'{name}@example.com', password))
+        upgrade(revision='0010')
+        with db.engine.connect() as connection:
+            stored = dict(connection.exec_driver_sql(
+                'SELECT username, password_hash FROM users').all())
+
+    assert pbkdf2_sha256.verify('hunter2', stored['legacy'])
+    assert stored['hashed'] == hashed
+
+
+def test_cost_change_rehashes_on_login(app, client, user):
+    _login(client)
+    app.config['PASSWORD_HASH_ROUNDS'] = 1200
+    try:
+        assert _login(client).status_code == 200
+        db.session.refresh(user)
+        assert user.password_hash.startswith('$pbkdf2-sha256$1200$')
+    finally:
+        app.config['PASSWORD_HASH_ROUNDS'] = 1000
+
+
+def test_login_is_shed_when_hashing_pool_is_full(client, user):
+    password_service.hash_password('warm up the pool')
+    held = 0
+    while password_service._slots.acquire(blocking=False):
+        held += 1
+    try:
+        response = _login(client)
+    finally:
+        for _ in range(held):
+            password_service._slots.release()
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert _login(client).status_code == 200
@@ -0,0 +1,148 @@
+import logging
+import pytest
+from datetime import datetime
+from db.database import db, commit_keeping
+from models.account import Account
+from models.transaction import Transaction
+from services import account_service
+from shared.query_budget import QueryBudgetExceeded, budget, query_budget as enforce_query_budget
+
+
+@pytest.fixture
+def accounts(user, make_account):
+    first = make_account(user.id, balance=1000)
+    second = make_account(user.id, balance=1000)
+    third = make_account(user.id, balance=1000)
+    for day in range(1, 21):
+        db.session.add(Transaction(
+            source_account_id=first.id, destination_account_id=second.id,
+            amount=1, transaction_type='transfer', created_at=datetime(2024, 1, day)))
+    db.session.commit()
+    return first.id, second.id, third.id
+
+
+@pytest.fixture
+def warm_headers(client, auth_headers):
+    """Headers whose principal is already cached, so budgets cover the route alone."""
+    client.get('/api/users/me', headers=auth_headers)
+    return auth_headers
+
+
+def test_list_accounts_budget(client, warm_headers, accounts, query_budget):
+    with query_budget(1):
+        response = client.get('/api/accounts', headers=warm_headers)
+    assert response.status_code == 200
+    assert len(response.json['accounts']) == 3
+
+
+def test_get_account_budget(client, warm_headers, accounts, query_budget):
+    with query_budget(1):
+        response = client.get(f'/api/accounts/{accounts[0]}', headers=warm_headers)
+    assert response.status_code == 200
+    assert response.json['account']['id'] == accounts[0]
+
+
+def test_update_account_budget(client, warm_headers, accounts, query_budget):
+    with query_budget(2):
+        response = client.put(f'/api/accounts/{accounts[0]}', headers=warm_headers,
+                              json={'status': 'frozen'})
+    assert response.status_code == 200
+    assert response.json['account']['status'] == 'frozen'
+
+
+def test_statement_budget(client, warm_headers, accounts, query_budget):
+    with query_budget(3):
+        response = client.get(f'/api/accounts/{accounts[0]}/statement', headers=warm_headers)
+        assert len(response.json['transactions']) == 20
+
+
+def test_list_transactions_budget_does_not_grow_with_rows(client, warm_headers, accounts,
+                                                          query_budget):
+    with query_budget(2):
+        response = client.get('/api/transactions', headers=warm_headers)
+    assert response.status_code == 200
+    assert len(response.json['transactions']) == 20
+
+
+def test_get_transaction_budget(client, warm_headers, accounts, query_budget):
+    transaction_id = Transaction.query.first().id
+    with query_budget(2):
+        response = client.get(f'/api/transactions/{transaction_id}', headers=warm_headers)
+    assert response.status_code == 200
+    assert response.json['transaction']['id'] == transaction_id
+
+
+@pytest.mark.parametrize('payload, statements', [
+    ({'transaction_type': 'deposit', 'destination_account_id': 0}, 3),
+    ({'transaction_type': 'withdrawal', 'source_account_id': 0}, 3),
+    ({'transaction_type': 'transfer', 'source_account_id': 0, 'destination_account_id': 1}, 4),
+])
+def test_create_transaction_budget(client, warm_headers, accounts, query_budget,
+                                   payload, statements):
+    payload = dict(payload, amount=10)
+    for key in ('source_account_id', 'destination_account_id'):
+        if key in payload:
+            payload[key] = accounts[payload[key]]
+
+    with query_budget(statements):
+        response = client.post('/api/transactions', headers=warm_headers, json=payload)
+    assert response.status_code == 201
+
+
+def test_service_budget_raises_with_call_sites(app, accounts):
+    @budget(1)
+    def load_each_account(account_ids):
+        return [account_service.get_account_by_id(account_id) for account_id in account_ids]
+
+    app.config['QUERY_BUDGET_MODE'] = 'raise'
+    try:
+        with pytest.raises(QueryBudgetExceeded) as excinfo:
+            load_each_account(accounts)
+    finally:
+        app.config['QUERY_BUDGET_MODE'] = 'warn'
+
+    message = str(excinfo.value)
+    assert 'load_each_account issued 3 SQL statements (budget 1)' in message
+    assert 'services/account_service.py' in message
+
+
+def test_request_budget_warns(app, client, warm_headers, accounts, caplog):
+    app.config['QUERY_BUDGET_PER_REQUEST'] = 0
+    try:
+        with caplog.at_level(logging.WARNING, logger='shared.query_budget'):
+            response = client.get('/api/accounts', headers=warm_headers)
+    finally:
+        app.config['QUERY_BUDGET_PER_REQUEST'] = 25
+
+    assert response.status_code == 200
+    assert 'GET /api/accounts issued 1 SQL statements (budget 0)' in caplog.text
+
+
+def test_nested_scopes_count_independently(accounts):
+    with enforce_query_budget(name='outer') as outer:
+        account_service.get_user_accounts(1)
+        with enforce_query_budget(name='inner') as inner:
+            account_service.get_account_by_id(accounts[0])
+    assert (outer.count, inner.count) == (2, 1)
+
+
+def test_commit_keeping_leaves_instances_attached_and_loaded(accounts):
+    kept = db.session.get(Account, accounts[0])
+    other = db.session.get(Account, accounts[1])
+    kept.account_type = 'checking'
+
+    commit_keeping(kept)
+
+    assert kept in db.session
+    assert 'account_type' in kept.__dict__
+    assert 'account_type' not in other.__dict__
+
+
+def test_call_sites_are_only_looked_up_past_the_budget(accounts):
+    with enforce_query_budget(1, mode='off') as recorder:
+        account_service.get_account_by_id(accounts[0])
+        account_service.get_account_by_id(accounts[1])
+
+    sites = [site for _, site in recorder.statements]
+    assert sites[0] is None
+    assert sites[1].startswith('services/account_service.py')
@@ -0,0 +1,115 @@
+import pytest
+from db.database import db
+from shared.rate_limit import DatabaseBackend, InProcessBackend, RateLimiter, parse_limit
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def limits(app):
+    """Install a limiter with the given limits for one test."""
+    def _install(backend=None, **limits):
+        app.extensions['rate_limiter'] = RateLimiter(backend or InProcessBackend(), limits)
+    yield _install
+    app.extensions.pop('rate_limiter', None)
+
+
+def test_parse_limit():
+    assert parse_limit('10/60') == (10, 10 / 60)
+    with pytest.raises(ValueError):
+        parse_limit('0/60')
+
+
+@pytest.mark.parametrize('make_backend', [
+    lambda clock: InProcessBackend(clock=clock),
+    lambda clock: DatabaseBackend(db.engine, clock=clock),
+], ids=['memory', 'database'])
+def test_token_bucket(database, make_backend):
+    clock = FakeClock()
+    backend = make_backend(clock)
+
+    assert [backend.take('k', 3, 1.0)[0] for _ in range(4)] == [True, True, True, False]
+    assert backend.take('k', 3, 1.0) == (False, 1.0)
+
+    clock.now += 1.5
+    assert backend.take('k', 3, 1.0)[0] is True
+    assert backend.take('k', 3, 1.0) == (False, pytest.approx(0.5))
+    # Other keys have their own bucket
+    assert backend.take('other', 3, 1.0)[0] is True
+
+
+def test_database_buckets_are_shared_between_workers(database):
+    clock = FakeClock()
+    first, second = DatabaseBackend(db.engine, clock=clock), DatabaseBackend(db.engine, clock=clock)
+
+    assert first.take('k', 2, 0.1)[0]
+    assert second.take('k', 2, 0.1)[0]
+    assert not first.take('k', 2, 0.1)[0]
+
+    clock.now += 3600
+    assert first.purge(max_idle_seconds=60) == 1
+
+
+def test_memory_backend_is_bounded():
+    backend = InProcessBackend(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        backend.take(key, 1, 1.0)
+    assert len(backend) == 2
+
+
+def test_login_is_limited_per_ip(client, user, limits):
+    limits(login='2/60')
+    credentials = {'username': 'testuser', 'password': 'password123'}
+
+    statuses = [client.post('/api/auth/login', json=credentials).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    response = client.post('/api/auth/login', json=credentials,
+                           environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert response.status_code == 200
+
+
+def test_transactions_are_limited_per_user(client, auth_headers, user, make_account, limits):
+    limits(transactions='1/30')
+    account = make_account(user.id, balance=100)
+    deposit = {'transaction_type': 'deposit', 'destination_account_id': account.id, 'amount': 1}
+
+    assert client.post('/api/transactions', headers=auth_headers, json=deposit).status_code == 201
+    response = client.post('/api/transactions', headers=auth_headers, json=deposit)
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '30'
+
+
+def test_idempotent_retry_is_replayed_when_limited(client, auth_headers, user, make_account, limits):
+    limits(transactions='1/30')
+    account = make_account(user.id, balance=100)
+    deposit = {'transaction_type': 'deposit', 'destination_account_id': account.id, 'amount': 1}
+    headers = {**auth_headers, 'Idempotency-Key': 'retry-1'}
+
+    first = client.post('/api/transactions', headers=headers, json=deposit)
+    retry = client.post('/api/transactions', headers=headers, json=deposit)
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+
+
+def test_limited_request_does_not_keep_its_key(client, auth_headers, user, make_account, limits):
+    limits(transactions='1/30')
+    account = make_account(user.id, balance=100)
+    deposit = {'transaction_type': 'deposit', 'destination_account_id': account.id, 'amount': 1}
+
+    assert client.post('/api/transactions', headers=auth_headers, json=deposit).status_code == 201
+    headers = {**auth_headers, 'Idempotency-Key': 'limited-1'}
+    assert client.post('/api/transactions', headers=headers, json=deposit).status_code == 429
+
+    limits(transactions='10/30')
+    assert client.post('/api/transactions', headers=headers, json=deposit).status_code == 201
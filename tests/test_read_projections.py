@@ -0,0 +1,40 @@
+from datetime import datetime
+from sqlalchemy.engine import Row
+from db.database import db
+from models.transaction import Transaction
+from models.user import User
+from services import account_service, transaction_service
+
+
+def test_history_reads_rows_without_filling_the_session(user, make_account):
+    account = make_account(user.id, balance=100)
+    account_id = account.id
+    for day in range(1, 6):
+        db.session.add(Transaction(destination_account_id=account_id, amount=1,
+                                   transaction_type='deposit',
+                                   created_at=datetime(2024, 1, day)))
+    db.session.commit()
+    db.session.expunge_all()
+
+    rows = transaction_service.get_user_transactions([account_id])
+
+    assert all(isinstance(row, Row) for row in rows)
+    assert [row.created_at.day for row in rows] == [5, 4, 3, 2, 1]
+    assert len(db.session.identity_map) == 0
+    assert Transaction.to_response_list(rows)[0]['destination_account_id'] == account_id
+
+
+def test_account_reads_return_rows(user, make_account):
+    first = make_account(user.id, balance=10)
+    second = make_account(user.id, balance=20)
+    other = User(username='other', email='other@example.com', password_hash='x')
+    db.session.add(other)
+    db.session.commit()
+    other_user_account = make_account(other.id)
+
+    rows = account_service.get_user_accounts(user.id)
+
+    assert [row.id for row in rows] == [first.id, second.id]
+    assert account_service.get_user_account_ids(user.id) == [first.id, second.id]
+    assert account_service.get_account_row(second.id, user.id).balance == 20
+    assert account_service.get_account_row(other_user_account.id, user.id) is None
@@ -0,0 +1,100 @@
+import pytest
+from db import routing
+from db.database import db
+from models.account import Account
+from models.user import User
+from run import create_app
+from services import account_service, auth_service
+
+
+def replica_engine(app):
+    return app.extensions[routing.REPLICA_EXTENSION]
+
+
+@pytest.fixture
+def replica_app(monkeypatch, tmp_path):
+    """An app with two SQLite files standing in for a primary and its replica."""
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/primary.db')
+    monkeypatch.setenv('REPLICA_DATABASE_URL', f'sqlite:///{tmp_path}/replica.db')
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(replica_engine(app))
+        auth_service.user_cache.clear()
+        auth_service.revocations.reset()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+        replica_engine(app).dispose()
+    routing._recent_writers.clear()
+
+
+@pytest.fixture
+def lagging_account(replica_app):
+    """The same user and account on both databases; the replica has not
+    caught up with the latest balance yet."""
+    for engine, balance in ((db.engine, 100), (replica_engine(replica_app), 0)):
+        with engine.begin() as connection:
+            connection.execute(User.__table__.insert().values(
+                id=1, username='replica', email='replica@example.com',
+                password_hash='secret', full_name='Replica User'))
+            connection.execute(Account.__table__.insert().values(
+                id=1, user_id=1, account_type='savings', account_number='R-1', balance=balance))
+    return 1
+
+
+def _balance(client, account_id, headers):
+    response = client.get(f'/api/accounts/{account_id}', headers=headers)
+    assert response.status_code == 200
+    return response.json['account']['balance']
+
+
+@pytest.fixture
+def headers(replica_app):
+    return {'Authorization': f'Bearer {auth_service.generate_token(1)}'}
+
+
+def test_get_requests_read_from_the_replica(replica_app, lagging_account, headers):
+    assert _balance(replica_app.test_client(), lagging_account, headers) == 0
+
+
+def test_reads_outside_requests_use_the_primary(replica_app, lagging_account):
+    assert account_service.get_account_by_id(lagging_account).balance == 100
+
+
+def test_reads_stick_to_the_primary_after_a_write(replica_app, lagging_account, headers):
+    client = replica_app.test_client()
+    response = client.post('/api/transactions', headers=headers, json={
+        'transaction_type': 'deposit', 'destination_account_id': lagging_account, 'amount': 5})
+    assert response.status_code == 201
+    assert routing.STICKY_COOKIE in response.headers['Set-Cookie']
+
+    assert _balance(client, lagging_account, headers) == 105
+    # Without the cookie the worker still remembers the user's write
+    assert _balance(replica_app.test_client(), lagging_account, headers) == 105
+
+    routing._recent_writers.clear()
+    assert _balance(replica_app.test_client(), lagging_account, headers) == 0
+
+
+def test_stickiness_ends_with_the_window(replica_app, lagging_account, headers):
+    replica_app.config['REPLICA_STICKY_SECONDS'] = 0
+    client = replica_app.test_client()
+    client.post('/api/transactions', headers=headers, json={
+        'transaction_type': 'deposit', 'destination_account_id': lagging_account, 'amount': 5})
+
+    assert _balance(client, lagging_account, headers) == 0
+
+
+def test_user_missing_on_the_replica_is_read_from_the_primary(replica_app, headers):
+    # Signed up moments ago; the replica has not caught up yet
+    with db.engine.begin() as connection:
+        connection.execute(User.__table__.insert().values(
+            id=1, username='fresh', email='fresh@example.com',
+            password_hash='secret', full_name='Fresh User'))
+
+    response = replica_app.test_client().get('/api/users/me', headers=headers)
+
+    assert response.status_code == 200
+    assert response.json['user']['username'] == 'fresh'
@@ -0,0 +1,103 @@
+import datetime
+from services import auth_service
+from shared.revocation import RevocationList
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _login(client):
+    response = client.post('/api/auth/login',
+                           json={'username': 'testuser', 'password': 'password123'})
+    assert response.status_code == 200
+    return response.json
+
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_login_issues_access_and_refresh_tokens(app, client, user):
+    tokens = _login(client)
+
+    assert tokens['expires_in'] == app.config['ACCESS_TOKEN_TTL']
+    assert client.get('/api/users/me', headers=_bearer(tokens['token'])).status_code == 200
+    # A refresh token is not accepted as an access token
+    assert client.get('/api/users/me', headers=_bearer(tokens['refresh_token'])).status_code == 401
+
+
+def test_refresh_rotates_the_refresh_token(client, user):
+    tokens = _login(client)
+
+    response = client.post('/api/auth/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 200
+    assert client.get('/api/users/me', headers=_bearer(response.json['token'])).status_code == 200
+
+    replay = client.post('/api/auth/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert replay.status_code == 401
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, user):
+    tokens = _login(client)
+
+    response = client.post('/api/auth/logout', headers=_bearer(tokens['token']),
+                           json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 200
+
+    response = client.get('/api/users/me', headers=_bearer(tokens['token']))
+    assert response.status_code == 401
+    assert response.json['message'] == 'Token has been revoked!'
+    assert client.post('/api/auth/refresh',
+                       json={'refresh_token': tokens['refresh_token']}).status_code == 401
+
+
+def test_expired_access_token_is_rejected(app, client, user):
+    app.config['ACCESS_TOKEN_TTL'] = -1
+    try:
+        token = auth_service.generate_token(user.id)
+    finally:
+        app.config['ACCESS_TOKEN_TTL'] = 900
+
+    response = client.get('/api/users/me', headers=_bearer(token))
+    assert response.json['message'] == 'Token is expired!'
+
+
+def test_token_check_issues_no_queries(client, auth_headers, query_budget):
+    client.get('/api/users/me', headers=auth_headers)
+
+    with query_budget(0):
+        assert client.get('/api/users/me', headers=auth_headers).status_code == 200
+
+
+def test_revocation_list_syncs_on_interval():
+    later = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    earlier = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    table = []
+    loads = []
+
+    def load_since(after_id):
+        loads.append(after_id)
+        return [row for row in table if row[0] > after_id]
+
+    clock = FakeClock()
+    revocations = RevocationList(load_since, interval=5, overlap=1, clock=clock)
+
+    assert not revocations.is_revoked('a')
+    table += [(1, 'a', later), (2, 'b', earlier), (3, 'c', later)]
+
+    clock.now = 4.9
+    assert not revocations.is_revoked('a')
+    clock.now = 5.0
+    assert revocations.is_revoked('a') and revocations.is_revoked('c')
+    # Already expired tokens are not kept
+    assert not revocations.is_revoked('b')
+    assert len(revocations) == 2
+
+    clock.now = 10.0
+    revocations.is_revoked('a')
+    assert loads == [0, 0, 2]
@@ -0,0 +1,248 @@
+import json
+import os
+import pytest
+from datetime import datetime
+from sqlalchemy import func
+from db.database import db
+from models.transaction import Transaction
+from repos import transaction_archive
+from repos.transaction_archive import FILTER_COLUMNS, IndexCache, TransactionArchive
+from services import archive_service, rollup_service, transaction_service
+
+CUTOFF = datetime(2024, 3, 1)
+
+
+@pytest.fixture
+def archive(app, tmp_path):
+    # One account per range, so transfers are stored in two segments
+    archive = TransactionArchive(str(tmp_path / 'archive'), account_range_size=1)
+    app.extensions['transaction_archive'] = archive
+    app.config['ARCHIVE_DIR_SHARED'] = True
+    yield archive
+    app.extensions.pop('transaction_archive')
+    app.config['ARCHIVE_DIR_SHARED'] = False
+
+
+@pytest.fixture
+def history(user, make_account):
+    account = make_account(user.id, balance=1000)
+    other = make_account(user.id, balance=1000)
+    movements = [
+        (datetime(2024, 1, 5), None, account.id, 300),
+        (datetime(2024, 1, 9), account.id, other.id, 40),
+        (datetime(2024, 1, 9), other.id, account.id, 15),
+        (datetime(2024, 2, 2), account.id, None, 25),
+        (datetime(2024, 2, 28, 23, 59), other.id, None, 60),
+        (datetime(2024, 3, 1), None, other.id, 80),
+        (datetime(2024, 3, 15), account.id, other.id, 12),
+        (datetime(2024, 4, 2), None, account.id, 7),
+    ]
+    for created_at, source, destination, amount in movements:
+        db.session.add(Transaction(
+            source_account_id=source, destination_account_id=destination, amount=amount,
+            transaction_type='transfer', created_at=created_at))
+    db.session.commit()
+    return account, other
+
+
+def _history(client, headers, **params):
+    ids, cursor = [], None
+    while True:
+        response = client.get('/api/transactions', headers=headers,
+                              query_string=dict(params, limit=3, **({'cursor': cursor} if cursor else {})))
+        assert response.status_code == 200
+        ids += [transaction['id'] for transaction in response.json['transactions']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            return ids
+
+
+def _reads(client, headers, account):
+    return {
+        'history': _history(client, headers),
+        'february': _history(client, headers, start_date='2024-02-01', end_date='2024-03-10'),
+        'one_account': _history(client, headers, account_id=account.id),
+        'export': client.get('/api/transactions/export', headers=headers).get_data(as_text=True),
+        'statement': client.get(f'/api/accounts/{account.id}/statement', headers=headers,
+                                query_string={'from': '2024-01-07'}).json,
+        # Ends before the archive boundary, and across it
+        'statement_to_january': client.get(
+            f'/api/accounts/{account.id}/statement', headers=headers,
+            query_string={'from': '2024-01-07', 'to': '2024-01-31'}).json,
+        'statement_to_march': client.get(
+            f'/api/accounts/{account.id}/statement', headers=headers,
+            query_string={'from': '2024-01-07', 'to': '2024-03-20'}).json,
+    }
+
+
+def test_archived_history_reads_like_live_history(client, auth_headers, archive, history):
+    account, _ = history
+    before = _reads(client, auth_headers, account)
+
+    archived, deleted = archive_service.archive_transactions(CUTOFF, chunk_size=2)
+
+    assert (archived, deleted) == (5, 5)
+    assert archive.archived_before == CUTOFF
+    assert db.session.query(Transaction).count() == 3
+    assert _reads(client, auth_headers, account) == before
+
+
+def test_export_reads_the_archive_lazily(archive, history, monkeypatch):
+    account, other = history
+    archive_service.archive_transactions(CUTOFF)
+    monkeypatch.setattr(transaction_service, 'EXPORT_BATCH_SIZE', 2)
+    months_read = []
+    read = archive._read
+
+    def recording_read(segment, keep):
+        months_read.append(segment['month'])
+        return read(segment, keep)
+    monkeypatch.setattr(archive, '_read', recording_read)
+
+    batches = transaction_service.stream_user_transactions([account.id, other.id])
+    assert months_read == []
+
+    first = next(batches)
+    # January's segments fill the first batch; February's are not read yet
+    assert [row.created_at.month for row in first] == [1, 1]
+    assert set(months_read) == {'2024-01'}
+
+    rows = first + [row for batch in batches for row in batch]
+    assert set(months_read) == {'2024-01', '2024-02'}
+    assert [row.created_at for row in rows] == sorted(row.created_at for row in rows)
+    assert len(rows) == 8
+
+
+def test_index_cache_is_bounded_by_rows():
+    cache = IndexCache(max_rows=5)
+    cache.set('a', ((1, 2, 3),))
+    cache.set('b', ((4, 5),))
+    assert cache.get('a') is not None
+    cache.set('c', ((6, 7),))
+
+    # 'b' was least recently used
+    assert (cache.get('b'), cache.rows) == (None, 5)
+    cache.set('huge', (tuple(range(6)),))
+    assert cache.get('huge') is None
+
+
+def test_archive_decodes_only_matching_rows(archive, history, monkeypatch):
+    account, _ = history
+    archive_service.archive_transactions(CUTOFF)
+    decoded = []
+    decode = transaction_archive._decode
+
+    def recording_decode(field, values):
+        decoded.append((field, len(values)))
+        return decode(field, values)
+    monkeypatch.setattr(transaction_archive, '_decode', recording_decode)
+
+    [row] = archive.find([account.id], start=datetime(2024, 2, 1), end=datetime(2024, 2, 3))
+
+    assert row.amount == 25
+    assert ('amount', 1) in decoded
+    assert all(count == 1 for field, count in decoded if field not in FILTER_COLUMNS)
+    # Only the index columns are kept between reads
+    assert archive._index_cache.rows == sum(count for field, count in decoded if field == 'id')
+
+
+def test_statement_ending_inside_the_archive(client, auth_headers, archive, history):
+    account, _ = history
+    archive_service.archive_transactions(CUTOFF)
+
+    response = client.get(f'/api/accounts/{account.id}/statement', headers=auth_headers,
+                          query_string={'from': '2024-01-07', 'to': '2024-01-31'})
+
+    statement = response.json
+    # Only January's legs, from the balance on 7 January (1000 now, less
+    # every movement since then: -40 +15 -25 -12 +7)
+    assert [(leg['amount'], leg['running_balance']) for leg in statement['transactions']] == [
+        (-40.0, 1015.0), (15.0, 1030.0)]
+    assert statement['opening_balance'] == 1055.0
+    assert statement['closing_balance'] == 1030.0
+
+
+def test_archived_transaction_by_id(client, auth_headers, archive, history):
+    oldest_id = db.session.query(func.min(Transaction.id)).scalar()
+    expected = client.get(f'/api/transactions/{oldest_id}', headers=auth_headers).json
+    archive_service.archive_transactions(CUTOFF)
+
+    response = client.get(f'/api/transactions/{oldest_id}', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json == expected
+
+
+def test_rollup_backfill_counts_archived_rows_once(app, archive, history):
+    account, other = history
+    rollup_service.backfill_rollups()
+    before = [(r.account_id, r.month, r.inflow_total, r.outflow_total, r.inflow_count)
+              for r in rollup_service.get_account_summary(account.id)
+              + rollup_service.get_account_summary(other.id)]
+
+    archive_service.archive_transactions(CUTOFF)
+    rollup_service.backfill_rollups(chunk_size=2)
+
+    after = [(r.account_id, r.month, r.inflow_total, r.outflow_total, r.inflow_count)
+             for r in rollup_service.get_account_summary(account.id)
+             + rollup_service.get_account_summary(other.id)]
+    assert after == before
+
+
+def _fail_on_delete():
+    execute = db.session.execute
+
+    def guarded(statement, *args, **kwargs):
+        if statement.is_delete:
+            raise RuntimeError('interrupted')
+        return execute(statement, *args, **kwargs)
+    return guarded
+
+
+def test_interrupted_run_is_finished_by_the_next(archive, history, monkeypatch):
+    # Stop after the manifest is published but before any row is deleted
+    monkeypatch.setattr(db.session, 'execute', _fail_on_delete())
+    with pytest.raises(RuntimeError):
+        archive_service.archive_transactions(CUTOFF)
+    monkeypatch.undo()
+
+    # Leftover live rows are hidden behind the boundary, not shown twice
+    user_accounts = [a.id for a in history]
+    assert len(transaction_service.get_user_transactions(user_accounts)) == 8
+    assert archive_service.archive_transactions(CUTOFF) == (0, 5)
+
+
+def test_rows_missing_from_the_archive_on_disk_are_kept(archive, history, monkeypatch):
+    monkeypatch.setattr(db.session, 'execute', _fail_on_delete())
+    with pytest.raises(RuntimeError):
+        archive_service.archive_transactions(CUTOFF)
+    monkeypatch.undo()
+
+    # The published manifest lost January's segments
+    path = os.path.join(archive.directory, 'manifest.json')
+    with open(path) as file:
+        manifest = json.load(file)
+    manifest['segments'] = [segment for segment in manifest['segments']
+                            if segment['month'] != '2024-01']
+    with open(path, 'w') as file:
+        json.dump(manifest, file)
+
+    with pytest.raises(archive_service.ArchiveIncomplete):
+        archive_service.archive_transactions(CUTOFF)
+    remaining = db.session.query(Transaction).filter(Transaction.created_at < CUTOFF).all()
+    assert sorted(t.created_at.month for t in remaining) == [1, 1, 1]
+
+
+def test_archive_requires_shared_storage(app, archive, history):
+    app.config['ARCHIVE_DIR_SHARED'] = False
+
+    with pytest.raises(archive_service.ArchiveNotConfigured):
+        archive_service.archive_transactions(CUTOFF)
+    assert archive.archived_before is None
+    assert db.session.query(Transaction).count() == 8
+
+
+def test_archive_command_requires_a_directory(app, database):
+    result = app.test_cli_runner().invoke(args=['archive', 'run'])
+
+    assert result.exit_code == 1
+    assert 'ARCHIVE_DIR' in result.output
@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import event
+from db.database import db
+from models.account import Account
+from models.transaction import Transaction
+
+
+@pytest.fixture
+def statements(app):
+    """Records every SQL statement the engine executes."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def _transfers(source, destination, count):
+    return [{'transaction_type': 'transfer', 'amount': 1,
+             'source_account_id': source, 'destination_account_id': destination}
+            for _ in range(count)]
+
+
+def test_batch_returns_per_item_results(client, auth_headers, user, make_account):
+    checking = make_account(user.id, balance=100)
+    savings = make_account(user.id, balance=0)
+
+    response = client.post('/api/transactions/batch', headers=auth_headers, json={
+        'transactions': [
+            {'transaction_type': 'deposit', 'amount': '50', 'destination_account_id': savings.id},
+            {'transaction_type': 'withdrawal', 'amount': 500, 'source_account_id': checking.id},
+            {'transaction_type': 'transfer', 'amount': '25.50',
+             'source_account_id': checking.id, 'destination_account_id': savings.id},
+            {'transaction_type': 'refund', 'amount': 1},
+        ]
+    })
+
+    assert response.status_code == 200
+    assert response.json['completed'] == 2
+    assert response.json['failed'] == 2
+    results = response.json['results']
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    assert results[1]['message'] == 'Insufficient balance'
+    assert results[2]['transaction']['amount'] == 25.5
+    assert results[3]['message'] == 'Invalid transaction type'
+
+    db.session.expire_all()
+    assert db.session.get(Account, checking.id).balance == 74.5
+    assert db.session.get(Account, savings.id).balance == 75.5
+    assert Transaction.query.count() == 2
+
+
+def test_later_items_see_earlier_balances(client, auth_headers, user, make_account):
+    source = make_account(user.id, balance=3)
+    destination = make_account(user.id)
+
+    response = client.post('/api/transactions/batch', headers=auth_headers, json={
+        'transactions': _transfers(source.id, destination.id, 5)
+    })
+
+    statuses = [result['status'] for result in response.json['results']]
+    assert statuses == ['completed'] * 3 + ['failed'] * 2
+
+
+def test_statement_count_does_not_grow_with_batch_size(client, auth_headers, user,
+                                                       make_account, statements):
+    source = make_account(user.id, balance=10000)
+    destination = make_account(user.id)
+
+    def statements_for(count):
+        del statements[:]
+        response = client.post('/api/transactions/batch', headers=auth_headers, json={
+            'transactions': _transfers(source.id, destination.id, count)
+        })
+        assert response.json['completed'] == count
+        # SQLite cannot batch INSERT .. RETURNING for autoincrement keys, so
+        # only the ledger inserts may scale (Postgres sends them in batches)
+        return len([statement for statement in statements
+                    if not statement.startswith('INSERT')])
+
+    # The first request also loads the user into the principal cache
+    statements_for(1)
+    assert statements_for(500) == statements_for(10)
+
+
+def test_chunks_commit_independently(client, auth_headers, user, make_account):
+    source = make_account(user.id, balance=100)
+    destination = make_account(user.id)
+
+    response = client.post('/api/transactions/batch', headers=auth_headers, json={
+        'transactions': _transfers(source.id, destination.id, 7),
+        'chunk_size': 3
+    })
+
+    assert response.json['completed'] == 7
+    assert Transaction.query.count() == 7
+
+
+def test_batch_validation(client, auth_headers, user):
+    assert client.post('/api/transactions/batch', headers=auth_headers,
+                       json={'transactions': []}).status_code == 400
+    assert client.post('/api/transactions/batch', headers=auth_headers,
+                       json={'transactions': ['deposit']}).status_code == 400
+    assert client.post('/api/transactions/batch', headers=auth_headers,
+                       json={'transactions': [{}], 'chunk_size': 0}).status_code == 400
@@ -0,0 +1,100 @@
+import random
+import threading
+from decimal import Decimal
+from sqlalchemy import func
+from db.database import db
+from models.account import Account
+from models.transaction import Transaction
+from services import transaction_service
+
+THREADS = 8
+TRANSFERS_PER_THREAD = 250
+ACCOUNTS = 10
+OPENING_BALANCE = 1000
+
+
+def test_deposit_and_withdrawal(app, user, make_account):
+    account = make_account(user.id, balance=100)
+
+    _, error = transaction_service.create_deposit(user.id, account.id, Decimal('50'))
+    assert error is None
+
+    _, error = transaction_service.create_withdrawal(user.id, account.id, Decimal('500'))
+    assert error == 'Insufficient balance'
+
+    _, error = transaction_service.create_withdrawal(user.id, account.id, Decimal('150'))
+    assert error is None
+    assert db.session.get(Account, account.id).balance == 0
+
+
+def test_transfer_errors(app, user, make_account):
+    source = make_account(user.id, balance=10)
+    other = make_account(user.id + 1, balance=10)
+
+    assert transaction_service.create_transfer(
+        user.id, other.id, source.id, Decimal('1'))[1] == 'Invalid source account'
+    assert transaction_service.create_transfer(
+        user.id, source.id, 9999, Decimal('1'))[1] == 'Invalid destination account'
+    assert transaction_service.create_transfer(
+        user.id, source.id, other.id, Decimal('11'))[1] == 'Insufficient balance'
+
+    # Failed transfers leave no trace
+    assert Transaction.query.count() == 0
+    assert db.session.get(Account, other.id).balance == 10
+
+
+def test_transfer_rejects_non_numeric_ids(client, auth_headers, user, make_account):
+    account = make_account(user.id, balance=10)
+
+    for source, destination, message in (('abc', account.id, 'Invalid source account'),
+                                         (account.id, 'abc', 'Invalid destination account')):
+        response = client.post('/api/transactions', headers=auth_headers, json={
+            'transaction_type': 'transfer', 'source_account_id': source,
+            'destination_account_id': destination, 'amount': 1})
+        assert response.status_code == 400
+        assert response.json == {'message': message}
+
+
+def test_concurrent_transfers_conserve_money(app, user, make_account):
+    account_ids = [make_account(user.id, balance=OPENING_BALANCE).id
+                   for _ in range(ACCOUNTS)]
+    outcomes = []
+    failures = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        with app.app_context():
+            for _ in range(TRANSFERS_PER_THREAD):
+                source, destination = rng.sample(account_ids, 2)
+                amount = Decimal(rng.randint(1, 400))
+                transaction, error = transaction_service.create_transfer(
+                    user.id, source, destination, amount)
+                if error not in (None, 'Insufficient balance'):
+                    failures.append(error)
+                outcomes.append(transaction is not None)
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=(seed,))
+               for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db.session.expire_all()
+    balances = {account.id: account.balance
+                for account in Account.query.filter(Account.id.in_(account_ids))}
+
+    assert failures == []
+    assert len(outcomes) == THREADS * TRANSFERS_PER_THREAD
+    assert sum(balances.values()) == ACCOUNTS * OPENING_BALANCE
+    assert all(balance >= 0 for balance in balances.values())
+    assert Transaction.query.count() == sum(outcomes)
+
+    # Every balance is explained by the ledger
+    for account_id, balance in balances.items():
+        received = db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
+            Transaction.destination_account_id == account_id).scalar()
+        sent = db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
+            Transaction.source_account_id == account_id).scalar()
+        assert balance == OPENING_BALANCE + received - sent
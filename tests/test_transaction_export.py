@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+import pytest
+from datetime import datetime
+from db.database import db
+from models.transaction import Transaction
+
+
+@pytest.fixture
+def history(user, make_account):
+    account = make_account(user.id, balance=100)
+    other = make_account(user.id)
+    for day in (3, 1, 2):
+        db.session.add(Transaction(source_account_id=account.id, destination_account_id=other.id,
+                                   amount='10.05', transaction_type='transfer',
+                                   created_at=datetime(2024, 1, day)))
+    db.session.commit()
+    return account
+
+
+def test_csv_export_streams_oldest_first(client, auth_headers, history):
+    response = client.get('/api/transactions/export?format=csv', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['created_at'] for row in rows] == [
+        '2024-01-01T00:00:00', '2024-01-02T00:00:00', '2024-01-03T00:00:00']
+    assert rows[0]['amount'] == '10.05'
+    assert rows[0]['description'] == ''
+
+
+def test_ndjson_export(client, auth_headers, history):
+    response = client.get('/api/transactions/export',
+                          query_string={'format': 'ndjson', 'start_date': '2024-01-02'},
+                          headers=auth_headers)
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['created_at'] for line in lines] == ['2024-01-02T00:00:00', '2024-01-03T00:00:00']
+    assert lines[0]['source_account_id'] == history.id
+
+
+def test_export_sends_the_header_before_reading_rows(client, auth_headers, history):
+    response = client.get('/api/transactions/export', headers=auth_headers, buffered=False)
+
+    first_chunk = next(iter(response.response))
+    assert first_chunk.decode().strip() == ','.join(Transaction.RESPONSE_FIELDS)
+    response.close()
+
+
+def test_export_rejects_unknown_format(client, auth_headers, history):
+    response = client.get('/api/transactions/export?format=xml', headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,47 @@
+import os
+import pytest
+import sqlalchemy as sa
+from datetime import datetime
+from db.database import db
+from services.transaction_service import user_transactions_query
+
+SOURCE_INDEX = 'ix_transactions_source_account_id_created_at'
+DESTINATION_INDEX = 'ix_transactions_destination_account_id_created_at'
+
+
+def _history_sql(dialect):
+    query = user_transactions_query(
+        [1, 2], start_date='2024-01-01T00:00:00', limit=50,
+        before=(datetime(2024, 6, 1), 1000))
+    return str(query.compile(dialect=dialect,
+                             compile_kwargs={'literal_binds': True}))
+
+
+def test_sqlite_plan_uses_both_history_indexes(database):
+    sql = _history_sql(db.engine.dialect)
+    plan = ' '.join(row[-1] for row in db.session.execute(
+        sa.text(f'EXPLAIN QUERY PLAN {sql}')))
+
+    assert f'USING INDEX {SOURCE_INDEX}' in plan
+    assert f'USING INDEX {DESTINATION_INDEX}' in plan
+    assert 'SCAN transactions' not in plan
+
+
+@pytest.mark.skipif(not os.getenv('TEST_POSTGRES_URL'),
+                    reason='TEST_POSTGRES_URL is not set')
+def test_postgres_plan_uses_both_history_indexes():
+    engine = sa.create_engine(os.environ['TEST_POSTGRES_URL'])
+    db.metadata.create_all(engine)
+    try:
+        with engine.connect() as connection:
+            # The test table is tiny, so make the planner show its index choice
+            connection.exec_driver_sql('SET enable_seqscan = off')
+            plan = ' '.join(row[0] for row in connection.exec_driver_sql(
+                f'EXPLAIN {_history_sql(engine.dialect)}'))
+    finally:
+        db.metadata.drop_all(engine)
+        engine.dispose()
+
+    assert SOURCE_INDEX in plan
+    assert DESTINATION_INDEX in plan
+    assert 'Seq Scan on transactions' not in plan
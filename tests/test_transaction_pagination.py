@@ -0,0 +1,85 @@
+import pytest
+from datetime import datetime, timedelta
+from db.database import db
+from models.transaction import Transaction
+from shared.pagination import decode_cursor, encode_cursor, parse_limit
+
+
+@pytest.fixture
+def history(user, make_account):
+    account = make_account(user.id, balance=1000)
+    base = datetime(2024, 1, 1, 12, 0, 0)
+
+    # Several rows share a timestamp so the id tie-breaker is exercised
+    for i in range(25):
+        db.session.add(Transaction(
+            destination_account_id=account.id,
+            amount=i + 1,
+            transaction_type='deposit',
+            created_at=base + timedelta(minutes=i // 3)
+        ))
+    db.session.commit()
+    return account
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 8, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_decode_cursor_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+
+
+def test_parse_limit():
+    assert parse_limit(None) == 50
+    assert parse_limit('10') == 10
+    assert parse_limit('100000') == 200
+    with pytest.raises(ValueError):
+        parse_limit('0')
+
+
+def test_pages_cover_history_exactly_once(client, auth_headers, history):
+    seen = []
+    cursor = None
+    pages = 0
+
+    while True:
+        query = {'limit': 10}
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get('/api/transactions', headers=auth_headers,
+                              query_string=query)
+        assert response.status_code == 200
+
+        page = response.json['transactions']
+        seen.extend(page)
+        pages += 1
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(seen) == 25
+    assert len({t['id'] for t in seen}) == 25
+
+    # Newest first, ids descending within a shared timestamp
+    keys = [(t['created_at'], t['id']) for t in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_last_page_has_no_cursor(client, auth_headers, history):
+    response = client.get('/api/transactions', headers=auth_headers,
+                          query_string={'limit': 25})
+
+    assert response.status_code == 200
+    assert len(response.json['transactions']) == 25
+    assert response.json['next_cursor'] is None
+
+
+def test_invalid_cursor(client, auth_headers, history):
+    response = client.get('/api/transactions', headers=auth_headers,
+                          query_string={'cursor': '%%%'})
+
+    assert response.status_code == 400
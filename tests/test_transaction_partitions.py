@@ -0,0 +1,206 @@
+import os
+import re
+import pytest
+from contextlib import contextmanager
+from datetime import date, datetime
+from flask import Flask
+from flask_migrate import Migrate, downgrade, upgrade
+from sqlalchemy.dialects import postgresql
+from commands.partition_commands import partitions_cli
+from db import partitions
+from db.database import db
+from models.account import Account
+from models.transaction import Transaction
+from models.user import User
+from services import transaction_service
+from tests.test_migrations import MIGRATIONS_DIR
+
+
+def test_month_arithmetic_and_names():
+    assert partitions.add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert partitions.add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partitions.partition_name(date(2024, 3, 1)) == 'transactions_y2024m03'
+    assert partitions.create_partition_sql(date(2024, 12, 1)).endswith(
+        "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')")
+
+
+def test_history_query_bounds_created_at_in_both_branches():
+    query = transaction_service.user_transactions_query(
+        [1, 2], start_date='2024-01-01', end_date='2024-02-01',
+        before=(datetime(2024, 1, 20), 50))
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    # Each UNION ALL branch carries its own bounds, which is what lets the
+    # planner prune partitions
+    assert sql.count('transactions.created_at >=') == 2
+    assert sql.count('transactions.created_at <=') == 4
+
+
+def test_commands_explain_that_sqlite_is_not_partitioned(app, database):
+    runner = app.test_cli_runner()
+
+    for args in (['partitions', 'create'], ['partitions', 'detach', '--keep-months', '12']):
+        result = runner.invoke(args=args)
+        assert result.exit_code == 1
+        assert 'not partitioned' in result.output
+
+
+
+class RecordingEngine:
+    """Stands in for a PostgreSQL engine, recording the DDL it is sent."""
+
+    def __init__(self):
+        self.statements = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, statement):
+        self.statements.append(str(statement))
+
+
+@pytest.fixture
+def old_partitions(monkeypatch):
+    months = [(date(2024, 1, 1), 'transactions_y2024m01'), (date(2024, 2, 1), 'transactions_y2024m02'),
+              (date(2024, 6, 1), 'transactions_y2024m06')]
+    monkeypatch.setattr(partitions, 'monthly_partitions', lambda connection: months)
+    return RecordingEngine()
+
+
+def test_detach_refuses_months_after_the_archive_boundary(old_partitions):
+    today = date(2024, 6, 10)
+
+    for archived_before in (None, datetime(2024, 2, 1)):
+        with pytest.raises(partitions.PartitionNotArchived, match='transactions_y2024m02'):
+            partitions.detach_old_partitions(old_partitions, 3, today=today,
+                                             archived_before=archived_before)
+    assert old_partitions.statements == []
+
+    detached = partitions.detach_old_partitions(old_partitions, 3, today=today,
+                                                archived_before=datetime(2024, 3, 1))
+    assert detached == ['transactions_y2024m01', 'transactions_y2024m02']
+    assert old_partitions.statements[-1].endswith('DETACH PARTITION transactions_y2024m02')
+
+
+def test_detach_force_skips_the_archive_check(old_partitions):
+    detached = partitions.detach_old_partitions(old_partitions, 3, today=date(2024, 6, 10),
+                                                force=True)
+
+    assert detached == ['transactions_y2024m01', 'transactions_y2024m02']
+    assert len(old_partitions.statements) == 2
+
+
+
+def test_detach_command_refuses_without_an_archive(app, database, old_partitions):
+    result = app.test_cli_runner().invoke(args=['partitions', 'detach', '--keep-months', '1'])
+
+    assert result.exit_code == 1
+    assert 'transactions_y2024m01' in result.output
+    assert 'not archived' in result.output
+
+
+
+def _ledger(connection):
+    """Row count, id checksum, undated rows and each account's net movement."""
+    count, id_sum, undated = connection.exec_driver_sql(
+        'SELECT count(*), coalesce(sum(id), 0), count(*) FILTER (WHERE created_at IS NULL) '
+        'FROM transactions').one()
+    net = dict(connection.exec_driver_sql(
+        'SELECT account_id, sum(amount) FROM ('
+        ' SELECT destination_account_id AS account_id, amount FROM transactions'
+        ' UNION ALL SELECT source_account_id, -amount FROM transactions'
+        ') legs WHERE account_id IS NOT NULL GROUP BY account_id').all())
+    balances = dict(connection.exec_driver_sql('SELECT id, balance FROM accounts').all())
+    return count, id_sum, undated, net, balances
+
+
+def _is_partitioned(connection):
+    try:
+        partitions.monthly_partitions(connection)
+    except partitions.PartitioningUnsupported:
+        return False
+    return True
+
+
+@pytest.mark.skipif(not os.getenv('TEST_POSTGRES_URL'),
+                    reason='TEST_POSTGRES_URL is not set')
+def test_postgres_partition_migration_round_trip():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['TEST_POSTGRES_URL']
+    db.init_app(app)
+    Migrate(app, db, directory=MIGRATIONS_DIR)
+    app.cli.add_command(partitions_cli)
+    runner = app.test_cli_runner()
+    now = datetime.utcnow()
+    detached = []
+
+    with app.app_context():
+        upgrade(revision='0007')
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(User.__table__.insert().values(
+                    id=1, username='partitions', email='partitions@example.com',
+                    password_hash='x'))
+                connection.execute(Account.__table__.insert(), [
+                    {'id': account_id, 'user_id': 1, 'account_type': 'savings',
+                     'account_number': f'P-{account_id}', 'balance': 1000 * account_id}
+                    for account_id in (1, 2, 3)])
+                # More rows than one copy batch, over two old months and this
+                # one, plus a row from before created_at was always set
+                connection.execute(Transaction.__table__.insert(), [
+                    {'source_account_id': 1 + index % 3, 'destination_account_id': 1 + (index + 1) % 3,
+                     'amount': 1 + index % 7, 'transaction_type': 'transfer',
+                     'created_at': datetime(2020, 1 + index % 2, 1 + index % 28)
+                     if index < 24000 else now}
+                    for index in range(25000)])
+                connection.execute(Transaction.__table__.insert().values(
+                    destination_account_id=1, amount=3, transaction_type='deposit', created_at=None))
+                count, id_sum, undated, net, balances = _ledger(connection)
+            assert (count, undated) == (25001, 1)
+
+            upgrade(revision='0008')
+            with db.engine.connect() as connection:
+                assert _is_partitioned(connection)
+                # The undated row was given a date on the way in
+                assert _ledger(connection) == (count, id_sum, 0, net, balances)
+
+            downgrade(revision='0007')
+            with db.engine.connect() as connection:
+                assert not _is_partitioned(connection)
+                assert _ledger(connection) == (count, id_sum, 0, net, balances)
+
+            upgrade(revision='0008')
+            with db.engine.begin() as connection:
+                assert _ledger(connection) == (count, id_sum, 0, net, balances)
+                assert partitions.monthly_partitions(connection)[0] == (
+                    date(2020, 1, 1), 'transactions_y2020m01')
+                # The id sequence carries on after the copied rows
+                new_id = connection.execute(Transaction.__table__.insert().values(
+                    destination_account_id=1, amount=5, transaction_type='deposit',
+                    created_at=now).returning(Transaction.id)).scalar()
+                placement = dict(connection.exec_driver_sql(
+                    'SELECT tableoid::regclass::text, count(*) FROM transactions GROUP BY 1').all())
+            assert new_id == 25002
+            assert placement == {'transactions_y2020m01': 12000, 'transactions_y2020m02': 12000,
+                                 partitions.partition_name(partitions.month_start(now)): 1002}
+
+            result = runner.invoke(args=['partitions', 'create', '--months-ahead', '5'])
+            assert 'Created 2 partitions' in result.output
+
+            # Nothing is archived, so detaching needs --force
+            result = runner.invoke(args=['partitions', 'detach', '--keep-months', '12'])
+            assert result.exit_code == 1
+            assert 'not archived' in result.output
+
+            result = runner.invoke(args=['partitions', 'detach', '--keep-months', '12', '--force'])
+            detached = re.findall(r'^Detached (transactions_\S+)$', result.output, re.M)
+            assert {'transactions_y2020m01', 'transactions_y2020m02'} <= set(detached)
+            with db.engine.connect() as connection:
+                assert connection.exec_driver_sql('SELECT count(*) FROM transactions').scalar() == 1002
+        finally:
+            # Detached partitions keep their foreign keys to accounts
+            with db.engine.begin() as connection:
+                for name in detached:
+                    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {name}')
+            downgrade(revision='base')